@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Adaptive Probe Concurrency
+AIMD controller for the number of probes in flight: the limit grows
+additively while the local error rate and event-loop lag stay healthy
+and is cut multiplicatively when either degrades. The ceiling respects
+the process file-descriptor limit (RLIMIT_NOFILE).
+"""
+
+import errno
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows has no RLIMIT_NOFILE
+    resource = None
+
+# Errors raised by our own host running out of sockets, ports or buffers.
+# They say nothing about the proxy, so they must not count as a dead proxy.
+LOCAL_ERRNOS = {
+    errno.EMFILE,         # process fd limit
+    errno.ENFILE,         # system fd limit
+    errno.EADDRNOTAVAIL,  # ephemeral ports exhausted
+    errno.ENOBUFS,
+    errno.ENOMEM,
+}
+
+FD_RESERVE = 64  # descriptors kept free for files, SQLite, DNS and the event loop
+
+
+def fd_concurrency_cap(requested: int, reserve: int = FD_RESERVE) -> int:
+    """Largest concurrency the fd limit allows, raising the soft limit if we can"""
+    if resource is None:
+        return requested
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = requested + reserve
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    # Each probe holds one socket at a time
+    return max(1, min(requested, soft - reserve))
+
+
+class AdaptiveConcurrency:
+    """Additive-increase / multiplicative-decrease limit for in-flight probes
+
+    `observe()` is called once per tick with what happened since the last
+    tick; the caller then resizes its worker pool to `limit`.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 20, initial: Optional[int] = None,
+                 increase: int = 50, decrease: float = 0.7, max_error_rate: float = 0.01,
+                 max_loop_lag: float = 0.1, interval: float = 0.5, log_interval: float = 5.0,
+                 log: Optional[Callable[[str], None]] = print):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = min(self.maximum, max(self.minimum, initial or min(100, self.maximum)))
+        self.increase = increase
+        self.decrease = decrease
+        self.max_error_rate = max_error_rate
+        self.max_loop_lag = max_loop_lag  # seconds the event loop may fall behind a tick
+        self.interval = interval
+        self.log_interval = log_interval
+        self.log = log
+        self.timeline: List[Dict] = []
+        self.adjustments = {'increase': 0, 'decrease': 0}
+        self._started = time.monotonic()
+        self._last_log = 0.0
+        self._completed = 0
+        self._local_errors = 0
+
+    def record(self, local_error: bool = False):
+        """Count one finished probe (or attempt) since the last tick"""
+        self._completed += 1
+        if local_error:
+            self._local_errors += 1
+
+    def observe(self, loop_lag: float, in_flight: int, demand: bool) -> int:
+        """Adjust the limit from the last tick's signals and return it"""
+        completed, local_errors = self._completed, self._local_errors
+        self._completed = self._local_errors = 0
+        error_rate = local_errors / completed if completed else 0.0
+        previous = self.limit
+
+        if (local_errors and error_rate > self.max_error_rate) or loop_lag > self.max_loop_lag:
+            self.limit = max(self.minimum, int(self.limit * self.decrease))
+            if self.limit < previous:
+                self.adjustments['decrease'] += 1
+        elif demand and in_flight >= previous:
+            # Only grow while the pool is actually full
+            self.limit = min(self.maximum, self.limit + self.increase)
+            if self.limit > previous:
+                self.adjustments['increase'] += 1
+
+        elapsed = time.monotonic() - self._started
+        self.timeline.append({
+            'elapsed': round(elapsed, 2),
+            'limit': self.limit,
+            'in_flight': in_flight,
+            'loop_lag_ms': round(loop_lag * 1000, 1),
+            'local_errors': local_errors,
+        })
+        # Log every cut straight away, growth at most every log_interval
+        if self.log and (self.limit < previous or elapsed - self._last_log >= self.log_interval):
+            self._last_log = elapsed
+            trend = '↓' if self.limit < previous else '↑' if self.limit > previous else '='
+            self.log(f"⚙️  Concurrency {trend} {self.limit} at {elapsed:.1f}s "
+                     f"(in flight {in_flight}, loop lag {loop_lag * 1000:.0f}ms, "
+                     f"local errors {local_errors}/{completed})")
+        return self.limit
+
+    def report(self) -> Dict:
+        """Summary of the limits chosen during the run"""
+        limits = [sample['limit'] for sample in self.timeline] or [self.limit]
+        return {
+            'final': self.limit,
+            'min': min(limits),
+            'max': max(limits),
+            'mean': round(sum(limits) / len(limits), 1),
+            'ceiling': self.maximum,
+            'increases': self.adjustments['increase'],
+            'decreases': self.adjustments['decrease'],
+            'samples': len(self.timeline),
+        }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Proxy Anonymity Classification
+Reads the body an IP echo target returned through a proxy and decides
+what the target could see:
+
+- transparent: our own address (in the origin chain or a forwarding header)
+- anonymous: not our address, but headers or an origin chain that show a proxy
+- elite: neither
+
+The egress IP is the address the target saw the request come from. A
+target that echoes only an IP (no headers) can still expose a transparent
+proxy, but cannot tell anonymous from elite; those results stay
+unclassified.
+
+Targets behind a CDN or load balancer get forwarding headers from their
+own edge too (a `Via`, an `X-Forwarded-For` holding the egress IP). Those
+are not counted against the proxy: client-IP headers only count for
+addresses other than the egress IP, and other headers only when they
+differ from what the target echoed for a direct request.
+"""
+
+import ipaddress
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+ANONYMITY_LEVELS = ('transparent', 'anonymous', 'elite')
+
+# Request headers that give away a proxy in the path
+PROXY_HEADERS = (
+    'via', 'forwarded', 'x-forwarded-for', 'x-forwarded-host', 'x-forwarded-proto',
+    'x-real-ip', 'client-ip', 'x-client-ip', 'true-client-ip', 'x-originating-ip',
+    'x-proxy-id', 'proxy-connection',
+)
+# Of those, the ones that carry the client's address
+CLIENT_IP_HEADERS = (
+    'forwarded', 'x-forwarded-for', 'x-real-ip', 'client-ip', 'x-client-ip',
+    'true-client-ip', 'x-originating-ip',
+)
+
+_IP_CANDIDATE = re.compile(r'(?:\d{1,3}\.){3}\d{1,3}|[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){2,7}')
+
+
+def extract_ips(text: str) -> List[str]:
+    """Valid IPv4/IPv6 addresses in a string, in order of appearance"""
+    found = []
+    for candidate in _IP_CANDIDATE.findall(text):
+        try:
+            found.append(str(ipaddress.ip_address(candidate)))
+        except ValueError:
+            continue
+    return found
+
+
+def parse_echo(body: bytes) -> Tuple[List[str], Optional[Dict[str, str]]]:
+    """Origin addresses and echoed request headers (None if not echoed)
+
+    Understands JSON with `origin` (httpbin, echo_server.py) or `ip`
+    (ipify) plus an optional `headers` object, and plain-text bodies that
+    are just an address (ifconfig.me).
+    """
+    text = body.decode('utf-8', 'replace').strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return extract_ips(text), None
+
+    origin = data.get('origin') or data.get('ip') or ''
+    headers = data.get('headers')
+    if isinstance(headers, dict):
+        headers = {str(name).lower(): str(value) for name, value in headers.items()}
+    else:
+        headers = None
+    return extract_ips(str(origin)), headers
+
+
+def edge_headers(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """The proxy-revealing headers a target echoed for a request sent without a proxy"""
+    return {name: value for name, value in (headers or {}).items() if name in PROXY_HEADERS}
+
+
+def classify_anonymity(body: bytes, own_ips: Iterable[str] = (),
+                       direct_headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(anonymity level or None, egress IP or None) for one echo response
+
+    `direct_headers` are the target's own edge headers (see edge_headers).
+    """
+    origin_ips, headers = parse_echo(body)
+    if not origin_ips:
+        return None, None
+    # Load balancers append the connecting address last
+    egress_ip = origin_ips[-1]
+    own_ips: Set[str] = set(own_ips)
+    direct_headers = direct_headers or {}
+
+    upstream_ips = set(origin_ips[:-1])
+    revealing = False
+    for name, value in (headers or {}).items():
+        if name not in PROXY_HEADERS:
+            continue
+        if name in CLIENT_IP_HEADERS:
+            ips = extract_ips(value)
+            if ips and set(ips) == {egress_ip}:
+                # What an edge in front of the target records
+                continue
+            upstream_ips.update(ips)
+        elif direct_headers.get(name) == value:
+            # Added by the target's edge, the same without a proxy
+            continue
+        revealing = True
+    upstream_ips.discard(egress_ip)
+
+    if own_ips & (upstream_ips | {egress_ip}):
+        return 'transparent', egress_ip
+    if not own_ips and upstream_ips:
+        # Our address is unknown, but the proxy forwarded someone's
+        return 'transparent', egress_ip
+    if upstream_ips or revealing:
+        return 'anonymous', egress_ip
+    if headers is None:
+        return None, egress_ip
+    return 'elite', egress_ip
+
+
+def anonymity_counts(results: Iterable[Dict]) -> Dict[str, int]:
+    """Working proxies per anonymity level, plus those left unclassified"""
+    counts = dict.fromkeys(ANONYMITY_LEVELS + ('unclassified',), 0)
+    for result in results:
+        counts[result.get('anonymity') or 'unclassified'] += 1
+    return counts
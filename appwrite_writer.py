@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Buffered Appwrite Writer
+Moves database writes off the probe loop: documents go into bounded
+queues and background flusher threads upsert them in batches, retrying
+rate-limited and server-side failures with exponential backoff.
+"""
+
+import hashlib
+import queue
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from appwrite.exception import AppwriteException
+from appwrite.query import Query
+
+_STOP = object()
+
+# Appwrite IDs: up to 36 chars of a-z, A-Z, 0-9, '.', '-', '_', not starting with a special char
+_VALID_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,35}$')
+
+
+def proxy_document_id(proxy: str, proxy_type: str) -> str:
+    """Deterministic document ID for a proxy, e.g. socks5_1.2.3.4_1080"""
+    host, _, port = proxy.rpartition(':')
+    document_id = f"{proxy_type}_{host}_{port}"
+    if _VALID_ID.match(document_id):
+        return document_id
+    # Hosts that do not fit (IPv6, hostnames) fall back to a stable hash
+    return hashlib.sha1(f"{proxy}:{proxy_type}".encode()).hexdigest()[:36]
+
+
+def iter_documents(result):
+    """Yield (id, data) pairs from a list_documents result of any SDK version"""
+    documents = result['documents'] if isinstance(result, dict) else result.documents
+    for document in documents:
+        if isinstance(document, dict):
+            yield document['$id'], document
+        else:
+            yield document.id, document.data
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and network failures are worth retrying"""
+    if isinstance(error, AppwriteException):
+        code = error.code or 0
+        return code == 0 or code == 429 or code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+class AppwriteBatchWriter:
+    """Bounded queues plus background flushers that upsert proxy documents
+
+    Documents are keyed by proxy and type, so re-testing a proxy refreshes
+    its existing document and bumps `success_count` instead of adding a row.
+    Each flusher drains its own queue and a document always goes to the
+    same one (by a hash of its ID), so no two threads read and write back
+    the `success_count` of one document at the same time. `submit` runs on
+    the probe loop and never blocks: a document that finds its queue full
+    is dropped and counted.
+    """
+
+    def __init__(self, databases, database_id: str, collection_id: str,
+                 batch_size: int = 100, max_batch_age: float = 2.0,
+                 queue_size: int = 10000, flushers: int = 2,
+                 max_retries: int = 5, backoff_base: float = 0.5,
+                 on_batch: Optional[Callable[[int, float], None]] = None):
+        self.databases = databases
+        self.database_id = database_id
+        self.collection_id = collection_id
+        self.batch_size = batch_size
+        self.max_batch_age = max_batch_age  # seconds a partial batch may wait
+        self.flushers = max(1, flushers)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # One queue per flusher, together holding up to queue_size documents
+        self.queues = [queue.Queue(maxsize=max(1, queue_size // self.flushers))
+                       for _ in range(self.flushers)]
+        self.counters = {'queued': 0, 'written': 0, 'failed': 0, 'dropped': 0, 'retries': 0, 'batches': 0}
+        # Called with the size of each batch and the seconds it took to write
+        self.on_batch = on_batch
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        # Flipped off if the server does not offer bulk upserts
+        self._bulk_supported = hasattr(databases, 'upsert_documents')
+
+    def start(self):
+        """Start the background flusher threads"""
+        if self._threads:
+            return
+        for i, flusher_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self._flush_loop, args=(flusher_queue,),
+                                      name=f"appwrite-flusher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, document: Dict) -> bool:
+        """Queue a document for writing without blocking; False if it was dropped"""
+        self.start()
+        document_id = proxy_document_id(document['proxy'], document['type'])
+        flusher_queue = self.queues[zlib.crc32(document_id.encode()) % len(self.queues)]
+        try:
+            # Called from the probe loop: waiting here would stall every probe in flight
+            flusher_queue.put_nowait(document)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued and stop the flushers"""
+        if self._threads:
+            for flusher_queue in self.queues:
+                flusher_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending(self) -> int:
+        """Documents waiting in the queues"""
+        return sum(flusher_queue.qsize() for flusher_queue in self.queues)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _flush_loop(self, flusher_queue: queue.Queue):
+        """Collect documents until the batch is full or old enough, then write"""
+        while True:
+            item = flusher_queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_batch_age
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = flusher_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            started = time.monotonic()
+            self._write_batch(batch)
+            if self.on_batch:
+                self.on_batch(len(batch), time.monotonic() - started)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Dict]):
+        """Upsert one batch, falling back to single writes without bulk support"""
+        self._count('batches')
+
+        # Collapse repeats of the same proxy inside the batch, newest wins
+        merged: Dict[str, Dict] = {}
+        hits: Dict[str, int] = {}
+        for document in batch:
+            document_id = proxy_document_id(document['proxy'], document['type'])
+            merged[document_id] = document
+            hits[document_id] = hits.get(document_id, 0) + 1
+
+        try:
+            counts = self._with_retries(self._existing_counts, list(merged))
+        except Exception as e:
+            print(f"Error reading success counts from Appwrite: {e}")
+            self._count('failed', len(batch))
+            return
+
+        documents = [
+            {'$id': document_id, **document, 'success_count': counts.get(document_id, 0) + hits[document_id]}
+            for document_id, document in merged.items()
+        ]
+        # Duplicates collapsed above still count as written
+        collapsed = len(batch) - len(documents)
+
+        if self._bulk_supported and len(documents) > 1:
+            try:
+                self._with_retries(self._bulk_upsert, documents)
+                self._count('written', len(batch))
+                return
+            except Exception as e:
+                if is_retryable(e):
+                    print(f"Error saving batch of {len(batch)} to Appwrite: {e}")
+                    self._count('failed', len(batch))
+                    return
+                # Older servers reject the bulk route; write one by one from now on
+                print(f"Bulk upserts unavailable ({e}), switching to single document writes")
+                self._bulk_supported = False
+
+        self._count('written', collapsed)
+        for document in documents:
+            try:
+                self._with_retries(self._upsert_one, document)
+                self._count('written')
+            except Exception as e:
+                print(f"Error saving to Appwrite: {e}")
+                self._count('failed')
+
+    def _with_retries(self, write, payload):
+        """Call write(payload), backing off on retryable errors"""
+        attempt = 0
+        while True:
+            try:
+                return write(payload)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_base * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+                attempt += 1
+                self._count('retries')
+
+    def _existing_counts(self, document_ids: List[str]) -> Dict[str, int]:
+        """Current success_count of the documents that already exist"""
+        result = self.databases.list_documents(
+            database_id=self.database_id,
+            collection_id=self.collection_id,
+            queries=[
+                Query.equal('$id', document_ids),
+                Query.select(['$id', 'success_count']),
+                Query.limit(len(document_ids)),
+            ]
+        )
+        return {
+            document_id: int(data.get('success_count') or 0)
+            for document_id, data in iter_documents(result)
+        }
+
+    def _bulk_upsert(self, documents: List[Dict]):
+        self.databases.upsert_documents(
+            database_id=self.database_id,
+            collection_id=self.collection_id,
+            documents=documents
+        )
+
+    def _upsert_one(self, document: Dict):
+        document_id = document['$id']
+        data = {key: value for key, value in document.items() if key != '$id'}
+        if hasattr(self.databases, 'upsert_document'):
+            self.databases.upsert_document(
+                database_id=self.database_id,
+                collection_id=self.collection_id,
+                document_id=document_id,
+                data=data
+            )
+            return
+        try:
+            self.databases.update_document(
+                database_id=self.database_id,
+                collection_id=self.collection_id,
+                document_id=document_id,
+                data=data
+            )
+        except AppwriteException as e:
+            if e.code != 404:
+                raise
+            self.databases.create_document(
+                database_id=self.database_id,
+                collection_id=self.collection_id,
+                document_id=document_id,
+                data=data
+            )
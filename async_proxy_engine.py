@@ -0,0 +1,971 @@
+#!/usr/bin/env python3
+"""
+Async Proxy Validation Engine
+Tests HTTP, SOCKS4 and SOCKS5 proxies over raw asyncio streams so that
+thousands of probes can be in flight from a single process.
+"""
+
+import asyncio
+import math
+import socket
+import ssl
+import struct
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from adaptive_concurrency import LOCAL_ERRNOS, AdaptiveConcurrency, fd_concurrency_cap
+from anonymity import classify_anonymity, edge_headers, parse_echo
+from rate_limits import RateLimits
+from validation_targets import TargetPool, ValidationTarget
+
+SUPPORTED_TYPES = ('http', 'socks4', 'socks5')
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# SOCKS reply codes
+SOCKS4_GRANTED = 0x5A
+SOCKS5_VERSION = 0x05
+SOCKS5_NO_AUTH = 0x00
+
+# Failures that may pass on a second attempt
+RETRYABLE_REASONS = ('timeout', 'reset')
+
+# Protocols tried after the listed one in detect mode: a SOCKS greeting only
+# times out against an HTTP proxy, while SOCKS servers drop a CONNECT at once
+DETECT_ORDER = ('http', 'socks5', 'socks4')
+# Handshake failures that say the endpoint speaks something else (or nothing)
+DETECT_MISMATCH_REASONS = ('protocol', 'reset', 'timeout')
+
+# Attempts for a probe that failed on our side (fd or port exhaustion)
+LOCAL_ATTEMPTS = 3
+
+# Latency breakdown of the request that succeeded, in seconds
+LATENCY_PHASES = ('connect', 'handshake', 'tls', 'ttfb', 'total')
+
+# Upper bounds (seconds) of the per-stage duration histogram; one more bucket holds the rest
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class ProbeError(Exception):
+    """Raised when a probe fails; `reason` is a short machine-readable tag"""
+
+    def __init__(self, reason: str, message: str = ''):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class ProxyTargetError(ProbeError):
+    """The tunnel worked but the target URL did not answer with a 200"""
+
+
+class ProxyConnection:
+    """One TCP connection to a proxy, reused across test URLs where it can be
+
+    A bare connection can carry anything. An HTTP proxy keeps serving
+    plain-HTTP requests in absolute form over keep-alive; a CONNECT or
+    SOCKS tunnel is bound to one target host and port (and to TLS once it
+    is started), so it only serves further URLs on that same origin.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 connect_time: float = 0.0):
+        self.reader = reader
+        self.writer = writer
+        # Time spent before the first request, charged to that request's latency
+        self.connect_time = connect_time
+        self.handshake_time = 0.0
+        self.greeted = False  # SOCKS5 method negotiation already done
+        self.tunnel: Optional[Tuple[str, int]] = None  # target of a CONNECT / SOCKS tunnel
+        self.scheme: Optional[str] = None  # scheme of the requests sent so far
+        self.requests = 0
+        self.keep_alive = True
+        # (target, result or ProxyTargetError) of a request already sent in detection
+        self.response: Optional[Tuple[ValidationTarget, object]] = None
+
+    def serves(self, proxy_type: str, scheme: str, target: Tuple[str, int]) -> bool:
+        """Whether a request for `scheme://target` can go over this connection"""
+        if not self.keep_alive:
+            return False
+        if self.tunnel is not None:
+            return self.tunnel == target and self.scheme in (None, scheme)
+        if not self.requests:
+            return True
+        # Absolute-form requests straight to an HTTP proxy
+        return proxy_type == 'http' and scheme == 'http'
+
+    def close(self):
+        self.writer.close()
+
+
+def split_proxy(proxy: str) -> Tuple[str, int]:
+    """Split an ip:port string into host and integer port"""
+    host, _, port = proxy.rpartition(':')
+    if not host or not port.isdigit():
+        raise ProbeError('invalid', f"Invalid proxy address: {proxy}")
+    return host, int(port)
+
+
+def classify_os_error(error: OSError) -> str:
+    """Map a socket level error to a failure reason tag"""
+    if error.errno in LOCAL_ERRNOS:
+        # Our host ran out of sockets or ports, the proxy was never asked
+        return 'local'
+    if isinstance(error, ConnectionRefusedError):
+        return 'refused'
+    if isinstance(error, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError)):
+        return 'reset'
+    if isinstance(error, socket.timeout):
+        return 'timeout'
+    return 'unreachable'
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def latency_summary(results: Iterable[Dict], points: Tuple[int, ...] = (50, 90, 99)) -> Dict[str, Dict]:
+    """p50/p90/p99 of every latency phase over a list of results"""
+    results = [result['latency'] for result in results if result.get('latency')]
+    summary = {}
+    for phase in LATENCY_PHASES:
+        ordered = sorted(latency[phase] for latency in results)
+        summary[phase] = {f"p{point}": round(percentile(ordered, point), 3) for point in points}
+    summary['count'] = len(results)
+    return summary
+
+
+class AsyncProxyEngine:
+    """Concurrent proxy tester built on asyncio streams"""
+
+    def __init__(self, test_urls: List[str], timeout: float = 10,
+                 max_concurrency: int = 500, probe_deadline: Optional[float] = None,
+                 user_agent: str = DEFAULT_USER_AGENT, max_body_bytes: int = 65536,
+                 prefilter: bool = True, connect_timeout: float = 3, retries: int = 0,
+                 adaptive: bool = False, min_concurrency: int = 20,
+                 target_strategy: str = 'ordered', classify: bool = True,
+                 own_ips: Optional[Iterable[str]] = None, target_rate: float = 0,
+                 subnet_rate: float = 0, detect: bool = False,
+                 edge_headers: Optional[Dict[str, Dict[str, str]]] = None):
+        self.test_urls = list(test_urls)
+        # Which test URL each probe tries first; `{nonce}` URLs must echo a nonce
+        self.targets = TargetPool(self.test_urls, target_strategy)
+        self.timeout = timeout  # seconds per network step
+        self.max_concurrency = max_concurrency
+        # Grow and shrink the probes in flight between min_concurrency and
+        # max_concurrency from local error rate and event-loop lag
+        self.adaptive = adaptive
+        self.min_concurrency = min_concurrency
+        self.concurrency_report: Dict = {}
+        self.concurrency_timeline: List[Dict] = []
+        # Hard cap for a whole probe, across every test URL
+        self.probe_deadline = probe_deadline or timeout * max(len(self.test_urls), 1)
+        self.user_agent = user_agent
+        self.max_body_bytes = max_body_bytes
+        # Stage 1: short TCP connect (+ SOCKS greeting) before the HTTP check
+        self.prefilter = prefilter
+        self.connect_timeout = connect_timeout
+        # Fingerprint the protocol instead of trusting the list (replaces the pre-filter)
+        self.detect = detect
+        # Extra validation attempts after a timeout or reset
+        self.retries = retries
+        # Tag working proxies transparent / anonymous / elite from the echo body;
+        # own_ips is what the targets see without a proxy, found once per engine
+        # unless given (worker processes get the parent's)
+        self.classify = classify
+        self.own_ips: Set[str] = set(own_ips or ())
+        self._own_ips_checked = own_ips is not None
+        # Proxy-like headers each target host's own edge adds, seen on that same direct request
+        self.edge_headers: Dict[str, Dict[str, str]] = dict(edge_headers or {})
+        # Token buckets per test URL and per proxy /24 (requests per second, 0 = unlimited)
+        self.rate_limits = RateLimits(target_rate, subnet_rate)
+        self.stage_stats: Dict[str, Dict] = {}
+        self._stage_windows: Dict[str, List[float]] = {}
+        self.reset_stage_stats()
+        # Probes started over the engine's lifetime and running right now
+        self.started = 0
+        self.in_flight = 0
+        self._resolved_targets: Dict[Tuple[str, int], str] = {}
+        self._targets_resolved = False
+        self._ssl_context = ssl.create_default_context()
+        # Skip SSL verification for faster testing, same as verify=False
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+
+    # ------------------------------------------------------------------
+    # Public entry points
+    # ------------------------------------------------------------------
+
+    def test_proxies(self, proxies: Iterable[str], proxy_type: str,
+                     on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Test proxies and return the working ones (blocking wrapper)"""
+        return asyncio.run(self.run(proxies, proxy_type, on_result))
+
+    def test_proxy(self, proxy: str, proxy_type: str) -> Dict:
+        """Test a single proxy and return its outcome (blocking wrapper)"""
+        return asyncio.run(self.probe(proxy, proxy_type))
+
+    def prepare(self) -> Set[str]:
+        """Resolve the test URL hosts and our own IP ahead of a run (blocking wrapper)"""
+        asyncio.run(self._resolve_targets())
+        return self.own_ips
+
+    async def run(self, proxies: Iterable[str], proxy_type: str,
+                  on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Probe every proxy with at most `max_concurrency` probes in flight"""
+        if proxy_type not in SUPPORTED_TYPES:
+            raise ValueError(f"Unknown proxy type: {proxy_type}")
+
+        await self._resolve_targets()
+        self.reset_stage_stats()
+        self.concurrency_timeline = []
+
+        ceiling = fd_concurrency_cap(max(1, self.max_concurrency))
+        if ceiling < self.max_concurrency:
+            print(f"⚠️  Open file limit allows {ceiling} concurrent probes (asked for {self.max_concurrency})")
+        controller = None
+        if self.adaptive:
+            controller = AdaptiveConcurrency(ceiling, minimum=self.min_concurrency)
+        limit = controller.limit if controller else ceiling
+
+        working_proxies = []
+        # Spread over /24s when those are rate limited, so workers do not queue on one bucket
+        pending = iter(self.rate_limits.order(proxies))
+        workers = set()
+        exhausted = False
+
+        async def worker():
+            nonlocal exhausted
+            try:
+                for proxy in pending:
+                    outcome = await self._probe_local_retry(proxy, proxy_type, controller)
+                    if outcome['working']:
+                        working_proxies.append(self.to_result(outcome))
+                    if on_result:
+                        on_result(outcome)
+                    if controller and len(workers) > controller.limit:
+                        # The limit was cut: retire this worker
+                        return
+                exhausted = True
+            finally:
+                workers.discard(asyncio.current_task())
+
+        def spawn(count: int):
+            for _ in range(count):
+                workers.add(asyncio.create_task(worker()))
+
+        spawn(limit)
+        tasks = set(workers)
+        try:
+            if controller:
+                while workers:
+                    tick = time.monotonic()
+                    await asyncio.wait(set(workers), timeout=controller.interval)
+                    # A busy loop wakes us late; that delay is the loop lag
+                    loop_lag = max(0.0, time.monotonic() - tick - controller.interval) if workers else 0.0
+                    limit = controller.observe(loop_lag, len(workers), demand=not exhausted)
+                    if not exhausted and len(workers) < limit:
+                        before = set(workers)
+                        spawn(limit - len(workers))
+                        tasks |= workers - before
+                self.concurrency_report = controller.report()
+                self.concurrency_timeline = controller.timeline
+            else:
+                await asyncio.gather(*workers)
+                self.concurrency_report = {'final': limit, 'min': limit, 'max': limit, 'mean': limit,
+                                           'ceiling': ceiling}
+            for task in tasks:
+                # Surface errors raised in on_result callbacks
+                if task.done() and not task.cancelled() and task.exception():
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return working_proxies
+
+    async def _probe_local_retry(self, proxy: str, proxy_type: str,
+                                 controller: Optional[AdaptiveConcurrency]) -> Dict:
+        """Probe, trying again when the failure was our own fd/port exhaustion"""
+        for attempt in range(LOCAL_ATTEMPTS):
+            outcome = await self.probe(proxy, proxy_type)
+            local_error = outcome['reason'] == 'local'
+            if controller:
+                controller.record(local_error)
+            if not local_error:
+                break
+            # Give the controller time to shrink the pool before trying again
+            await asyncio.sleep(0.5 * (attempt + 1))
+        return outcome
+
+    async def probe(self, proxy: str, proxy_type: str) -> Dict:
+        """Test one proxy (pre-filter, then HTTP validation) and describe the outcome"""
+        outcome = {
+            'proxy': proxy,
+            'type': proxy_type,
+            # Protocol detection may change `type`; the list's history and cache rows use this one
+            'listed_type': proxy_type,
+            'working': False,
+            'response_time': 0,
+            'message': '',
+            'reason': '',
+            'stage': 'validate',
+            'latency': None,
+            'anonymity': None,
+            'egress_ip': None,
+        }
+        if not self._targets_resolved:
+            await self._resolve_targets()
+
+        conn = None
+        self.started += 1
+        self.in_flight += 1
+        try:
+            # Outside the stage deadlines: waiting on our own limit is not the proxy's fault
+            await self.rate_limits.acquire_subnet(proxy)
+            # Picked before stage 1, so a tunnel opened there leads to the URL tried first
+            targets = self.targets.order()
+            first = targets[0] if targets else None
+            if self.detect:
+                outcome['stage'] = 'detect'
+                # The connection that matched carries on into validation; an HTTP
+                # fingerprint may include the first test URL's request
+                proxy_type, conn = await self._run_stage(
+                    'detect', self._detect(proxy, proxy_type, first),
+                    self.connect_timeout * 2 * len(DETECT_ORDER) + self.timeout
+                )
+                outcome['type'] = proxy_type
+                outcome['stage'] = 'validate'
+            elif self.prefilter:
+                outcome['stage'] = 'prefilter'
+                # The connection that passed the pre-filter carries on into validation
+                conn = await self._run_stage('prefilter', self._prefilter(proxy, proxy_type, first),
+                                             self.connect_timeout * 2)
+                outcome['stage'] = 'validate'
+
+            attempt = 0
+            while True:
+                if attempt:
+                    targets = self.targets.order()
+                if targets and not (conn and conn.response):
+                    # (Detection that already asked the first target waited for it then)
+                    await self.rate_limits.acquire_target(targets[0].url)
+                    first = targets[0]
+                    if self.detect and conn and not conn.serves(proxy_type, first.scheme, (first.host, first.port)):
+                        # E.g. an HTTP CONNECT fingerprint before a plain-HTTP URL: validation connects again
+                        self.detect_stats['extra_connects'] += 1
+                try:
+                    # The deadline is applied per URL, leaving out rate-limit waits between them
+                    status, site, latency, body = await self._run_stage(
+                        'validate', self._probe_urls(proxy, proxy_type, conn, targets, self.probe_deadline), None
+                    )
+                    break
+                except (ProbeError, asyncio.TimeoutError) as e:
+                    reason = getattr(e, 'reason', 'timeout')
+                    if attempt >= self.retries or reason not in RETRYABLE_REASONS:
+                        raise
+                    attempt += 1
+                    conn = None
+            outcome['working'] = True
+            # Only the request that succeeded counts, not earlier URLs or attempts
+            outcome['latency'] = {phase: round(latency[phase], 3) for phase in LATENCY_PHASES}
+            outcome['response_time'] = latency['total']
+            outcome['message'] = f"Works with {site} ({status})"
+            if self.classify:
+                # Stage 3: read the response already received, no extra round-trip
+                started = time.monotonic()
+                outcome['anonymity'], outcome['egress_ip'] = classify_anonymity(
+                    body, self.own_ips, self.edge_headers.get(site))
+                self._account_stage('classify', started, outcome['anonymity'] is not None)
+        except ProbeError as e:
+            outcome['reason'] = e.reason
+            outcome['message'] = str(e)
+        except asyncio.TimeoutError:
+            outcome['reason'] = 'timeout'
+            outcome['message'] = f"{outcome['stage'].capitalize()} deadline exceeded"
+        except Exception as e:
+            outcome['reason'] = 'error'
+            outcome['message'] = f"Error: {e}"
+        finally:
+            self.in_flight -= 1
+            if conn:
+                conn.close()
+        outcome['tested_at'] = datetime.now().isoformat()
+        return outcome
+
+    def reset_stage_stats(self):
+        """Clear per-stage counters before a new run"""
+        self.stage_stats = {
+            stage: {'tested': 0, 'passed': 0, 'busy_seconds': 0.0, 'wall_seconds': 0.0,
+                    'duration_buckets': [0] * (len(STAGE_BUCKETS) + 1)}
+            for stage in ('prefilter', 'detect', 'validate', 'classify')
+        }
+        self._stage_windows = {}
+        self.targets.reset()
+        self.rate_limits.reset()
+        # TCP connections opened to proxies vs requests sent over one already open
+        self.connection_stats = {'opened': 0, 'reused': 0}
+        # Detect mode: endpoints speaking their listed protocol, another one, or none
+        self.detect_stats = {'as_listed': 0, 'relabelled': 0, 'undetected': 0, 'extra_connects': 0}
+
+    def stage_report(self) -> Dict[str, Dict]:
+        """Per-stage counts, survival rate and timing for the last run"""
+        report = {}
+        for stage, stats in self.stage_stats.items():
+            if not stats['tested']:
+                continue
+            report[stage] = dict(stats, duration_buckets=list(stats['duration_buckets']))
+            report[stage]['survival_rate'] = round(stats['passed'] / stats['tested'] * 100, 1)
+            report[stage]['busy_seconds'] = round(stats['busy_seconds'], 2)
+            report[stage]['wall_seconds'] = round(stats['wall_seconds'], 2)
+        if 'detect' in report:
+            report['detect'].update(self.detect_stats)
+        if 'validate' in report:
+            report['validate']['connections_opened'] = self.connection_stats['opened']
+            report['validate']['connections_reused'] = self.connection_stats['reused']
+        return report
+
+    @staticmethod
+    def to_result(outcome: Dict) -> Dict:
+        """Reduce a probe outcome to the stored result shape"""
+        return {
+            'proxy': outcome['proxy'],
+            'type': outcome['type'],
+            'response_time': round(outcome['response_time'], 2),
+            'latency': outcome['latency'],
+            'anonymity': outcome['anonymity'],
+            'egress_ip': outcome['egress_ip'],
+            'tested_at': outcome['tested_at'],
+        }
+
+    # ------------------------------------------------------------------
+    # Probe internals
+    # ------------------------------------------------------------------
+
+    async def _resolve_targets(self):
+        """Resolve test URL hosts once per run (SOCKS4 needs an IPv4 address)"""
+        loop = asyncio.get_running_loop()
+        for target in self.targets.targets:
+            key = (target.host, target.port)
+            if key in self._resolved_targets:
+                continue
+            try:
+                infos = await loop.getaddrinfo(target.host, target.port, family=socket.AF_INET,
+                                               type=socket.SOCK_STREAM)
+                self._resolved_targets[key] = infos[0][4][0]
+            except OSError as e:
+                print(f"Could not resolve test URL host {target.host}: {e}")
+        self._targets_resolved = True
+        if self.classify and not self._own_ips_checked:
+            await self._discover_own_ips()
+
+    async def _discover_own_ips(self):
+        """Ask the echo targets directly (no proxy) which address they see for us"""
+        self._own_ips_checked = True
+        for target in self.targets.targets:
+            url, _nonce = target.request_url()
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path = f"{path}?{parts.query}"
+            writer = None
+            try:
+                reader, writer = await self._step(asyncio.open_connection(
+                    target.host, target.port,
+                    ssl=self._ssl_context if target.scheme == 'https' else None,
+                    server_hostname=target.host if target.scheme == 'https' else None
+                ))
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                    f"User-Agent: {self.user_agent}\r\nAccept: */*\r\nConnection: close\r\n\r\n".encode('ascii')
+                )
+                await self._step(writer.drain())
+                status, _headers, body, _keep_alive = await self._read_response(reader)
+            except (ProbeError, ssl.SSLError, ValueError):
+                continue
+            finally:
+                if writer:
+                    writer.close()
+            origin_ips, echoed_headers = parse_echo(body) if status == 200 else ([], None)
+            if origin_ips:
+                self.own_ips.add(origin_ips[-1])
+            if echoed_headers:
+                self.edge_headers[target.host] = edge_headers(echoed_headers)
+        if not self.own_ips:
+            print("Could not determine our own IP; transparent proxies are only caught by their forwarding headers")
+
+    async def _run_stage(self, stage: str, coro, deadline: Optional[float]):
+        """Run one probe stage under a deadline (None: the stage keeps its own) and account for its time"""
+        started = time.monotonic()
+        passed = False
+        try:
+            result = await asyncio.wait_for(coro, deadline)
+            passed = True
+            return result
+        finally:
+            self._account_stage(stage, started, passed)
+
+    def _account_stage(self, stage: str, started: float, passed: bool):
+        """Count one pass through a stage that began at `started`"""
+        stats = self.stage_stats[stage]
+        stats['tested'] += 1
+        if passed:
+            stats['passed'] += 1
+        finished = time.monotonic()
+        window = self._stage_windows.setdefault(stage, [started, started])
+        stats['busy_seconds'] += finished - started
+        stats['duration_buckets'][bisect_left(STAGE_BUCKETS, finished - started)] += 1
+        window[1] = max(window[1], finished)
+        stats['wall_seconds'] = window[1] - window[0]
+
+    async def _prefilter(self, proxy: str, proxy_type: str,
+                         target: Optional[ValidationTarget] = None) -> ProxyConnection:
+        """Stage 1: TCP connect plus the SOCKS greeting, nothing at the HTTP level
+
+        A SOCKS4 proxy is asked for a tunnel to `target`, the URL validation
+        tries first, so validation goes on over that tunnel.
+        """
+        host, port = split_proxy(proxy)
+        conn = await self._connect(host, port, self.connect_timeout)
+        try:
+            mark = time.monotonic()
+            if proxy_type == 'socks5':
+                conn.writer.write(bytes([SOCKS5_VERSION, 1, SOCKS5_NO_AUTH]))
+                await self._step(conn.writer.drain(), self.connect_timeout)
+                greeting = await self._step(conn.reader.readexactly(2), self.connect_timeout)
+                if greeting[0] != SOCKS5_VERSION:
+                    raise ProbeError('handshake', 'Not a SOCKS5 proxy')
+                if greeting[1] != SOCKS5_NO_AUTH:
+                    raise ProbeError('handshake', 'SOCKS5 proxy requires authentication')
+                conn.greeted = True
+            elif proxy_type == 'socks4' and target and (target.host, target.port) in self._resolved_targets:
+                # SOCKS4 has no greeting, so the connect request is the cheapest exchange
+                target_host, target_port = target.host, target.port
+                target_ip = self._resolved_targets[(target_host, target_port)]
+                conn.writer.write(struct.pack('>BBH', 4, 1, target_port) + socket.inet_aton(target_ip) + b'\x00')
+                await self._step(conn.writer.drain(), self.connect_timeout)
+                reply = await self._step(conn.reader.readexactly(8), self.connect_timeout)
+                if reply[0] != 0x00 or reply[1] != SOCKS4_GRANTED:
+                    raise ProbeError('handshake', f"SOCKS4 request rejected (0x{reply[1]:02x})")
+                # The granted tunnel serves the test URLs on that target
+                conn.tunnel = (target_host, target_port)
+            conn.handshake_time = time.monotonic() - mark
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def _detect(self, proxy: str, listed_type: str,
+                      target: Optional[ValidationTarget] = None) -> Tuple[str, ProxyConnection]:
+        """Stage 1 in detect mode: find which protocol the endpoint speaks
+
+        The listed type is tried first, then the others in DETECT_ORDER,
+        each on a fresh connection. A reply in another protocol, a dropped
+        connection or silence moves on; a refused connect, or a handshake
+        the endpoint understood but turned down, ends detection. `target`
+        is the test URL validation tries first; the handshakes lead there.
+        """
+        host, port = split_proxy(proxy)
+        last_error = None
+        for proxy_type in (listed_type,) + tuple(t for t in DETECT_ORDER if t != listed_type):
+            conn = await self._connect(host, port, self.connect_timeout)
+            try:
+                mark = time.monotonic()
+                await self._fingerprint(conn, proxy_type, target)
+                if conn.response is None:
+                    # (A request already sent has its handshake in its own latency)
+                    conn.handshake_time = time.monotonic() - mark
+            except ProbeError as e:
+                conn.close()
+                if e.reason not in DETECT_MISMATCH_REASONS:
+                    raise
+                if last_error is None or last_error.reason != 'protocol':
+                    last_error = e
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            self.detect_stats['as_listed' if proxy_type == listed_type else 'relabelled'] += 1
+            return proxy_type, conn
+        self.detect_stats['undetected'] += 1
+        if last_error.reason == 'protocol':
+            raise ProbeError('protocol', 'Speaks none of HTTP, SOCKS4 and SOCKS5')
+        raise last_error
+
+    async def _fingerprint(self, conn: ProxyConnection, proxy_type: str,
+                           target: Optional[ValidationTarget] = None):
+        """Open a proxy handshake; ProbeError('protocol') if the reply is in another protocol
+
+        Towards a plain-HTTP target an HTTP proxy is sent the validation
+        request itself, in absolute form: any HTTP status line proves the
+        protocol, and the response is kept on the connection for
+        validation instead of being asked for again.
+        """
+        target = target or self.targets.targets[0]
+        reader, writer = conn.reader, conn.writer
+        if proxy_type == 'socks5':
+            writer.write(bytes([SOCKS5_VERSION, 1, SOCKS5_NO_AUTH]))
+            await self._step(writer.drain(), self.connect_timeout)
+            greeting = await self._step(reader.readexactly(2), self.connect_timeout)
+            if greeting[0] != SOCKS5_VERSION:
+                raise ProbeError('protocol', 'Not a SOCKS5 proxy')
+            if greeting[1] != SOCKS5_NO_AUTH:
+                raise ProbeError('handshake', 'SOCKS5 proxy requires authentication')
+            conn.greeted = True
+        elif proxy_type == 'socks4':
+            target_host, target_port = target.host, target.port
+            target_ip = self._resolved_targets.get((target_host, target_port))
+            if target_ip is None:
+                raise ProbeError('protocol', 'No resolved test URL to ask a SOCKS4 proxy for')
+            writer.write(struct.pack('>BBH', 4, 1, target_port) + socket.inet_aton(target_ip) + b'\x00')
+            await self._step(writer.drain(), self.connect_timeout)
+            reply = await self._step(reader.readexactly(8), self.connect_timeout)
+            if reply[0] != 0x00 or not SOCKS4_GRANTED <= reply[1] <= SOCKS4_GRANTED + 3:
+                raise ProbeError('protocol', 'Not a SOCKS4 proxy')
+            if reply[1] != SOCKS4_GRANTED:
+                raise ProbeError('handshake', f"SOCKS4 request rejected (0x{reply[1]:02x})")
+            conn.tunnel = (target_host, target_port)
+        elif target.scheme == 'http':
+            await self.rate_limits.acquire_target(target.url)
+            try:
+                conn.response = (target, await self._fetch_via_proxy(conn, 'http', target))
+            except ProxyTargetError as e:
+                if e.reason in ('protocol', 'reset'):
+                    # No HTTP status line came back
+                    raise ProbeError(e.reason, str(e))
+                # An HTTP answer, just not a passing one: validation moves on to the next URL
+                conn.response = (target, e)
+        else:
+            writer.write(
+                f"CONNECT {target.host}:{target.port} HTTP/1.1\r\n"
+                f"Host: {target.host}:{target.port}\r\n"
+                f"User-Agent: {self.user_agent}\r\n\r\n".encode('ascii')
+            )
+            await self._step(writer.drain(), self.connect_timeout)
+            status = self._parse_status_line(await self._step(reader.readline(), self.connect_timeout))
+            while True:
+                line = await self._step(reader.readline(), self.connect_timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            if status == 200:
+                # The tunnel is what validation would open for this target
+                conn.tunnel = (target.host, target.port)
+            else:
+                # A refused CONNECT leaves nothing to build on: validation pays
+                # for a second connect, counted as an extra connect
+                conn.keep_alive = False
+
+    async def _probe_urls(self, proxy: str, proxy_type: str, conn: Optional[ProxyConnection] = None,
+                          targets: Optional[List[ValidationTarget]] = None, deadline: Optional[float] = None
+                          ) -> Tuple[int, str, Dict[str, float], bytes]:
+        """Try each test URL in turn, stopping at the first 200
+
+        One connection is kept across URLs while it can serve them, so a
+        target that answers badly does not cost a new connect and handshake.
+        The caller has already waited for the first target's rate limit.
+        `deadline` caps the time spent on the proxy across all URLs; waiting
+        on a fallback target's rate limit does not count against it.
+        """
+        host, port = split_proxy(proxy)
+        last_error = ProbeError('error', 'No test URLs configured')
+
+        async def fetch(target: ValidationTarget) -> Tuple[int, Dict[str, float], bytes]:
+            nonlocal conn
+            if conn and conn.response and conn.response[0] is target:
+                # Detection already sent this request
+                response, conn.response = conn.response[1], None
+                if isinstance(response, ProxyTargetError):
+                    raise response
+                return response
+            if conn and not conn.serves(proxy_type, target.scheme, (target.host, target.port)):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = await self._connect(host, port)
+                return await self._fetch_via_proxy(conn, proxy_type, target)
+            self.connection_stats['reused'] += 1
+            try:
+                return await self._fetch_via_proxy(conn, proxy_type, target)
+            except ProbeError as e:
+                if e.reason != 'reset':
+                    raise
+                # The proxy dropped a connection that sat idle (keep-alive, or the
+                # pre-filter's while waiting on the rate limit): not its fault
+                conn.close()
+                conn = await self._connect(host, port)
+                return await self._fetch_via_proxy(conn, proxy_type, target)
+
+        remaining = deadline
+        try:
+            for index, target in enumerate(targets or self.targets.order()):
+                if index:
+                    await self.rate_limits.acquire_target(target.url)
+                started = time.monotonic()
+                try:
+                    status, latency, body = await asyncio.wait_for(fetch(target), remaining)
+                    return status, target.host, latency, body
+                except ProxyTargetError as e:
+                    # The proxy answered, so the next URL may still work
+                    last_error = e
+                except ProbeError:
+                    # The proxy itself is broken, other URLs will not help
+                    raise
+                finally:
+                    if remaining is not None:
+                        remaining -= time.monotonic() - started
+            raise last_error
+        finally:
+            if conn:
+                conn.close()
+
+    async def _fetch_via_proxy(self, conn: ProxyConnection, proxy_type: str,
+                               target: ValidationTarget) -> Tuple[int, Dict[str, float], bytes]:
+        """Fetch a validation target and keep its load and outcome counters"""
+        target.in_flight += 1
+        target.stats['requests'] += 1
+        try:
+            result = await self._fetch_url(conn, proxy_type, *target.request_url())
+        except ProxyTargetError as e:
+            target.stats['nonce_mismatch' if e.reason == 'nonce' else 'failed'] += 1
+            raise
+        except BaseException:
+            target.stats['failed'] += 1
+            raise
+        finally:
+            target.in_flight -= 1
+        target.stats['ok'] += 1
+        return result
+
+    async def _fetch_url(self, conn: ProxyConnection, proxy_type: str, test_url: str,
+                         nonce: Optional[str] = None) -> Tuple[int, Dict[str, float], bytes]:
+        """GET the test URL over a proxy connection, opening a tunnel if needed
+
+        Returns the status and how long each phase took: TCP connect to the
+        proxy, proxy handshake (CONNECT / SOCKS), TLS, time to the first
+        response byte after the request was sent, and the total. Phases
+        already paid for on a reused connection count as zero. The body is
+        returned too, for the classification stage.
+        """
+        parts = urlsplit(test_url)
+        target_host = parts.hostname
+        target_port = parts.port or (443 if parts.scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        latency = dict.fromkeys(LATENCY_PHASES, 0.0)
+        # Connect and pre-filter handshake happened before this call
+        latency['connect'], latency['handshake'] = conn.connect_time, conn.handshake_time
+        spent = conn.connect_time + conn.handshake_time
+        conn.connect_time = conn.handshake_time = 0.0
+        # Only a complete, keep-alive response leaves the connection usable
+        conn.keep_alive = False
+        reader, writer = conn.reader, conn.writer
+        started = mark = time.monotonic()
+
+        if proxy_type == 'http' and parts.scheme == 'http':
+            # Plain HTTP through an HTTP proxy uses an absolute-form request
+            request_target = test_url
+        else:
+            if conn.tunnel is None:
+                if proxy_type == 'http':
+                    await self._http_connect(reader, writer, target_host, target_port)
+                elif proxy_type == 'socks4':
+                    await self._socks4_connect(reader, writer, target_host, target_port)
+                else:
+                    await self._socks5_connect(reader, writer, target_host, target_port, conn.greeted)
+                conn.tunnel = (target_host, target_port)
+                now = time.monotonic()
+                latency['handshake'] += now - mark
+                mark = now
+            if parts.scheme == 'https' and conn.scheme is None:
+                await self._start_tls(writer, target_host)
+                now = time.monotonic()
+                latency['tls'] = now - mark
+                mark = now
+            request_target = path
+        conn.scheme = parts.scheme
+        conn.requests += 1
+
+        request = (
+            f"GET {request_target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: {self.user_agent}\r\n"
+            "Accept: */*\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(request.encode('ascii'))
+        await self._step(writer.drain())
+        status, _headers, body, conn.keep_alive = await self._read_response(reader, latency, mark)
+        if status != 200:
+            raise ProxyTargetError('http_status', f"{target_host} answered {status}")
+        if nonce and nonce.encode('ascii') not in body:
+            # A cached page or a response made up by the proxy
+            raise ProxyTargetError('nonce', f"{target_host} response did not echo the nonce")
+        latency['total'] = spent + time.monotonic() - started
+        return status, latency, body
+
+    async def _step(self, awaitable, timeout: Optional[float] = None):
+        """Await one network step with the per-step timeout"""
+        timeout = timeout or self.timeout
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise ProbeError('timeout', f"Timed out after {timeout}s")
+        except asyncio.IncompleteReadError:
+            raise ProbeError('reset', 'Connection closed by proxy')
+        except OSError as e:
+            raise ProbeError(classify_os_error(e), str(e) or type(e).__name__)
+
+    async def _connect(self, host: str, port: int, timeout: Optional[float] = None) -> ProxyConnection:
+        """Open a TCP connection to the proxy"""
+        started = time.monotonic()
+        reader, writer = await self._step(asyncio.open_connection(host, port), timeout)
+        self.connection_stats['opened'] += 1
+        return ProxyConnection(reader, writer, time.monotonic() - started)
+
+    async def _start_tls(self, writer: asyncio.StreamWriter, server_hostname: str):
+        """Upgrade an established tunnel to TLS"""
+        if not hasattr(writer, 'start_tls'):
+            raise ProxyTargetError('tls', 'HTTPS test URLs need Python 3.11+')
+        try:
+            await self._step(writer.start_tls(self._ssl_context, server_hostname=server_hostname))
+        except ssl.SSLError as e:
+            raise ProxyTargetError('tls', f"TLS handshake failed: {e}")
+
+    async def _http_connect(self, reader, writer, target_host: str, target_port: int):
+        """Ask an HTTP proxy for a CONNECT tunnel"""
+        writer.write(
+            f"CONNECT {target_host}:{target_port} HTTP/1.1\r\n"
+            f"Host: {target_host}:{target_port}\r\n"
+            f"User-Agent: {self.user_agent}\r\n\r\n".encode('ascii')
+        )
+        await self._step(writer.drain())
+        status_line = await self._step(reader.readline())
+        status = self._parse_status_line(status_line)
+        # Drain the proxy's response headers
+        while True:
+            line = await self._step(reader.readline())
+            if line in (b'\r\n', b'\n', b''):
+                break
+        if status != 200:
+            raise ProbeError('handshake', f"CONNECT refused with {status}")
+
+    async def _socks4_connect(self, reader, writer, target_host: str, target_port: int):
+        """Open a SOCKS4 tunnel to an IPv4 target"""
+        target_ip = self._resolved_targets.get((target_host, target_port))
+        if not target_ip:
+            raise ProxyTargetError('resolve', f"Could not resolve {target_host}")
+        writer.write(struct.pack('>BBH', 4, 1, target_port) + socket.inet_aton(target_ip) + b'\x00')
+        await self._step(writer.drain())
+        reply = await self._step(reader.readexactly(8))
+        if reply[1] != SOCKS4_GRANTED:
+            raise ProbeError('handshake', f"SOCKS4 request rejected (0x{reply[1]:02x})")
+
+    async def _socks5_connect(self, reader, writer, target_host: str, target_port: int,
+                              greeted: bool = False):
+        """Open a SOCKS5 tunnel, resolving the target locally like socks5://"""
+        if not greeted:
+            writer.write(bytes([SOCKS5_VERSION, 1, SOCKS5_NO_AUTH]))
+            await self._step(writer.drain())
+            greeting = await self._step(reader.readexactly(2))
+            if greeting[0] != SOCKS5_VERSION or greeting[1] != SOCKS5_NO_AUTH:
+                raise ProbeError('handshake', 'SOCKS5 proxy requires authentication')
+
+        target_ip = self._resolved_targets.get((target_host, target_port))
+        if target_ip:
+            address = b'\x01' + socket.inet_aton(target_ip)
+        else:
+            encoded = target_host.encode('idna')
+            address = b'\x03' + bytes([len(encoded)]) + encoded
+        writer.write(bytes([SOCKS5_VERSION, 1, 0]) + address + struct.pack('>H', target_port))
+        await self._step(writer.drain())
+
+        reply = await self._step(reader.readexactly(4))
+        if reply[1] != 0x00:
+            raise ProbeError('handshake', f"SOCKS5 connect rejected (0x{reply[1]:02x})")
+        # Skip the bound address that follows the reply header
+        address_type = reply[3]
+        if address_type == 0x01:
+            await self._step(reader.readexactly(4 + 2))
+        elif address_type == 0x04:
+            await self._step(reader.readexactly(16 + 2))
+        else:
+            length = await self._step(reader.readexactly(1))
+            await self._step(reader.readexactly(length[0] + 2))
+
+    @staticmethod
+    def _parse_status_line(line: bytes) -> int:
+        """Extract the status code from an HTTP status line"""
+        if not line:
+            raise ProbeError('reset', 'Connection closed by proxy')
+        parts = line.split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+            raise ProbeError('protocol', 'Proxy did not speak HTTP')
+        return int(parts[1])
+
+    async def _read_response(self, reader: asyncio.StreamReader, latency: Optional[Dict[str, float]] = None,
+                             request_started: float = 0.0) -> Tuple[int, Dict[str, str], bytes, bool]:
+        """Read status, headers and a size-capped body from the target
+
+        The last value says whether the connection can carry another
+        request: the whole body was read and neither side asked to close.
+        """
+        status_line = await self._step(reader.readline())
+        if latency is not None:
+            latency['ttfb'] = time.monotonic() - request_started
+        try:
+            status = self._parse_status_line(status_line)
+        except ProbeError as e:
+            raise ProxyTargetError(e.reason, str(e))
+
+        headers = {}
+        while True:
+            line = await self._step(reader.readline())
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        if status_line.startswith(b'HTTP/1.0'):
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+
+        body = b''
+        complete = False
+        if status in (204, 304) or status < 200:
+            # No body by definition; waiting for one would hang a keep-alive connection
+            complete = True
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while len(body) < self.max_body_bytes:
+                size_line = await self._step(reader.readline())
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Trailer section ends with an empty line
+                    while (await self._step(reader.readline())) not in (b'\r\n', b'\n', b''):
+                        pass
+                    complete = True
+                    break
+                body += await self._step(reader.readexactly(size))
+                await self._step(reader.readline())
+        elif 'content-length' in headers:
+            declared = int(headers['content-length'])
+            length = min(declared, self.max_body_bytes)
+            body = await self._step(reader.readexactly(length))
+            complete = length == declared
+        else:
+            # Delimited by the end of the connection; one read may return only part of it
+            while len(body) < self.max_body_bytes:
+                data = await self._step(reader.read(self.max_body_bytes - len(body)))
+                if not data:
+                    break
+                body += data
+
+        return status, headers, body, keep_alive and complete
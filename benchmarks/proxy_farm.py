@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Local Proxy Farm
+Fake HTTP, SOCKS4 and SOCKS5 proxies on 127.0.0.1 with a configurable mix
+of dead ports, blackholes (accept, then hang), slow responders and
+healthy proxies, plus one HTTP endpoint that serves the IP echo, the
+proxy source lists and a minimal stand-in for the Appwrite documents API.
+
+Run it on its own to get a farm for manual testing:
+
+    python benchmarks/proxy_farm.py --per-type 300 --dead 0.3 --blackhole 0.1
+
+The first line printed is a JSON manifest with the echo URL, the source
+list URLs and the expected number of working proxies per type.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import struct
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+PROXY_TYPES = ('http', 'socks4', 'socks5')
+# Every probe ends at the echo endpoint, so its accept queue must take a burst
+LISTEN_BACKLOG = 4096
+BEHAVIOURS = ('dead', 'blackhole', 'slow', 'healthy')
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Copy bytes one way until either side closes"""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+class ProxyFarm:
+    """Fake proxies and the endpoints they are tested against"""
+
+    def __init__(self, per_type: int = 300, dead: float = 0.3, blackhole: float = 0.1,
+                 slow: float = 0.1, slow_delay: float = 0.5, seed: int = 1,
+                 host: str = '127.0.0.1'):
+        if dead + blackhole + slow > 1:
+            raise ValueError("dead + blackhole + slow must not exceed 1")
+        self.per_type = per_type
+        self.fractions = {'dead': dead, 'blackhole': blackhole, 'slow': slow}
+        self.slow_delay = slow_delay
+        self.random = random.Random(seed)
+        self.host = host
+        self.servers: List[asyncio.AbstractServer] = []
+        self.reserved: List[socket.socket] = []
+        self.lists: Dict[str, str] = {}
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.api_requests = 0
+        self.echo_port = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> Dict:
+        """Start every server and return the manifest"""
+        echo = await asyncio.start_server(self._handle_http_endpoint, self.host, 0,
+                                          backlog=LISTEN_BACKLOG)
+        self.servers.append(echo)
+        self.echo_port = echo.sockets[0].getsockname()[1]
+
+        for proxy_type in PROXY_TYPES:
+            behaviours = []
+            for behaviour, fraction in self.fractions.items():
+                behaviours += [behaviour] * int(round(self.per_type * fraction))
+            behaviours = behaviours[:self.per_type]
+            behaviours += ['healthy'] * (self.per_type - len(behaviours))
+            self.random.shuffle(behaviours)
+
+            entries = []
+            for behaviour in behaviours:
+                port = await self._start_proxy(proxy_type, behaviour)
+                entries.append(f"{self.host}:{port}")
+            self.lists[proxy_type] = '\n'.join(entries) + '\n'
+            self.counts[proxy_type] = {behaviour: behaviours.count(behaviour) for behaviour in BEHAVIOURS}
+
+        return self.manifest()
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        for server in self.servers:
+            await server.wait_closed()
+        for sock in self.reserved:
+            sock.close()
+        self.servers = []
+        self.reserved = []
+
+    def manifest(self) -> Dict:
+        base_url = f"http://{self.host}:{self.echo_port}"
+        return {
+            'echo_url': f"{base_url}/ip",
+            'appwrite_endpoint': f"{base_url}/v1",
+            'lists': {proxy_type: f"{base_url}/lists/{proxy_type}.txt" for proxy_type in PROXY_TYPES},
+            'proxies': self.counts,
+            'slow_delay': self.slow_delay,
+        }
+
+    async def _start_proxy(self, proxy_type: str, behaviour: str) -> int:
+        if behaviour == 'dead':
+            # Bound but not listening: connects are refused and the port
+            # cannot be handed to another fake proxy while the farm runs
+            sock = socket.socket()
+            sock.bind((self.host, 0))
+            self.reserved.append(sock)
+            return sock.getsockname()[1]
+
+        if behaviour == 'blackhole':
+            handler = self._handle_blackhole
+        else:
+            delay = self.slow_delay if behaviour == 'slow' else 0
+            handler = {
+                'http': self._handle_http_proxy,
+                'socks4': self._handle_socks4,
+                'socks5': self._handle_socks5,
+            }[proxy_type]
+            handler = self._delayed(handler, delay)
+
+        server = await asyncio.start_server(handler, self.host, 0)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    @staticmethod
+    def _delayed(handler, delay: float):
+        async def wrapper(reader, writer):
+            try:
+                if delay:
+                    await asyncio.sleep(delay)
+                await handler(reader, writer)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError, ValueError):
+                writer.close()
+        return wrapper
+
+    # ------------------------------------------------------------------
+    # Endpoint: IP echo, source lists, fake Appwrite API
+    # ------------------------------------------------------------------
+
+    async def _handle_http_endpoint(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = await read_headers(reader)
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+
+                parts = urlsplit(target)
+                path = parts.path
+                status, content_type = 200, 'application/json'
+                if path == '/ip':
+                    # Same shape as echo_server.py, nonce included
+                    body = json.dumps({
+                        'origin': writer.get_extra_info('peername')[0],
+                        'nonce': parse_qs(parts.query).get('nonce', [None])[0],
+                        'headers': headers,
+                    })
+                elif path.startswith('/lists/') and path[7:-4] in self.lists:
+                    body, content_type = self.lists[path[7:-4]], 'text/plain'
+                elif path.startswith('/v1/databases/'):
+                    # Enough of the documents API for list/upsert calls to succeed
+                    self.api_requests += 1
+                    body = json.dumps({'total': 0, 'documents': []})
+                else:
+                    status, body = 404, json.dumps({'message': 'Not found', 'code': 404})
+
+                payload = body.encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    # ------------------------------------------------------------------
+    # Proxy behaviours
+    # ------------------------------------------------------------------
+
+    async def _handle_blackhole(self, reader, writer):
+        """Accept, then never answer"""
+        try:
+            while await reader.read(65536):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _tunnel(self, reader, writer, target_host: str, target_port: int,
+                      reply: bytes, first_bytes: bytes = b''):
+        upstream_reader, upstream_writer = await asyncio.open_connection(target_host, target_port)
+        if reply:
+            writer.write(reply)
+        if first_bytes:
+            upstream_writer.write(first_bytes)
+        await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+
+    async def _handle_http_proxy(self, reader, writer):
+        request_line = await reader.readline()
+        method, target, version = request_line.decode('latin-1').split(' ', 2)
+        raw_headers = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            raw_headers.append(line)
+
+        if method == 'CONNECT':
+            target_host, _, target_port = target.rpartition(':')
+            await self._tunnel(reader, writer, target_host, int(target_port),
+                               b'HTTP/1.1 200 Connection established\r\n\r\n')
+            return
+
+        parts = urlsplit(target)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        request = f"{method} {path} {version}".encode('latin-1') + b''.join(raw_headers) + b'\r\n'
+        await self._tunnel(reader, writer, parts.hostname, parts.port or 80, b'', request)
+
+    async def _handle_socks4(self, reader, writer):
+        header = await reader.readexactly(8)
+        while (await reader.readexactly(1)) != b'\x00':
+            pass  # user id
+        target_port = struct.unpack('>H', header[2:4])[0]
+        target_ip = socket.inet_ntoa(header[4:8])
+        await self._tunnel(reader, writer, target_ip, target_port, b'\x00\x5a' + header[2:8])
+
+    async def _handle_socks5(self, reader, writer):
+        greeting = await reader.readexactly(2)
+        await reader.readexactly(greeting[1])
+        writer.write(b'\x05\x00')
+        request = await reader.readexactly(4)
+        if request[3] == 0x01:
+            target_host = socket.inet_ntoa(await reader.readexactly(4))
+        else:
+            length = (await reader.readexactly(1))[0]
+            target_host = (await reader.readexactly(length)).decode('idna')
+        target_port = struct.unpack('>H', await reader.readexactly(2))[0]
+        await self._tunnel(reader, writer, target_host, target_port,
+                           b'\x05\x00\x00\x01' + socket.inet_aton('127.0.0.1') + b'\x00\x00')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a local farm of fake proxies")
+    parser.add_argument('--per-type', type=int, default=300, help="Fake proxies per type (default: 300)")
+    parser.add_argument('--dead', type=float, default=0.3, help="Fraction of refused ports (default: 0.3)")
+    parser.add_argument('--blackhole', type=float, default=0.1,
+                        help="Fraction that accept and never answer (default: 0.1)")
+    parser.add_argument('--slow', type=float, default=0.1, help="Fraction of slow responders (default: 0.1)")
+    parser.add_argument('--slow-delay', type=float, default=0.5,
+                        help="Seconds a slow proxy waits before its first reply (default: 0.5)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for the behaviour shuffle (default: 1)")
+    return parser
+
+
+async def serve(args: argparse.Namespace, duration: Optional[float] = None):
+    farm = ProxyFarm(args.per_type, args.dead, args.blackhole, args.slow, args.slow_delay, args.seed)
+    manifest = await farm.start()
+    print(json.dumps(manifest), flush=True)
+    try:
+        if duration:
+            await asyncio.sleep(duration)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await farm.close()
+
+
+def main():
+    try:
+        asyncio.run(serve(build_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
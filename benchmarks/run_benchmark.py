@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Checker Throughput Benchmark
+Starts the local proxy farm, runs ProxyFinder and/or AppwriteProxyChecker
+against it (no internet, no live proxies) and reports probes/sec, wall
+time, CPU time and peak RSS for each run.
+
+    python benchmarks/run_benchmark.py --per-type 500 --concurrency 500
+    python benchmarks/run_benchmark.py --checker both --repeat 3 --json bench.json
+
+Each checker runs in its own process, started through this script in
+measuring mode, so CPU and RSS belong to the checker alone and not to the
+farm or the harness.
+"""
+
+import argparse
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, CPU/RSS are reported as n/a
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+PROXY_TYPES = ('http', 'socks4', 'socks5')
+
+CHECKERS = {
+    'finder': ('proxy_finder.py', 'working_{type}_latest.txt'),
+    'appwrite': ('github_actions_proxy_checker.py', 'working_{type}_proxies.txt'),
+}
+
+
+def measure(report_path: str, script: str, argv: List[str]):
+    """Run a checker script in this process and write its resource usage"""
+    sys.argv = [script] + argv
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    started = time.monotonic()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        usage = {'wall_seconds': time.monotonic() - started}
+        if resource:
+            rusage = resource.getrusage(resource.RUSAGE_SELF)
+            usage['cpu_seconds'] = rusage.ru_utime + rusage.ru_stime
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            usage['peak_rss_mb'] = rusage.ru_maxrss * scale / (1024 * 1024)
+        with open(report_path, 'w') as f:
+            json.dump(usage, f)
+
+
+def start_farm(args: argparse.Namespace):
+    """Start the farm in a child process and wait for its manifest"""
+    farm = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'proxy_farm.py'),
+         '--per-type', str(args.per_type), '--dead', str(args.dead),
+         '--blackhole', str(args.blackhole), '--slow', str(args.slow),
+         '--slow-delay', str(args.slow_delay), '--seed', str(args.seed)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = farm.stdout.readline()
+    if not line:
+        farm.kill()
+        raise RuntimeError("Proxy farm did not start")
+    return farm, json.loads(line)
+
+
+def write_config(run_dir: str, manifest: Dict) -> str:
+    config_path = os.path.join(run_dir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({'settings': {
+            'test_urls': [f"{manifest['echo_url']}?nonce={{nonce}}"],
+            'proxy_sources': manifest['lists'],
+            'history_db': '',
+            'negative_cache': '',
+            # One local echo target and one /24: limits would only measure themselves
+            'target_rate': 0,
+            'subnet_rate': 0,
+            'source_cache_dir': os.path.join(run_dir, '.proxy_cache'),
+        }}, f, indent=2)
+    return config_path
+
+
+def expected_working(manifest: Dict, timeout: float) -> Dict[str, int]:
+    """Healthy proxies, plus slow ones if they answer within the timeout"""
+    expected = {}
+    for proxy_type, counts in manifest['proxies'].items():
+        expected[proxy_type] = counts['healthy']
+        if manifest['slow_delay'] < timeout:
+            expected[proxy_type] += counts['slow']
+    return expected
+
+
+def run_checker(checker: str, args: argparse.Namespace, manifest: Dict, run_dir: str) -> Dict:
+    """Run one checker against the farm and collect its numbers"""
+    script, output_pattern = CHECKERS[checker]
+    config_path = write_config(run_dir, manifest)
+    report_path = os.path.join(run_dir, 'usage.json')
+    log_path = os.path.join(run_dir, 'output.log')
+
+    checker_args = [
+        '--config', config_path,
+        '--concurrency', str(args.concurrency),
+        '--timeout', str(args.timeout),
+        '--connect-timeout', str(args.connect_timeout),
+        '--no-prefilter' if args.no_prefilter else '--prefilter',
+    ]
+    env = dict(os.environ)
+    env.update({
+        'APPWRITE_ENDPOINT': manifest['appwrite_endpoint'],
+        'APPWRITE_PROJECT_ID': 'benchmark',
+        'APPWRITE_API_KEY': 'benchmark',
+        'APPWRITE_DATABASE_ID': 'benchmark',
+        'APPWRITE_COLLECTION_ID': 'benchmark',
+    })
+    for name in ('PROXY_TYPE', 'PROXY_CONFIG', 'MAX_CONCURRENCY', 'PROBE_TIMEOUT', 'TEST_URLS', 'HISTORY_DB'):
+        env.pop(name, None)
+
+    with open(log_path, 'w') as log:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--measure', report_path, '--',
+             os.path.join(REPO_DIR, script)] + checker_args,
+            cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    usage = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            usage = json.load(f)
+
+    found = {}
+    for proxy_type in PROXY_TYPES:
+        path = os.path.join(run_dir, 'working_proxies', output_pattern.format(type=proxy_type))
+        if os.path.exists(path):
+            with open(path) as f:
+                found[proxy_type] = sum(1 for line in f if line.strip())
+        else:
+            found[proxy_type] = 0
+
+    probes = args.per_type * len(PROXY_TYPES)
+    wall = usage.get('wall_seconds', 0)
+    return {
+        'checker': checker,
+        'exit_code': completed.returncode,
+        'probes': probes,
+        'wall_seconds': round(wall, 2),
+        'probes_per_second': round(probes / wall, 1) if wall else 0,
+        'cpu_seconds': round(usage['cpu_seconds'], 2) if 'cpu_seconds' in usage else None,
+        'cpu_percent': round(usage['cpu_seconds'] / wall * 100, 1) if wall and 'cpu_seconds' in usage else None,
+        'peak_rss_mb': round(usage['peak_rss_mb'], 1) if 'peak_rss_mb' in usage else None,
+        'working_found': found,
+        'working_expected': expected_working(manifest, args.timeout),
+        'log': log_path,
+    }
+
+
+def print_result(result: Dict):
+    found = sum(result['working_found'].values())
+    expected = sum(result['working_expected'].values())
+    cpu = f"{result['cpu_seconds']}s ({result['cpu_percent']}%)" if result['cpu_seconds'] is not None else 'n/a'
+    rss = f"{result['peak_rss_mb']} MB" if result['peak_rss_mb'] is not None else 'n/a'
+    print(f"  {result['checker']:<9} {result['probes']} probes in {result['wall_seconds']}s "
+          f"= {result['probes_per_second']} probes/s | CPU {cpu} | peak RSS {rss} | "
+          f"working {found}/{expected}{'' if found == expected else ' ⚠️'}"
+          f"{'' if result['exit_code'] == 0 else ' (exit ' + str(result['exit_code']) + ', see ' + result['log'] + ')'}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the checkers against a local proxy farm")
+    parser.add_argument('--checker', choices=['finder', 'appwrite', 'both'], default='finder')
+    parser.add_argument('--per-type', type=int, default=300, help="Fake proxies per type (default: 300)")
+    parser.add_argument('--dead', type=float, default=0.3)
+    parser.add_argument('--blackhole', type=float, default=0.1)
+    parser.add_argument('--slow', type=float, default=0.1)
+    parser.add_argument('--slow-delay', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=2.0,
+                        help="Checker read timeout; blackholes cost this much each (default: 2)")
+    parser.add_argument('--connect-timeout', type=float, default=1.0)
+    parser.add_argument('--no-prefilter', action='store_true')
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per checker (default: 1)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--keep', action='store_true', help="Keep the run directories (logs, outputs)")
+    return parser
+
+
+def main():
+    if len(sys.argv) > 3 and sys.argv[1] == '--measure' and sys.argv[3] == '--':
+        measure(sys.argv[2], sys.argv[4], sys.argv[5:])
+        return
+
+    args = build_parser().parse_args()
+    checkers = list(CHECKERS) if args.checker == 'both' else [args.checker]
+
+    farm, manifest = start_farm(args)
+    print(f"Proxy farm: {args.per_type} per type, "
+          f"{args.dead:.0%} dead, {args.blackhole:.0%} blackhole, {args.slow:.0%} slow "
+          f"({args.slow_delay}s), echo at {manifest['echo_url']}")
+    print(f"Checker settings: concurrency {args.concurrency}, timeout {args.timeout}s, "
+          f"connect timeout {args.connect_timeout}s, pre-filter {'off' if args.no_prefilter else 'on'}")
+
+    results = []
+    base_dir = tempfile.mkdtemp(prefix='proxy-bench-')
+    try:
+        for checker in checkers:
+            for run in range(args.repeat):
+                run_dir = os.path.join(base_dir, f"{checker}-{run + 1}")
+                os.makedirs(run_dir)
+                result = run_checker(checker, args, manifest, run_dir)
+                results.append(result)
+                print_result(result)
+    finally:
+        farm.terminate()
+        farm.wait()
+        # Keep the logs around when a checker failed
+        if args.keep or any(result['exit_code'] for result in results):
+            print(f"Run directories kept in {base_dir}")
+        else:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'farm': manifest, 'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
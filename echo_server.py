@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Echo Server
+A minimal self-hosted validation target: answers every GET with the
+caller's IP address, the `nonce` query parameter and the request headers
+as JSON. Run it somewhere the proxies can reach and point the checkers
+at it instead of third-party IP echo services:
+
+    python echo_server.py --port 8080
+    TEST_URLS='http://<public-host>:8080/ip?nonce={nonce}' python proxy_finder.py
+
+It has no dependencies beyond the standard library and keeps connections
+alive, so one tunnel can carry several checks.
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
+
+MAX_HEADER_LINES = 100
+IDLE_TIMEOUT = 30  # seconds a keep-alive connection may sit idle
+
+
+def echo_payload(origin: str, target: str, headers: Dict[str, str]) -> Dict:
+    """Body returned for a request from `origin` for `target`"""
+    query = parse_qs(urlsplit(target).query)
+    return {
+        'origin': origin,
+        'nonce': query.get('nonce', [None])[0],
+        'headers': headers,
+    }
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Read one request line and its headers; None when the client is done"""
+    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip()] = value.strip()
+    return method, target, version, headers
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    peer = writer.get_extra_info('peername')
+    origin = peer[0] if peer else ''
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+            method, target, version, headers = request
+            lowered = {name.lower(): value for name, value in headers.items()}
+            if lowered.get('content-length'):
+                await reader.readexactly(int(lowered['content-length']))
+
+            path = urlsplit(target).path
+            if method not in ('GET', 'HEAD'):
+                status, body = '405 Method Not Allowed', {'error': 'method not allowed'}
+            elif path in ('/', '/ip'):
+                status, body = '200 OK', echo_payload(origin, target, headers)
+            elif path == '/health':
+                status, body = '200 OK', {'status': 'ok'}
+            else:
+                status, body = '404 Not Found', {'error': 'not found'}
+
+            keep_alive = (lowered.get('connection', '').lower() != 'close'
+                          if version == 'HTTP/1.1' else lowered.get('connection', '').lower() == 'keep-alive')
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: application/json\r\n"
+                "Cache-Control: no-store\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                + (payload if method != 'HEAD' else b'')
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, backlog: int = 4096):
+    server = await asyncio.start_server(handle, host, port, backlog=backlog)
+    bound = ', '.join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"Echo server listening on {bound}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-hosted IP + nonce echo target for proxy validation")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to bind (default: 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on (default: 8080)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,255 +1,374 @@
 """
 Appwrite Function to clean up old proxy records
-Keeps only the last 2 days of data and deletes older records
+Applies configurable retention policies (max age, per-type cap and
+keep-the-fastest-N per type) and deletes everything they do not keep
 Uses REST API directly to avoid SDK compatibility issues
 """
 
 import os
 import json
+import time
+import traceback
+import concurrent.futures
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
-from urllib.parse import quote
+
+
+PAGE_SIZE = 100  # Documents per list request
+DELETE_WORKERS = 20  # Parallel deletes per page
+
+# One keep-alive pool for every list and delete call (and warm executions),
+# sized so each delete worker holds its own connection
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_maxsize=DELETE_WORKERS))
+SESSION.mount('http://', HTTPAdapter(pool_maxsize=DELETE_WORKERS))
+
+def _type_list(value):
+    """Proxy types from a comma separated string or a JSON list"""
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError(f"expected a list of types, got {value!r}")
+    return [str(t).strip() for t in value if str(t).strip()]
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+# Retention settings: function variable name -> (policy key, type, default)
+POLICY_VARIABLES = {
+    'APPWRITE_DATABASE_ID': ('database_id', str, '68a227fb00180c4a541a'),  # ProxyDatabase
+    'APPWRITE_COLLECTION_ID': ('collection_id', str, '68a2280e0039af9b6a24'),  # WorkingProxies
+    'RETENTION_MAX_AGE_HOURS': ('max_age_hours', float, 48),  # 0 disables the age rule
+    'RETENTION_MAX_PER_TYPE': ('max_per_type', int, 0),  # Keep only the newest N per type, 0 = no cap
+    'RETENTION_KEEP_FASTEST': ('keep_fastest', int, 0),  # Never delete the fastest N per type
+    'RETENTION_TYPES': ('types', _type_list, 'http,socks4,socks5'),
+    'RETENTION_TIME_BUDGET_SECONDS': ('time_budget', float, 270),  # Stay under the function timeout
+    'DRY_RUN': ('dry_run', _flag, 'false'),
+}
+
+
+def load_policy(context):
+    """Read the retention policy from function variables and the request body
+
+    A JSON request body may override any policy key, e.g.
+    {"dry_run": true, "keep_fastest": 50} for a one-off manual execution.
+    Variables and overrides go through the same conversion; a value that
+    does not convert raises ValueError.
+    """
+    try:
+        overrides = json.loads(context.req.body or '{}') if isinstance(context.req.body, str) else context.req.body
+    except Exception:
+        overrides = None
+    if not isinstance(overrides, dict):
+        overrides = {}
+
+    policy = {}
+    for variable, (key, cast, default) in POLICY_VARIABLES.items():
+        source = 'request body' if key in overrides else variable
+        value = overrides[key] if key in overrides else os.environ.get(variable, default)
+        try:
+            policy[key] = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {key} in {source}: {value!r}")
+    return policy
+
+
+class TimeBudgetExceeded(Exception):
+    """Raised to stop cleanly before the function is killed"""
+
+
+def query(method, attribute=None, values=None):
+    """Build an Appwrite REST query string"""
+    payload = {"method": method}
+    if attribute is not None:
+        payload["attribute"] = attribute
+    if values is not None:
+        payload["values"] = values
+    return json.dumps(payload)
+
+
+def fetch_page(list_url, headers, filters, cursor, phases, phase='scan'):
+    """Fetch one page of matching documents after `cursor`"""
+    params = [('queries[]', q) for q in filters]
+    params.append(('queries[]', query("select", values=["$id", "type", "tested_at", "response_time"])))
+    params.append(('queries[]', query("limit", values=[PAGE_SIZE])))
+    if cursor:
+        params.append(('queries[]', query("cursorAfter", values=[cursor])))
+
+    started = time.monotonic()
+    response = SESSION.get(list_url, headers=headers, params=params, timeout=30)
+    response.raise_for_status()
+    documents = response.json().get('documents', [])
+
+    phases[phase]['pages'] += 1
+    phases[phase]['docs'] += len(documents)
+    phases[phase]['seconds'] += time.monotonic() - started
+    return documents
+
+
+def iter_pages(list_url, headers, filters, phases, phase='scan', deadline=None):
+    """Yield pages of matching documents using cursor pagination
+
+    The next page is fetched before the current one is handed out, so the
+    caller can delete every document of a page without invalidating the
+    cursor (which points at the last document of the page).
+    """
+    page = fetch_page(list_url, headers, filters, None, phases, phase)
+    while page:
+        if deadline and time.monotonic() > deadline:
+            raise TimeBudgetExceeded()
+        next_page = []
+        if len(page) == PAGE_SIZE:
+            next_page = fetch_page(list_url, headers, filters, page[-1]['$id'], phases, phase)
+        yield page
+        page = next_page
+
+
+def find_fastest(list_url, headers, proxy_type, count, phases, deadline):
+    """IDs of the `count` fastest documents of a type (kept whatever their age)"""
+    protected = set()
+    filters = [
+        query("equal", "type", [proxy_type]),
+        query("orderAsc", "response_time"),
+    ]
+    for page in iter_pages(list_url, headers, filters, phases, 'rank', deadline):
+        for doc in page:
+            protected.add(doc['$id'])
+            if len(protected) >= count:
+                return protected
+    return protected
+
+
+def select_for_deletion(list_url, headers, policy, cutoff_iso, phases, deadline):
+    """Yield pages of document IDs the retention policy does not keep
+
+    Works one cursor page at a time so memory stays flat: only the
+    protected fastest-N IDs of the current type are held in memory.
+    """
+    if not policy['max_per_type'] and not policy['keep_fastest']:
+        # Age rule alone: one server-side filtered scan over all types
+        if cutoff_iso:
+            for page in iter_pages(list_url, headers, [query("lessThan", "tested_at", [cutoff_iso])],
+                                   phases, 'scan', deadline):
+                yield [doc['$id'] for doc in page]
+        return
+
+    for proxy_type in policy['types']:
+        protected = set()
+        if policy['keep_fastest']:
+            protected = find_fastest(list_url, headers, proxy_type, policy['keep_fastest'], phases, deadline)
+
+        filters = [query("equal", "type", [proxy_type])]
+        if policy['max_per_type']:
+            # Newest first: everything past the cap (or older than the cutoff) goes
+            filters.append(query("orderDesc", "tested_at"))
+        elif cutoff_iso:
+            filters.append(query("lessThan", "tested_at", [cutoff_iso]))
+        else:
+            continue
+
+        rank = 0
+        for page in iter_pages(list_url, headers, filters, phases, 'scan', deadline):
+            doc_ids = []
+            for doc in page:
+                rank += 1
+                if doc['$id'] in protected:
+                    continue
+                over_cap = policy['max_per_type'] and rank > policy['max_per_type']
+                too_old = cutoff_iso and doc.get('tested_at', '') < cutoff_iso
+                if over_cap or too_old:
+                    doc_ids.append(doc['$id'])
+            if doc_ids:
+                yield doc_ids
+
+
+def delete_document(list_url, headers, doc_id):
+    """Delete a single document"""
+    try:
+        delete_response = SESSION.delete(f"{list_url}/{doc_id}", headers=headers, timeout=30)
+
+        if delete_response.status_code in [200, 204]:
+            return ('success', doc_id)
+        elif delete_response.status_code == 404:
+            return ('already_deleted', doc_id)
+        else:
+            return ('error', doc_id, delete_response.status_code)
+    except Exception as e:
+        return ('exception', doc_id, str(e))
+
+
+def delete_page(executor, list_url, headers, doc_ids, phases, errors, context):
+    """Delete one page worth of documents in parallel"""
+    started = time.monotonic()
+    deleted = 0
+    futures = [executor.submit(delete_document, list_url, headers, doc_id) for doc_id in doc_ids]
+
+    for future in concurrent.futures.as_completed(futures):
+        result = future.result()
+
+        if result[0] in ('success', 'already_deleted'):
+            # Count already-deleted documents since they are gone either way
+            deleted += 1
+        elif result[0] == 'error':
+            error_msg = f"Failed to delete {result[1]}: HTTP {result[2]}"
+            context.error(error_msg)
+            errors.append(error_msg)
+        else:  # exception
+            error_msg = f"Exception deleting {result[1]}: {result[2]}"
+            context.error(error_msg)
+            errors.append(error_msg)
+
+    phases['delete']['pages'] += 1
+    phases['delete']['docs'] += deleted
+    phases['delete']['seconds'] += time.monotonic() - started
+    return deleted
 
 
 def main(context):
     """
     Main function to clean up old proxy records
-    Runs every 2 days to delete records older than 2 days
+    Deletes whatever the configured retention policy does not keep
     """
-    
+
     context.log("🚀 Starting cleanup process...")
-    
+    started = time.monotonic()
+
     # Get environment variables
     endpoint = os.environ.get('APPWRITE_FUNCTION_API_ENDPOINT', 'https://fra.cloud.appwrite.io/v1')
     project_id = os.environ.get('APPWRITE_FUNCTION_PROJECT_ID')
     api_key = os.environ.get('APPWRITE_API_KEY', '')
-    
+
     if not api_key:
         context.error("APPWRITE_API_KEY environment variable is not set")
         return context.res.json({
             "success": False,
             "error": "API key not configured"
         }, 500)
-    
+
+    try:
+        policy = load_policy(context)
+    except ValueError as e:
+        context.error(str(e))
+        return context.res.json({
+            "success": False,
+            "error": str(e)
+        }, 400)
+    deadline = started + policy['time_budget']
+
     context.log(f"Endpoint: {endpoint}")
     context.log(f"Project ID: {project_id}")
-    
-    # Database and collection IDs
-    database_id = "68a227fb00180c4a541a"  # ProxyDatabase
-    collection_id = "68a2280e0039af9b6a24"  # WorkingProxies
-    
-    # Calculate cutoff date (2 days ago)
-    cutoff_date = datetime.now() - timedelta(days=2)
-    cutoff_iso = cutoff_date.isoformat()
-    
-    context.log(f"Starting cleanup process...")
-    context.log(f"Cutoff date: {cutoff_iso}")
-    context.log(f"Will delete all records older than 2 days")
-    
+    context.log(f"Database / collection: {policy['database_id']} / {policy['collection_id']}")
+
+    # Calculate cutoff date from the max age rule
+    cutoff_iso = None
+    if policy['max_age_hours'] > 0:
+        cutoff_iso = (datetime.now() - timedelta(hours=policy['max_age_hours'])).isoformat()
+
+    context.log(f"Retention policy:")
+    context.log(f"   Max age: {str(policy['max_age_hours']) + 'h (cutoff ' + cutoff_iso + ')' if cutoff_iso else 'off'}")
+    context.log(f"   Max documents per type: {policy['max_per_type'] or 'off'}")
+    context.log(f"   Always keep fastest per type: {policy['keep_fastest'] or 'off'}")
+    context.log(f"   Types: {', '.join(policy['types'])}")
+    if policy['dry_run']:
+        context.log("🧪 DRY RUN - nothing will be deleted")
+
     deleted_count = 0
-    total_checked = 0
+    would_delete = []
+    complete = True
     errors = []
-    
+    phases = {
+        'rank': {'pages': 0, 'docs': 0, 'seconds': 0.0},
+        'scan': {'pages': 0, 'docs': 0, 'seconds': 0.0},
+        'delete': {'pages': 0, 'docs': 0, 'seconds': 0.0},
+    }
+    selected_count = 0
+
     # Headers for API requests
     headers = {
         'X-Appwrite-Project': project_id,
         'X-Appwrite-Key': api_key,
         'Content-Type': 'application/json'
     }
-    
+
     try:
-        # Fetch ALL documents using REST API with pagination
-        list_url = f"{endpoint}/databases/{database_id}/collections/{collection_id}/documents"
-        
-        all_documents = []
-        offset = 0
-        limit = 100  # Max per page
-        
-        # Fetch all documents with pagination
-        while True:
+        list_url = f"{endpoint}/databases/{policy['database_id']}/collections/{policy['collection_id']}/documents"
+
+        context.log(f"🗑️  Streaming deletes page by page ({PAGE_SIZE} per page, {DELETE_WORKERS} workers)...")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
             try:
-                # Add pagination parameters using proper Appwrite REST API query format
-                query_limit = json.dumps({"method":"limit","values":[limit]})
-                query_offset = json.dumps({"method":"offset","values":[offset]})
-                
-                context.log(f"Building queries - limit: {limit}, offset: {offset}")
-                context.log(f"Query limit JSON: {query_limit}")
-                context.log(f"Query offset JSON: {query_offset}")
-                
-                # Use params to let requests handle URL encoding
-                params = [
-                    ('queries[]', query_limit),
-                    ('queries[]', query_offset)
-                ]
-                
-                context.log(f"Making request to: {list_url}")
-                context.log(f"With params: {params}")
-                
-                response = requests.get(list_url, headers=headers, params=params, timeout=30)
-                
-                context.log(f"Response status: {response.status_code}")
-                context.log(f"Response URL: {response.url}")
-                
-                response.raise_for_status()
-                
-                data = response.json()
-                documents = data.get('documents', [])
-                total = data.get('total', 0)
-                
-                context.log(f"✅ Successfully fetched batch")
-                context.log(f"   Documents in this batch: {len(documents)}")
-                context.log(f"   Server reports total: {total}")
-                context.log(f"   Total fetched so far: {len(all_documents) + len(documents)}")
-                
-                if not documents:
-                    context.log("No more documents found - breaking pagination loop")
-                    break  # No more documents
-                
-                all_documents.extend(documents)
-                context.log(f"Added {len(documents)} documents to collection")
-                
-                # If we got fewer documents than the limit, we've reached the end
-                if len(documents) < limit:
-                    context.log(f"Got fewer documents ({len(documents)}) than limit ({limit}) - reached end")
-                    break
-                
-                offset += limit
-                context.log(f"Moving to next batch with offset: {offset}")
-                context.log("="*50)
-                
-            except Exception as e:
-                context.error(f"❌ Error fetching page at offset {offset}: {str(e)}")
-                context.error(f"Exception type: {type(e).__name__}")
-                import traceback
-                context.error(f"Traceback: {traceback.format_exc()}")
-                break
-        
-        total_checked = len(all_documents)
-        context.log(f"📊 Pagination complete!")
-        context.log(f"Total documents fetched: {total_checked}")
-        
-        # Process each document
-        context.log(f"🔄 Starting to process {total_checked} documents...")
-        
-        # Collect documents to delete
-        docs_to_delete = []
-        
-        for i, doc in enumerate(all_documents, 1):
-                try:
-                    if i % 100 == 0:
-                        context.log(f"Processing document {i}/{total_checked}...")
-                    
-                    # Parse the tested_at timestamp
-                    tested_at_str = doc.get('tested_at', '')
-                    doc_id = doc.get('$id', 'unknown')
-                    
-                    # Handle different timestamp formats
-                    if 'T' in tested_at_str:
-                        # ISO format - strip microseconds and timezone
-                        tested_at_str_clean = tested_at_str.split('.')[0] if '.' in tested_at_str else tested_at_str
-                        tested_at_str_clean = tested_at_str_clean.replace('Z', '')
-                        tested_at = datetime.fromisoformat(tested_at_str_clean)
+                for doc_ids in select_for_deletion(list_url, headers, policy, cutoff_iso, phases, deadline):
+                    selected_count += len(doc_ids)
+                    if policy['dry_run']:
+                        # Keep a sample for the report, not the full list
+                        would_delete.extend(doc_ids[:max(0, 20 - len(would_delete))])
                     else:
-                        # Try parsing as string timestamp
-                        tested_at = datetime.strptime(tested_at_str, '%Y-%m-%d %H:%M:%S')
-                    
-                    # Check if older than 2 days
-                    if tested_at < cutoff_date:
-                        docs_to_delete.append(doc_id)
-                
-                except Exception as e:
-                    error_msg = f"Error processing document {doc_id}: {str(e)}"
-                    context.error(error_msg)
-                    errors.append(error_msg)
-                    continue
-        
-        context.log(f"📋 Found {len(docs_to_delete)} documents to delete")
-        
-        # Delete documents in parallel batches
-        import concurrent.futures
-        
-        def delete_document(doc_id):
-            """Delete a single document"""
-            try:
-                delete_url = f"{list_url}/{doc_id}"
-                delete_response = requests.delete(delete_url, headers=headers, timeout=30)
-                
-                if delete_response.status_code in [200, 204]:
-                    return ('success', doc_id)
-                elif delete_response.status_code == 404:
-                    return ('already_deleted', doc_id)
-                else:
-                    return ('error', doc_id, delete_response.status_code)
-            except Exception as e:
-                return ('exception', doc_id, str(e))
-        
-        # Delete in batches using thread pool
-        batch_size = 20  # Delete 20 at a time
-        context.log(f"🗑️  Starting batch deletion with {batch_size} workers...")
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
-            futures = {executor.submit(delete_document, doc_id): doc_id for doc_id in docs_to_delete}
-            
-            for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-                result = future.result()
-                
-                if result[0] == 'success':
-                    deleted_count += 1
-                    if deleted_count % 50 == 0:
-                        context.log(f"🗑️  Deleted {deleted_count}/{len(docs_to_delete)} old records...")
-                elif result[0] == 'already_deleted':
-                    # Count as deleted since it's already gone
-                    deleted_count += 1
-                elif result[0] == 'error':
-                    error_msg = f"Failed to delete {result[1]}: HTTP {result[2]}"
-                    context.error(error_msg)
-                    errors.append(error_msg)
-                else:  # exception
-                    error_msg = f"Exception deleting {result[1]}: {result[2]}"
-                    context.error(error_msg)
-                    errors.append(error_msg)
-        
+                        deleted_count += delete_page(executor, list_url, headers, doc_ids, phases, errors, context)
+
+                    if phases['scan']['pages'] % 10 == 0:
+                        context.log(f"🗑️  {phases['scan']['pages']} pages scanned, {selected_count} selected for deletion...")
+            except TimeBudgetExceeded:
+                complete = False
+                context.log(f"⏱️  Time budget of {policy['time_budget']:.0f}s used up, stopping early; the next run continues")
+
+        elapsed = time.monotonic() - started
+
         # Generate summary
         summary = {
             "success": True,
+            "complete": complete,
+            "dry_run": policy['dry_run'],
             "timestamp": datetime.now().isoformat(),
             "cutoff_date": cutoff_iso,
-            "total_documents_checked": total_checked,
+            "policy": {key: policy[key] for key in ('max_age_hours', 'max_per_type', 'keep_fastest', 'types')},
+            "documents_scanned": phases['scan']['docs'],
+            "documents_selected": selected_count,
             "documents_deleted": deleted_count,
-            "documents_retained": total_checked - deleted_count,
+            "elapsed_seconds": round(elapsed, 2),
+            "phases": {
+                name: dict(stats, seconds=round(stats['seconds'], 2))
+                for name, stats in phases.items()
+            },
             "errors_count": len(errors),
             "errors": errors[:10] if errors else []  # Include first 10 errors if any
         }
-        
+        if policy['dry_run']:
+            summary["would_delete_sample"] = would_delete
+
         context.log("="*60)
-        context.log(f"✅ Cleanup completed successfully!")
+        context.log(f"✅ Cleanup {'dry run ' if policy['dry_run'] else ''}completed{'' if complete else ' (partial)'}!")
         context.log(f"📋 Summary:")
-        context.log(f"   Total documents checked: {total_checked}")
+        context.log(f"   Documents scanned: {phases['scan']['docs']}")
+        context.log(f"   Documents selected for deletion: {selected_count}")
         context.log(f"   Documents deleted: {deleted_count}")
-        context.log(f"   Documents retained: {total_checked - deleted_count}")
+        for name, stats in phases.items():
+            context.log(f"   {name.capitalize()} phase: {stats['pages']} pages, {stats['docs']} docs, {stats['seconds']:.2f}s")
+        context.log(f"   Total time: {elapsed:.2f}s")
         context.log(f"   Errors encountered: {len(errors)}")
         context.log("="*60)
-        
+
         if errors:
             context.log(f"⚠️  Encountered {len(errors)} errors during cleanup")
             for i, err in enumerate(errors[:5], 1):
                 context.error(f"  Error {i}: {err}")
-        
+
         return context.res.json(summary)
-    
+
     except Exception as e:
         error_summary = {
             "success": False,
             "timestamp": datetime.now().isoformat(),
             "error": str(e),
-            "total_documents_checked": total_checked,
+            "documents_scanned": phases['scan']['docs'],
             "documents_deleted": deleted_count
         }
-        
+
         context.error("="*60)
         context.error(f"❌ Fatal error during cleanup: {str(e)}")
         context.error(f"Exception type: {type(e).__name__}")
-        import traceback
         context.error(f"Full traceback:")
         context.error(traceback.format_exc())
         context.error("="*60)
@@ -4,22 +4,34 @@ GitHub Actions Proxy Checker with Appwrite Integration
 Fetches proxies from PROXY-List repo, tests them, and stores working ones in Appwrite
 """
 
-import requests
-import time
 import os
-import json
+import sys
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from appwrite.client import Client
 from appwrite.services.databases import Databases
-from appwrite.id import ID
 import urllib3
 
+from anonymity import anonymity_counts
+from async_proxy_engine import latency_summary
+from appwrite_writer import AppwriteBatchWriter
+from metrics import CheckerMetrics
+from process_pool import build_engine
+from negative_cache import NegativeCache
+from proxy_history import ProxyHistory
+from source_cache import SourceCache
+from proxy_sources import SourceRegistry, PROXY_TYPES
+from settings import load_settings
+from result_sinks import BestSnapshot, ResultStream, write_pretty_json
+from sharding import select_shard, shard_suffix, write_manifest
+
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class AppwriteProxyChecker:
-    def __init__(self):
+    def __init__(self, settings=None):
+        # config.json, then environment variables, then command line flags
+        self.settings = settings or load_settings()
+        
         # Appwrite configuration
         self.client = Client()
         self.client.set_endpoint(os.getenv('APPWRITE_ENDPOINT', 'https://cloud.appwrite.io/v1'))
@@ -30,17 +42,84 @@ class AppwriteProxyChecker:
         self.database_id = os.getenv('APPWRITE_DATABASE_ID')
         self.collection_id = os.getenv('APPWRITE_COLLECTION_ID')
         
-        # Get proxy type from environment variable (for parallel execution)
-        self.proxy_type_filter = os.getenv('PROXY_TYPE', None)  # http, socks4, socks5, or None for all
+        # Buffered writes so DB round-trips never block the probe loop
+        self.writer = AppwriteBatchWriter(
+            self.databases,
+            self.database_id,
+            self.collection_id,
+            batch_size=self.settings.batch_size,
+            max_batch_age=self.settings.flush_interval,
+            flushers=self.settings.flushers,
+            max_retries=self.settings.write_retries
+        )
+        
+        # Proxy types to test (PROXY_TYPE narrows this for parallel execution)
+        self.proxy_types = self.settings.proxy_types
+        self.output_dir = self.settings.output_directory
+        self.pretty_json = self.settings.pretty_json
+        self.result_streams = {}  # proxy type -> ResultStream appended to as proxies are found
+        
+        # Hash range of the deduplicated proxies this job owns (SHARD_INDEX of SHARD_COUNT)
+        self.shard_index = self.settings.shard_index
+        self.shard_count = self.settings.shard_count
+        self.shard_suffix = shard_suffix(self.shard_index, self.shard_count)
+        
+        # Prometheus metrics, when served or written to a file
+        self.metrics = None
+        
+        # Rolling best-N file republished during the run (Appwrite gets every hit as it is found)
+        self.snapshot = None
+        if self.settings.best_n:
+            self.snapshot = BestSnapshot(
+                os.path.join(self.output_dir, f"best_proxies{self.shard_suffix}.json"),
+                os.path.join(self.output_dir, f"best_proxies{self.shard_suffix}.txt"),
+                size=self.settings.best_n,
+                interval=self.settings.snapshot_interval,
+                on_publish=self.report_snapshot
+            )
         
-        # Test configuration - Use simple HTTP endpoints that work with SOCKS
-        self.test_urls = [
-            'http://httpbin.org/ip',           # Simple IP return
-            'http://ifconfig.me/ip',           # Simple IP service
-            'https://api.ipify.org?format=json',  # JSON IP response
-        ]
-        self.timeout = 15  # Increased timeout for popular sites
-        self.max_workers = 100  # Increased for faster parallel processing
+        # Test configuration - simple IP echo endpoints work through every proxy type
+        self.test_urls = self.settings.test_urls
+        self.timeout = self.settings.timeout  # Per network step
+        self.max_concurrency = self.settings.concurrency  # Probes in flight at once
+        self.prefilter = self.settings.prefilter  # TCP connect stage before HTTP check
+        self.connect_timeout = self.settings.connect_timeout
+        # One event loop in this process, or one per worker process
+        self.engine = build_engine(
+            self.test_urls,
+            processes=self.settings.processes,
+            timeout=self.timeout,
+            max_concurrency=self.max_concurrency,
+            probe_deadline=self.settings.probe_deadline,
+            user_agent=self.settings.user_agent,
+            prefilter=self.prefilter,
+            connect_timeout=self.connect_timeout,
+            retries=self.settings.probe_retries,
+            adaptive=self.settings.adaptive_concurrency,
+            min_concurrency=self.settings.min_concurrency,
+            target_strategy=self.settings.target_strategy,
+            classify=self.settings.classify,
+            detect=self.settings.detect_protocol,
+            target_rate=self.settings.target_rate,
+            subnet_rate=self.settings.subnet_rate
+        )
+        
+        # Conditional fetches against the last snapshot (restored with actions/cache)
+        self.source_cache = SourceCache(self.settings.source_cache_dir, pool_size=self.settings.source_workers)
+        # Every source from config.json, fetched in parallel and deduplicated
+        self.source_registry = SourceRegistry.from_config(
+            self.settings.config_path, cache=self.source_cache, max_workers=self.settings.source_workers,
+            detect_protocol=self.settings.detect_protocol
+        )
+        self.candidates = None
+        self.new_proxies = {}  # entries that appeared since the previous snapshot
+        
+        # Persisted probe history (restored between runs with actions/cache)
+        self.history_path = self.settings.history_db
+        self.history = None
+        # Recently failed proxies, skipped before anything is probed
+        self.negative_cache_path = self.settings.negative_cache
+        self.negative_cache = None
         
         # Statistics
         self.stats = {
@@ -48,207 +127,312 @@ class AppwriteProxyChecker:
             'working': 0,
             'failed': 0,
             'start_time': datetime.now(),
-            'proxy_types': {}
+            'proxy_types': {},
+            'stages': {},
+            'concurrency': {},
+            'targets': {},
+            'rate_limits': {},
+            'latency': {},
+            'anonymity': {}
         }
         
-        if self.proxy_type_filter:
-            print(f"🎯 Running in parallel mode: Testing only {self.proxy_type_filter.upper()} proxies")
+        if len(self.proxy_types) < len(PROXY_TYPES):
+            print(f"🎯 Running in parallel mode: Testing only {', '.join(self.proxy_types).upper()} proxies")
+        if self.shard_count > 1:
+            print(f"🧩 Running shard {self.shard_index} of {self.shard_count} (hash range of the deduplicated proxies)")
+
+    def fetch_proxies(self):
+        """Fetch every configured source in parallel and merge them"""
+        print(f"Fetching {len(self.source_registry.sources)} proxy sources...")
+        # Every source is fetched, but endpoints are only folded into the types this run tests
+        self.candidates = self.source_registry.fetch_all(self.proxy_types)
+        stats = self.candidates['stats']
+        
+        for name, source_stats in stats['sources'].items():
+            if source_stats['error']:
+                print(f"Error fetching {name}: {source_stats['error']}")
+            elif source_stats['not_modified']:
+                print(f"  {name}: {source_stats['entries']} entries (304 Not Modified, reused snapshot)")
+            else:
+                print(f"  {name}: {source_stats['entries']} entries "
+                      f"({source_stats['new']} new, {source_stats['bytes']} bytes)")
+        
+        print(f"Merged {stats['raw_entries']} entries into {stats['unique_entries']} unique proxies "
+              f"({stats['raw_entries'] - stats['unique_entries']} duplicates removed)")
+        if stats['type_folded']:
+            print(f"{stats['multi_type']} endpoints listed under several types: {stats['type_folded']} "
+                  f"listings folded into one probe each (protocol detection finds the type)")
+        elif stats['multi_type']:
+            print(f"{stats['multi_type']} endpoints listed under several types are tested under each "
+                  f"(turn on detect_protocol to test them once)")
+        self.new_proxies = self.candidates['new']
+        if self.metrics:
+            self.metrics.record_sources(stats)
 
     def fetch_proxy_list(self, proxy_type):
-        """Fetch proxy list from GitHub repository"""
-        # Updated to use SOCKS-List repository
-        url = f"https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/{proxy_type}.txt"
-        try:
-            print(f"Fetching {proxy_type} proxies from GitHub...")
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            proxies = [line.strip() for line in response.text.splitlines() if line.strip()]
-            print(f"Found {len(proxies)} {proxy_type} proxies")
-            return proxies
-        except Exception as e:
-            print(f"Error fetching {proxy_type} proxies: {e}")
+        """Fetch proxy list for one type from every configured source"""
+        if self.candidates is None:
+            self.fetch_proxies()
+        
+        proxies = self.candidates['by_type'].get(proxy_type, [])
+        print(f"Found {len(proxies)} {proxy_type} proxies ({len(self.new_proxies.get(proxy_type, []))} new)")
+        if self.shard_count > 1:
+            proxies = select_shard(proxies, self.shard_index, self.shard_count)
+            print(f"  {len(proxies)} in shard {self.shard_index} of {self.shard_count}")
+        return proxies
+
+    def sources_for(self, proxy):
+        """Names of the sources that listed a proxy"""
+        if not self.candidates:
             return []
+        return self.candidates['attribution'].sources(proxy)
+
+    def attribute_sources(self, working_proxies):
+        """Tag each result with the sources that listed it"""
+        for proxy_data in working_proxies:
+            proxy_data['sources'] = self.sources_for(proxy_data['proxy'])
 
     def test_proxy(self, proxy, proxy_type):
         """Test a single proxy with multiple URLs"""
-        try:
-            # Configure proxy settings
-            if proxy_type == 'http':
-                proxy_dict = {
-                    'http': f'http://{proxy}',
-                    'https': f'http://{proxy}'
-                }
-            elif proxy_type == 'socks4':
-                proxy_dict = {
-                    'http': f'socks4://{proxy}',
-                    'https': f'socks4://{proxy}'
-                }
-            elif proxy_type == 'socks5':
-                proxy_dict = {
-                    'http': f'socks5://{proxy}',
-                    'https': f'socks5://{proxy}'
-                }
-            else:
-                return False, f"Unknown proxy type: {proxy_type}"
+        outcome = self.engine.test_proxy(proxy, proxy_type)
+        return outcome['working'], outcome['message']
 
-            # Test proxy with multiple URLs - try each one
-            successful_urls = []
-            for i, test_url in enumerate(self.test_urls, 1):
-                try:
-                    response = requests.get(
-                        test_url,
-                        proxies=proxy_dict,
-                        timeout=self.timeout,
-                        allow_redirects=True,
-                        verify=False,  # Skip SSL verification for speed
-                        headers={
-                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                        }
-                    )
-                    
-                    if response.status_code == 200:
-                        site_name = test_url.split('//')[1].split('/')[0]
-                        successful_urls.append(site_name)
-                        
-                        # Return success after first working URL for speed
-                        return True, f"Works with {site_name} ({response.status_code})"
-                        
-                except requests.exceptions.RequestException as e:
-                    # Continue to next URL
-                    continue
-                    
-            return False, f"Failed all sites: {', '.join([url.split('//')[1].split('/')[0] for url in self.test_urls])}"
-            
-        except Exception as e:
-            return False, f"Error: {str(e)}"
+    def save_to_appwrite(self, proxy, proxy_type, response_time, latency=None,
+                         anonymity=None, egress_ip=None):
+        """Queue a working proxy for the Appwrite database"""
+        document_data = {
+            'proxy': proxy,
+            'type': proxy_type,
+            'response_time': response_time,
+            'tested_at': datetime.now().isoformat(),
+            'status': 'working'
+        }
+        if latency:
+            document_data.update({
+                'connect_time': latency['connect'],
+                'handshake_time': latency['handshake'],
+                'tls_time': latency['tls'],
+                'ttfb': latency['ttfb'],
+            })
+        # Lets consumers filter on anonymity without retesting
+        if anonymity:
+            document_data['anonymity'] = anonymity
+        if egress_ip:
+            document_data['egress_ip'] = egress_ip
+        return self.writer.submit(document_data)
 
-    def save_to_appwrite(self, proxy, proxy_type, response_time):
-        """Save working proxy to Appwrite database"""
-        try:
-            document_data = {
-                'proxy': proxy,
-                'type': proxy_type,
-                'response_time': response_time,
-                'tested_at': datetime.now().isoformat(),
-                'status': 'working'
-            }
-            
-            self.databases.create_document(
-                database_id=self.database_id,
-                collection_id=self.collection_id,
-                document_id=ID.unique(),
-                data=document_data
-            )
-            return True
-        except Exception as e:
-            print(f"Error saving to Appwrite: {e}")
-            return False
+    def start_metrics(self):
+        """Collect run metrics if they are served or written anywhere"""
+        if not (self.settings.metrics_listen or self.settings.metrics_textfile):
+            return
+        self.metrics = CheckerMetrics()
+        self.metrics.track_engine(self.engine)
+        self.metrics.track_writer(self.writer)
+        if self.settings.metrics_listen:
+            print(f"📈 Metrics served at {self.metrics.serve(self.settings.metrics_listen)}")
+
+    def report_snapshot(self, snapshot):
+        """Log each publication of the best-N snapshot"""
+        kept = sum(len(results) for results in snapshot['by_type'].values())
+        print(f"📸 Best proxies snapshot: {kept} of {snapshot['working_so_far']} working so far, "
+              f"{self.writer.counters['written']} written to Appwrite")
+
+    def open_local_file(self, proxy_type):
+        """The local backup files of a type, started on first use and appended to as proxies are found
+
+        They stay open until the run ends: with protocol detection, any
+        type's list can turn up proxies of this type.
+        """
+        if proxy_type in self.result_streams:
+            return self.result_streams[proxy_type]
+        # Always created, even when empty, so combine-results can count them
+        stream = ResultStream(
+            os.path.join(self.output_dir, f"working_{proxy_type}_proxies{self.shard_suffix}.txt"),
+            os.path.join(self.output_dir, f"working_{proxy_type}_proxies{self.shard_suffix}.ndjson"),
+            keep_empty=True
+        )
+        self.result_streams[proxy_type] = stream
+        return stream
 
-    def save_to_local_file(self, working_proxies, proxy_type):
-        """Save working proxies to local files as backup"""
-        os.makedirs('working_proxies', exist_ok=True)
-        
-        filename = f"working_proxies/working_{proxy_type}_proxies.txt"
-        with open(filename, 'w') as f:
-            for proxy_data in working_proxies:
-                f.write(f"{proxy_data['proxy']}\n")
-        
-        # Save detailed info as JSON
-        json_filename = f"working_proxies/working_{proxy_type}_proxies_detailed.json"
-        with open(json_filename, 'w') as f:
-            json.dump(working_proxies, f, indent=2)
+    def save_to_local_file(self, proxy_type):
+        """Move the streamed backup files into place"""
+        stream = self.result_streams.get(proxy_type)
+        if not stream:
+            return
+        stream.close()
+        
+        # Detailed JSON is post-processing of the NDJSON stream
+        if self.pretty_json:
+            json_filename = os.path.join(self.output_dir, f"working_{proxy_type}_proxies{self.shard_suffix}_detailed.json")
+            write_pretty_json(stream.ndjson_path, json_filename)
 
     def test_proxies_batch(self, proxies, proxy_type):
         """Test a batch of proxies concurrently"""
-        working_proxies = []
-        
         print(f"\nTesting {len(proxies)} {proxy_type} proxies...")
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_proxy = {
-                executor.submit(self.test_proxy, proxy, proxy_type): proxy 
-                for proxy in proxies
-            }
+        completed = 0
+        working_count = 0
+        self.open_local_file(proxy_type)
+        
+        def on_result(outcome):
+            nonlocal completed, working_count
+            completed += 1
+            self.stats['total_tested'] += 1
+            proxy = outcome['proxy']
+            if self.history:
+                self.history.record(outcome)
+            if self.negative_cache:
+                self.negative_cache.record(outcome)
+            if self.metrics:
+                self.metrics.record_outcome(outcome)
             
-            for i, future in enumerate(as_completed(future_to_proxy), 1):
-                proxy = future_to_proxy[future]
-                self.stats['total_tested'] += 1
+            if outcome['working']:
+                self.stats['working'] += 1
+                working_count += 1
+                response_time = round(outcome['response_time'], 2)
+                
+                # Local backup first: it survives a crash or a CI timeout
+                result = self.engine.to_result(outcome)
+                result['sources'] = self.sources_for(proxy)
+                # Filed under the protocol it speaks, which detection may have changed
+                self.open_local_file(result['type']).write(result)
+                if self.snapshot:
+                    self.snapshot.add(result)
                 
-                try:
-                    start_time = time.time()
-                    is_working, message = future.result()
-                    response_time = time.time() - start_time
-                    
-                    if is_working:
-                        self.stats['working'] += 1
-                        proxy_data = {
-                            'proxy': proxy,
-                            'type': proxy_type,
-                            'response_time': round(response_time, 2),
-                            'tested_at': datetime.now().isoformat()
-                        }
-                        working_proxies.append(proxy_data)
-                        
-                        # Save to Appwrite
-                        self.save_to_appwrite(proxy, proxy_type, round(response_time, 2))
-                        
-                        print(f"✅ {proxy} - {message} ({response_time:.2f}s)")
-                    else:
-                        self.stats['failed'] += 1
-                        # Only show failed proxies occasionally to reduce noise
-                        if i % 20 == 0:
-                            print(f"❌ {proxy} - {message}")
-                        
-                except Exception as e:
-                    self.stats['failed'] += 1
-                    # Only show exceptions occasionally
-                    if i % 20 == 0:
-                        print(f"❌ {proxy} - Exception: {e}")
+                # Save to Appwrite
+                self.save_to_appwrite(proxy, outcome['type'], response_time, outcome['latency'],
+                                      outcome['anonymity'], outcome['egress_ip'])
                 
-                # Enhanced progress update
-                if i % 25 == 0:
-                    success_rate = (self.stats['working'] / i * 100) if i > 0 else 0
-                    print(f"📊 Progress: {i}/{len(proxies)} tested | Working: {self.stats['working']} | Success Rate: {success_rate:.1f}%")
+                print(f"✅ {proxy} - {outcome['message']} ({outcome['response_time']:.2f}s)")
+            else:
+                self.stats['failed'] += 1
+                # Only show failed proxies occasionally to reduce noise
+                if completed % 20 == 0:
+                    print(f"❌ {proxy} - {outcome['message']}")
+            
+            if self.snapshot:
+                self.snapshot.tick()
+            
+            # Enhanced progress update
+            if completed % 25 == 0:
+                success_rate = (working_count / completed * 100) if completed > 0 else 0
+                print(f"📊 Progress: {completed}/{len(proxies)} tested | Working: {working_count} | Success Rate: {success_rate:.1f}%")
         
+        if self.metrics:
+            self.metrics.start_type(proxy_type)
+        working_proxies = self.engine.test_proxies(proxies, proxy_type, on_result=on_result)
+        if self.history:
+            self.history.flush()
+        self.stats['stages'][proxy_type] = self.engine.stage_report()
+        if self.metrics:
+            self.metrics.finish_type(proxy_type, self.stats['stages'][proxy_type])
+        self.stats['concurrency'][proxy_type] = self.engine.concurrency_report
+        self.stats['targets'][proxy_type] = self.engine.targets.report()
+        self.stats['rate_limits'][proxy_type] = self.engine.rate_limits.report()
+        if working_proxies:
+            self.stats['latency'][proxy_type] = latency_summary(working_proxies)
+            self.stats['anonymity'][proxy_type] = anonymity_counts(working_proxies)
         return working_proxies
 
     def run(self):
         """Main execution function"""
         print("🚀 Starting GitHub Actions Proxy Checker with Appwrite Integration")
-        print(f"Source: https://github.com/TheSpeedX/SOCKS-List")
-        print(f"Test URLs: {', '.join(self.test_urls)}")
+        print(f"Sources: {', '.join(source.name for source in self.source_registry.sources)}")
+        print(f"Test URLs: {', '.join(self.test_urls)} ({self.settings.target_strategy})")
         print(f"Timeout: {self.timeout}s")
-        print(f"Max workers: {self.max_workers}")
+        if self.settings.adaptive_concurrency:
+            print(f"Concurrent probes: adaptive, {self.settings.min_concurrency}-{self.max_concurrency}")
+        else:
+            print(f"Max concurrent probes: {self.max_concurrency}")
+        print(f"TCP pre-filter: {'on' if self.prefilter else 'off'} ({self.connect_timeout}s connect timeout)")
+        print(f"Retries: {self.settings.probe_retries} per probe, {self.settings.write_retries} per Appwrite write")
+        print(f"Appwrite batches: {self.settings.batch_size} documents, {self.settings.flushers} flushers")
         print("-" * 60)
         
-        # Determine which proxy types to test
-        if self.proxy_type_filter:
-            proxy_types = [self.proxy_type_filter]
-        else:
-            proxy_types = ['http', 'socks4', 'socks5']
+        proxy_types = self.proxy_types
         
         all_working_proxies = {}
+        self.writer.start()
+        self.start_metrics()
+        if self.history_path:
+            self.history = ProxyHistory(self.history_path)
+        if self.negative_cache_path:
+            self.negative_cache = NegativeCache(self.negative_cache_path, self.settings.negative_ttl,
+                                                self.settings.negative_ttl_transient)
         
         for proxy_type in proxy_types:
             # Fetch proxies
             proxies = self.fetch_proxy_list(proxy_type)
             if not proxies:
                 continue
+            
+            if self.negative_cache:
+                proxies, skipped = self.negative_cache.filter(proxies, proxy_type)
+                print(f"🚫 Negative cache: {skipped} recently failed proxies skipped")
+                if not proxies:
+                    continue
+            
+            # Skip proxies still in backoff and put the promising ones first:
+            # recently working by latency, then those listed by the most sources
+            attribution = self.candidates['attribution']
+            if self.history:
+                proxies, plan = self.history.plan(proxies, proxy_type, popularity=attribution.source_count)
+                print(f"🗂️  History: {plan['recent']} recently working, {plan['new']} new, "
+                      f"{plan['retry']} due for retry, {plan['skipped']} skipped (backoff)")
+                if not proxies:
+                    continue
+            else:
+                proxies = attribution.rank(proxies)
                 
             self.stats['proxy_types'][proxy_type] = len(proxies)
             
             # Test proxies
             working_proxies = self.test_proxies_batch(proxies, proxy_type)
+            self.attribute_sources(working_proxies)
             all_working_proxies[proxy_type] = working_proxies
             
-            # Save to local files
-            self.save_to_local_file(working_proxies, proxy_type)
-            
             print(f"\n{proxy_type.upper()} Results:")
             print(f"  Total tested: {len(proxies)}")
             print(f"  Working: {len(working_proxies)}")
             print(f"  Success rate: {len(working_proxies)/len(proxies)*100:.1f}%")
+            for stage, stage_stats in self.stats['stages'].get(proxy_type, {}).items():
+                print(f"  {stage.capitalize()} stage: {stage_stats['passed']}/{stage_stats['tested']} survived "
+                      f"({stage_stats['survival_rate']}%) in {stage_stats['wall_seconds']}s "
+                      f"(worker time {stage_stats['busy_seconds']}s)")
+            detect = self.stats['stages'].get(proxy_type, {}).get('detect')
+            if detect:
+                print(f"  Protocols: {detect['as_listed']} as listed, {detect['relabelled']} relabelled, "
+                      f"{detect['undetected']} undetected, {detect['extra_connects']} validated on a new connection")
+        
+        for proxy_type in list(self.result_streams):
+            self.save_to_local_file(proxy_type)
+        if self.history:
+            self.history.close()
+            self.history = None
+        if self.negative_cache:
+            self.negative_cache.save()
+            self.negative_cache = None
+        
+        if self.snapshot:
+            self.snapshot.publish()
+        
+        # Drain buffered Appwrite writes before reporting
+        print(f"\n💾 Flushing {self.writer.pending()} queued Appwrite writes...")
+        self.writer.close()
+        if self.metrics:
+            self.metrics.close(self.settings.metrics_textfile)
+            self.metrics = None
+        
+        if self.shard_count > 1:
+            # Lets combine-results tell an empty shard from a missing one
+            write_manifest(self.output_dir, self.shard_index, self.shard_count, {
+                'proxy_types': list(proxy_types),
+                'tested_by_type': self.stats['proxy_types'],
+                'working_by_type': {t: len(p) for t, p in all_working_proxies.items()},
+                'total_tested': self.stats['total_tested'],
+                'working': self.stats['working'],
+                'finished_at': datetime.now().isoformat(),
+            })
         
         # Final statistics
         self.print_final_stats(all_working_proxies)
@@ -271,7 +455,8 @@ class AppwriteProxyChecker:
         print(f"Total proxies tested: {self.stats['total_tested']}")
         print(f"Working proxies found: {total_working}")
         print(f"Failed proxies: {self.stats['failed']}")
-        print(f"Overall success rate: {total_working/self.stats['total_tested']*100:.1f}%")
+        overall_rate = total_working/self.stats['total_tested']*100 if self.stats['total_tested'] > 0 else 0
+        print(f"Overall success rate: {overall_rate:.1f}%")
         
         print("\nBreakdown by type:")
         for proxy_type, working_proxies in all_working_proxies.items():
@@ -279,7 +464,60 @@ class AppwriteProxyChecker:
             working = len(working_proxies)
             rate = working/total*100 if total > 0 else 0
             print(f"  {proxy_type.upper()}: {working}/{total} ({rate:.1f}%)")
+        
+        counters = self.writer.counters
+        print(f"\nAppwrite writes: {counters['written']}/{counters['queued']} written, "
+              f"{counters['failed']} failed, {counters['dropped']} dropped on a full queue, "
+              f"{counters['retries']} retries in {counters['batches']} batches")
+        
+        if self.stats['stages']:
+            print("\nStage breakdown:")
+            for proxy_type, stages in self.stats['stages'].items():
+                summary = ', '.join(
+                    f"{stage} {stage_stats['passed']}/{stage_stats['tested']} in {stage_stats['busy_seconds']}s worker time"
+                    for stage, stage_stats in stages.items()
+                )
+                print(f"  {proxy_type.upper()}: {summary}")
+        
+        if self.stats['concurrency']:
+            print("\nConcurrent probes (min-max, mean, final):")
+            for proxy_type, concurrency in self.stats['concurrency'].items():
+                print(f"  {proxy_type.upper()}: {concurrency['min']}-{concurrency['max']}, "
+                      f"mean {concurrency['mean']}, final {concurrency['final']} "
+                      f"(ceiling {concurrency['ceiling']})")
+
+        if self.stats['targets']:
+            print("\nTest URLs (ok / requests, nonce mismatches):")
+            for proxy_type, targets in self.stats['targets'].items():
+                summary = ', '.join(
+                    f"{url} {stats['ok']}/{stats['requests']}, {stats['nonce_mismatch']}"
+                    for url, stats in targets.items()
+                )
+                print(f"  {proxy_type.upper()}: {summary}")
+
+        if self.stats['rate_limits']:
+            print("\nRate limit waits (test URLs, /24s):")
+            for proxy_type, limits in self.stats['rate_limits'].items():
+                print(f"  {proxy_type.upper()}: {limits['target_waits']} waits / {limits['target_wait_seconds']}s, "
+                      f"{limits['subnet_waits']} waits / {limits['subnet_wait_seconds']}s")
+
+        if self.stats['anonymity']:
+            print("\nAnonymity (elite / anonymous / transparent / unclassified):")
+            for proxy_type, counts in self.stats['anonymity'].items():
+                print(f"  {proxy_type.upper()}: {counts['elite']} / {counts['anonymous']} / "
+                      f"{counts['transparent']} / {counts['unclassified']}")
+
+        if self.stats['latency']:
+            print("\nLatency percentiles (p50 / p90 / p99, seconds):")
+            for proxy_type, latency in self.stats['latency'].items():
+                phases = ', '.join(
+                    f"{phase} {latency[phase]['p50']}/{latency[phase]['p90']}/{latency[phase]['p99']}"
+                    for phase in ('total', 'connect', 'handshake', 'tls', 'ttfb')
+                )
+                print(f"  {proxy_type.upper()}: {phases}")
 
 if __name__ == "__main__":
-    checker = AppwriteProxyChecker()
+    checker = AppwriteProxyChecker(load_settings(
+        sys.argv[1:], description="Test proxies and store the working ones in Appwrite"
+    ))
     checker.run()
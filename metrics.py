@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Run Metrics
+Counters, gauges and histograms for a checker run, rendered in the
+Prometheus text exposition format without a client library. A run can
+serve them on a local HTTP endpoint while it goes on (`metrics_listen`),
+write them to a file when it ends (`metrics_textfile`, for node_exporter's
+textfile collector or a CI artifact), or both, so throughput can be
+graphed and compared across runs.
+
+    METRICS_LISTEN=127.0.0.1:9464 python proxy_finder.py
+    curl -s localhost:9464/metrics
+"""
+
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from async_proxy_engine import LATENCY_PHASES, STAGE_BUCKETS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'proxy_checker_'
+
+LATENCY_BUCKETS = STAGE_BUCKETS
+WRITE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric:
+    """One metric family: a value (or histogram) per combination of label values
+
+    `set_function` makes the family read its values when rendered, from a
+    callable returning a number (no labels) or {label values tuple: number}.
+    """
+
+    def __init__(self, name: str, kind: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, object] = {}
+        self._function: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def observe(self, value: float, **labels):
+        """Add one observation to a histogram"""
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def load(self, counts: Sequence[int], total: float, **labels):
+        """Replace a histogram with per-bucket counts (the last one above every bound)"""
+        with self._lock:
+            self._values[self._key(labels)] = (list(counts), total, sum(counts))
+
+    def set_function(self, function: Callable):
+        self._function = function
+
+    def _items(self) -> Iterable[Tuple[Tuple, object]]:
+        if self._function is None:
+            with self._lock:
+                return list(self._values.items())
+        values = self._function()
+        return list(values.items()) if isinstance(values, dict) else [((), values)]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._items()):
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                labels = _format_labels(self.labels + ('le',), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """Named metric families plus the two ways out: HTTP and a textfile"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _add(self, name: str, kind: str, help_text: str, labels: Sequence[str] = (),
+             buckets: Sequence[float] = ()) -> Metric:
+        metric = Metric(PREFIX + name, kind, help_text, labels, buckets)
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Metric:
+        return self._add(name, 'counter', help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Metric:
+        return self._add(name, 'gauge', help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Metric:
+        return self._add(name, 'histogram', help_text, labels, buckets)
+
+    def render(self) -> str:
+        """Every family in the Prometheus text format"""
+        return ''.join(metric.render() for metric in self.metrics.values())
+
+    def serve(self, listen: str) -> str:
+        """Serve the metrics over HTTP from a daemon thread; returns the URL"""
+        host, _, port = listen.rpartition(':')
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # scrapes would drown the run's own output
+
+        self._server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        bound_host, bound_port = self._server.server_address[:2]
+        return f"http://{bound_host}:{bound_port}/metrics"
+
+    def write_textfile(self, path: str):
+        """Write the metrics to a file with an atomic rename"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def close(self, textfile: str = ''):
+        """Write the final textfile (if any) and stop serving"""
+        if textfile:
+            self.write_textfile(textfile)
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class CheckerMetrics(MetricsRegistry):
+    """The metric families a checker run reports
+
+    Probe counters are labelled with the type of the list being tested.
+    Probes started and in flight are read from the engine when rendered,
+    so they are live in the multi-process engine too; per-stage duration
+    histograms come from the engine's stage report after each type.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.started = self.counter('probes_started_total', "Probes started", ('type',))
+        self.completed = self.counter('probes_completed_total', "Probes completed", ('type',))
+        self.succeeded = self.counter('probes_succeeded_total', "Probes that found a working proxy", ('type',))
+        self.failed = self.counter('probes_failed_total', "Failed probes by reason", ('type', 'reason'))
+        self.in_flight = self.gauge('probes_in_flight', "Probes in flight")
+        self.phase_seconds = self.histogram('probe_phase_seconds',
+                                            "Latency phases of working probes", ('type', 'phase'))
+        self.stage_seconds = self.histogram('stage_seconds', "Time each probe spent in a stage",
+                                            ('type', 'stage'))
+        self.stage_passed = self.counter('stage_passed_total', "Probes that passed a stage", ('type', 'stage'))
+        self.appwrite_seconds = self.histogram('appwrite_write_seconds', "Time to write one Appwrite batch",
+                                               buckets=WRITE_BUCKETS)
+        self.appwrite_documents = self.counter('appwrite_documents_total', "Appwrite documents by outcome",
+                                               ('result',))
+        self.appwrite_queue = self.gauge('appwrite_queue_depth', "Documents waiting for an Appwrite flusher")
+        self.source_bytes = self.gauge('source_bytes', "Bytes downloaded from a source list", ('source',))
+        self.source_entries = self.gauge('source_entries', "Entries parsed from a source list", ('source',))
+        self.source_new = self.gauge('source_new_entries', "Entries new since the previous fetch", ('source',))
+        self.source_failed = self.gauge('source_fetch_failed', "1 if a source list could not be fetched",
+                                        ('source',))
+        self.run_start = self.gauge('run_start_time_seconds', "Unix time the run started")
+        self.run_duration = self.gauge('run_duration_seconds', "Seconds since the run started")
+        started_at = time.time()
+        self.run_start.set(started_at)
+        self.run_duration.set_function(lambda: round(time.time() - started_at, 3))
+
+        self._engine = None
+        self._type: Optional[str] = None
+        self._type_mark = 0
+        self._started_by_type: Dict[str, int] = {}
+        self.started.set_function(self._started_values)
+        self.in_flight.set_function(lambda: self._engine.in_flight if self._engine else 0)
+
+    def track_engine(self, engine):
+        """Read probes started and in flight from an engine (local or process pool)"""
+        self._engine = engine
+
+    def track_writer(self, writer):
+        """Read Appwrite counters and queue depth from an AppwriteBatchWriter"""
+        writer.on_batch = lambda documents, seconds: self.appwrite_seconds.observe(seconds)
+        self.appwrite_documents.set_function(
+            lambda: {(name,): count for name, count in writer.counters.items() if name != 'batches'}
+        )
+        self.appwrite_queue.set_function(writer.pending)
+
+    def _started_values(self) -> Dict[Tuple, int]:
+        values = {(proxy_type,): count for proxy_type, count in self._started_by_type.items()}
+        if self._type and self._engine:
+            values[(self._type,)] = (self._started_by_type.get(self._type, 0)
+                                     + self._engine.started - self._type_mark)
+        return values
+
+    def start_type(self, proxy_type: str):
+        """A run over one type's list begins"""
+        self._type = proxy_type
+        self._type_mark = self._engine.started if self._engine else 0
+
+    def finish_type(self, proxy_type: str, stage_report: Dict[str, Dict]):
+        """Fold the engine's counters for the finished type in"""
+        if self._engine:
+            self._started_by_type[proxy_type] = (self._started_by_type.get(proxy_type, 0)
+                                                 + self._engine.started - self._type_mark)
+        self._type = None
+        for stage, stats in stage_report.items():
+            self.stage_seconds.load(stats['duration_buckets'], stats['busy_seconds'], type=proxy_type, stage=stage)
+            self.stage_passed.set(stats['passed'], type=proxy_type, stage=stage)
+
+    def record_outcome(self, outcome: Dict):
+        """Count one finished probe of the current type"""
+        proxy_type = self._type or outcome['type']
+        self.completed.inc(type=proxy_type)
+        if outcome['working']:
+            self.succeeded.inc(type=proxy_type)
+            for phase in LATENCY_PHASES:
+                self.phase_seconds.observe(outcome['latency'][phase], type=proxy_type, phase=phase)
+        else:
+            self.failed.inc(type=proxy_type, reason=outcome['reason'] or 'unknown')
+
+    def record_sources(self, stats: Dict):
+        """Sizes of the source lists from a fetch_all() stats block"""
+        for name, source in stats['sources'].items():
+            self.source_bytes.set(source['bytes'], source=name)
+            self.source_entries.set(source['entries'], source=name)
+            self.source_new.set(source['new'], source=name)
+            self.source_failed.set(1 if source['error'] else 0, source=name)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Negative Result Cache
+Remembers which proxies failed recently so the next runs skip them
+before any probe is scheduled. Scheduled runs list the same thousands of
+dead proxies every hour; the history database backs them off only after
+several failures in a row, and is too large to read before every run.
+
+Each entry is one 64-bit integer: the proxy type and packed IPv4
+`ip:port` in the high 50 bits and the expiry, in minutes after the file's
+base time, in the low 14 (so at most about 11 days). Entries are kept
+sorted in an `array('Q')` and looked up by bisection; the file is that
+array compressed with zlib, so a million entries load in milliseconds
+and take a few MB.
+
+How long a failure is remembered depends on how the proxy failed: a
+refused or unreachable address, or an endpoint that does not speak any
+proxy protocol, means nothing is serving there; anything else (a timeout,
+a reset, a rejected handshake, a bad answer from the test URL) may be a
+busy or picky proxy that answers next hour.
+"""
+
+import heapq
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Tuple
+
+from async_proxy_engine import SUPPORTED_TYPES
+from proxy_store import ProxyList, pack_address
+
+MAGIC = b'PXNC'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxQQ')  # magic, version, base minute, entry count
+
+EXPIRY_BITS = 14
+EXPIRY_MASK = (1 << EXPIRY_BITS) - 1
+MAX_TTL_MINUTES = EXPIRY_MASK
+
+# Failures meaning no proxy is serving there; every other reason gets the transient TTL
+DEAD_REASONS = ('refused', 'unreachable', 'protocol')
+# Failures on our side say nothing about the proxy
+IGNORED_REASONS = ('local',)
+
+
+def entry_key(proxy: str, proxy_type: str) -> Optional[int]:
+    """Type and packed address as one integer, or None if the entry does not pack"""
+    if proxy_type not in SUPPORTED_TYPES:
+        return None
+    packed = pack_address(proxy)
+    if packed is None:
+        return None
+    return (SUPPORTED_TYPES.index(proxy_type) + 1) << 48 | packed
+
+
+class NegativeCache:
+    """Recently failed proxies per type, each with its own expiry"""
+
+    def __init__(self, path: str = 'negative_cache.bin', ttl_hours: float = 12,
+                 transient_ttl_hours: float = 2):
+        self.path = path
+        self.ttl = min(int(ttl_hours * 60), MAX_TTL_MINUTES)
+        self.transient_ttl = min(int(transient_ttl_hours * 60), MAX_TTL_MINUTES)
+        self.base = 0
+        self._entries = array('Q')
+        # Failures recorded this run: key -> expiry minute
+        self._added: Dict[int, int] = {}
+        self.load()
+
+    def load(self):
+        """Read the cache file, if there is a usable one"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        try:
+            magic, version, base, count = HEADER.unpack_from(data)
+            entries = array('Q')
+            entries.frombytes(zlib.decompress(data[HEADER.size:]))
+        except (struct.error, zlib.error, ValueError):
+            print(f"Ignoring unreadable negative cache {self.path}")
+            return
+        if magic != MAGIC or version != VERSION or len(entries) != count:
+            print(f"Ignoring negative cache {self.path} with an unknown format")
+            return
+        if sys.byteorder == 'big':
+            entries.byteswap()
+        self.base = base
+        self._entries = entries
+
+    def ttl_for(self, reason: str) -> int:
+        """Minutes a failure with this reason is remembered, 0 for not at all"""
+        if reason in IGNORED_REASONS:
+            return 0
+        return self.ttl if reason in DEAD_REASONS else self.transient_ttl
+
+    def _expiry(self, key: int) -> int:
+        """Expiry minute of a key, 0 if it is not cached"""
+        if key in self._added:
+            return self._added[key]
+        index = bisect_left(self._entries, key << EXPIRY_BITS)
+        if index < len(self._entries) and self._entries[index] >> EXPIRY_BITS == key:
+            return self.base + (self._entries[index] & EXPIRY_MASK)
+        return 0
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        proxy, proxy_type = item
+        key = entry_key(proxy, proxy_type)
+        return key is not None and self._expiry(key) > time.time() // 60
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._added)
+
+    def filter(self, proxies: Iterable[str], proxy_type: str,
+               now: Optional[float] = None) -> Tuple[ProxyList, int]:
+        """The proxies not cached as failed, and how many were skipped"""
+        now_minute = int((now or time.time()) // 60)
+        kept = ProxyList()
+        skipped = 0
+        for proxy in proxies:
+            key = entry_key(proxy, proxy_type)
+            if key is not None and self._expiry(key) > now_minute:
+                skipped += 1
+            else:
+                kept.append(proxy)
+        return kept, skipped
+
+    def record(self, outcome: Dict):
+        """Remember a failed probe outcome (under its listed and detected types); written on save()"""
+        if outcome['working']:
+            return
+        ttl = self.ttl_for(outcome.get('reason', ''))
+        if not ttl:
+            return
+        for proxy_type in {outcome['type'], outcome.get('listed_type') or outcome['type']}:
+            key = entry_key(outcome['proxy'], proxy_type)
+            if key is not None:
+                self._added[key] = int(time.time() // 60) + ttl
+
+    def save(self, now: Optional[float] = None):
+        """Write unexpired entries, merged with this run's failures, atomically"""
+        base = int((now or time.time()) // 60)
+        added = self._added
+
+        def kept():
+            # Re-based to the new base minute; keys recorded again this run are replaced
+            for entry in self._entries:
+                expiry = self.base + (entry & EXPIRY_MASK)
+                key = entry >> EXPIRY_BITS
+                if expiry > base and key not in added:
+                    yield key << EXPIRY_BITS | min(expiry - base, EXPIRY_MASK)
+
+        fresh = sorted(key << EXPIRY_BITS | min(expiry - base, EXPIRY_MASK)
+                       for key, expiry in added.items() if expiry > base)
+        entries = array('Q', heapq.merge(kept(), fresh))
+        self.base, self._entries, self._added = base, entries, {}
+
+        if sys.byteorder == 'big':
+            entries = array('Q', entries)
+            entries.byteswap()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, base, len(entries)))
+            f.write(zlib.compress(entries.tobytes(), 6))
+        os.replace(tmp_path, self.path)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the loaded entries"""
+        return self._entries.itemsize * len(self._entries)
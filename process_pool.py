@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Multi-process Probe Pool
+Spreads a run over worker processes, each with its own event loop and
+AsyncProxyEngine, so response parsing and classification use every core
+instead of sharing one interpreter. Each worker probes every n-th proxy
+of the list (which keeps the history's priority order roughly intact in
+every worker), received as a packed ProxyList slice, and sends its outcomes back in batches of plain tuples over
+one queue. The calling process is the single aggregator: it rebuilds the
+outcome dicts, runs the `on_result` callback (files, Appwrite, history,
+progress output) and merges the per-worker stage, target and concurrency
+reports into the shapes AsyncProxyEngine reports.
+
+Workers are started with `spawn`, so they never inherit the aggregator's
+threads (Appwrite flushers, source fetchers) or open files.
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from async_proxy_engine import LATENCY_PHASES, AsyncProxyEngine
+from proxy_store import ProxyList
+
+# Order of the fields in the tuples workers send back
+OUTCOME_FIELDS = ('proxy', 'type', 'listed_type', 'working', 'response_time', 'message', 'reason', 'stage',
+                  'latency', 'anonymity', 'egress_ip', 'tested_at')
+BATCH_SIZE = 64  # outcomes per message
+BATCH_AGE = 0.2  # seconds a partial batch may wait
+POLL_INTERVAL = 1.0  # seconds between worker liveness checks
+
+
+def resolve_processes(processes: int) -> int:
+    """Worker processes to use; 0 means one per core"""
+    return processes if processes > 0 else (os.cpu_count() or 1)
+
+
+def pack_outcome(outcome: Dict) -> Tuple:
+    """Outcome dict to a flat tuple"""
+    latency = outcome['latency']
+    packed = [outcome[field] for field in OUTCOME_FIELDS]
+    packed[OUTCOME_FIELDS.index('latency')] = (
+        tuple(latency[phase] for phase in LATENCY_PHASES) if latency else None
+    )
+    return tuple(packed)
+
+
+def unpack_outcome(packed: Tuple) -> Dict:
+    """Rebuild the outcome dict AsyncProxyEngine.probe returns"""
+    outcome = dict(zip(OUTCOME_FIELDS, packed))
+    if outcome['latency'] is not None:
+        outcome['latency'] = dict(zip(LATENCY_PHASES, outcome['latency']))
+    return outcome
+
+
+def _worker(index: int, proxies: ProxyList, proxy_type: str, engine_options: Dict, results):
+    """Probe one slice of the list and stream the outcomes to the aggregator"""
+    try:
+        engine = AsyncProxyEngine(**engine_options)
+        batch = []
+        last_flush = time.monotonic()
+
+        def on_result(outcome: Dict):
+            nonlocal last_flush
+            batch.append(pack_outcome(outcome))
+            now = time.monotonic()
+            if len(batch) >= BATCH_SIZE or now - last_flush >= BATCH_AGE:
+                results.put(('results', index, (list(batch), engine.started, engine.in_flight)))
+                batch.clear()
+                last_flush = now
+
+        engine.test_proxies(proxies, proxy_type, on_result=on_result)
+        if batch:
+            results.put(('results', index, (batch, engine.started, engine.in_flight)))
+        results.put(('done', index, {
+            'stages': engine.stage_stats,
+            'connections': engine.connection_stats,
+            'detect': engine.detect_stats,
+            'targets': engine.targets.report(),
+            'rate_limits': engine.rate_limits.stats,
+            'concurrency': engine.concurrency_report,
+            'timeline': engine.concurrency_timeline,
+        }))
+    except BaseException:
+        results.put(('error', index, traceback.format_exc()))
+
+
+class ProcessPoolEngine:
+    """AsyncProxyEngine stand-in that runs the probes in worker processes
+
+    `max_concurrency` and `min_concurrency` are totals, split evenly
+    between the workers.
+    """
+
+    def __init__(self, test_urls: List[str], processes: int = 0, **engine_options):
+        self.processes = resolve_processes(processes)
+        self.engine_options = dict(engine_options, test_urls=list(test_urls))
+        # Local engine: single probes, own-IP discovery, and the merged reports
+        self.engine = AsyncProxyEngine(test_urls, **engine_options)
+        self.targets = self.engine.targets
+        self.rate_limits = self.engine.rate_limits
+        # Probes started and in flight across the workers, as of their last batch
+        self.started = 0
+        self.in_flight = 0
+        self.concurrency_report: Dict = {}
+        self.concurrency_timeline: List[Dict] = []
+        self.worker_reports: List[Dict] = []
+        self._context = multiprocessing.get_context('spawn')
+
+    to_result = staticmethod(AsyncProxyEngine.to_result)
+
+    def test_proxy(self, proxy: str, proxy_type: str) -> Dict:
+        """Test a single proxy in this process"""
+        return self.engine.test_proxy(proxy, proxy_type)
+
+    def stage_report(self) -> Dict[str, Dict]:
+        """Per-stage counts and timing for the last run, summed over workers"""
+        return self.engine.stage_report()
+
+    def _worker_options(self, workers: int) -> Dict:
+        options = dict(self.engine_options)
+        max_concurrency = options.get('max_concurrency', 500)
+        min_concurrency = options.get('min_concurrency', 20)
+        options['max_concurrency'] = max(1, max_concurrency // workers)
+        options['min_concurrency'] = max(1, min(min_concurrency // workers, options['max_concurrency']))
+        # Rate limits are totals too; each worker gets its share of every bucket
+        for name in ('target_rate', 'subnet_rate'):
+            if options.get(name):
+                options[name] = options[name] / workers
+        if options.get('classify', True):
+            # Found once here instead of once per worker
+            options['own_ips'] = sorted(self.engine.prepare())
+            options['edge_headers'] = self.engine.edge_headers
+        return options
+
+    def test_proxies(self, proxies: Iterable[str], proxy_type: str,
+                     on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Test proxies across the worker processes and return the working ones"""
+        if not isinstance(proxies, ProxyList):
+            proxies = ProxyList(proxies)
+        self.engine.reset_stage_stats()
+        self.concurrency_report = {}
+        self.concurrency_timeline = []
+        self.worker_reports = []
+        if not proxies:
+            return []
+
+        workers = min(self.processes, len(proxies))
+        options = self._worker_options(workers)
+        results = self._context.Queue()
+        processes = [
+            self._context.Process(target=_worker, args=(index, proxies[index::workers], proxy_type,
+                                                        options, results), daemon=True)
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        working_proxies = []
+        reports: Dict[int, Dict] = {}
+        started_before = self.started
+        progress: Dict[int, Tuple[int, int]] = {}
+        try:
+            while len(reports) < workers:
+                try:
+                    kind, index, payload = results.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    for index, process in enumerate(processes):
+                        if index not in reports and process.exitcode is not None:
+                            raise RuntimeError(f"Probe worker {index} exited with code {process.exitcode}")
+                    continue
+                if kind == 'results':
+                    payload, *progress[index] = payload
+                    self.started = started_before + sum(started for started, _ in progress.values())
+                    self.in_flight = sum(in_flight for _, in_flight in progress.values())
+                    for packed in payload:
+                        outcome = unpack_outcome(packed)
+                        if outcome['working']:
+                            working_proxies.append(self.to_result(outcome))
+                        if on_result:
+                            on_result(outcome)
+                elif kind == 'done':
+                    reports[index] = payload
+                else:
+                    raise RuntimeError(f"Probe worker {index} failed:\n{payload}")
+        finally:
+            for process in processes:
+                if process.is_alive() and len(reports) < workers:
+                    process.terminate()
+            for process in processes:
+                process.join()
+            results.close()
+            self.in_flight = 0
+
+        self.worker_reports = [reports[index] for index in range(workers)]
+        self._merge_reports()
+        return working_proxies
+
+    def _merge_reports(self):
+        """Fold the worker reports into the local engine's counters"""
+        stage_stats = self.engine.stage_stats
+        for report in self.worker_reports:
+            for stage, stats in report['stages'].items():
+                merged = stage_stats.setdefault(stage, dict.fromkeys(stats, 0))
+                merged['tested'] += stats['tested']
+                merged['passed'] += stats['passed']
+                merged['busy_seconds'] += stats['busy_seconds']
+                merged['duration_buckets'] = [a + b for a, b in zip(merged['duration_buckets'],
+                                                                    stats['duration_buckets'])]
+                # Workers run side by side, so the stage lasted as long as the slowest
+                merged['wall_seconds'] = max(merged['wall_seconds'], stats['wall_seconds'])
+            for key, count in report['connections'].items():
+                self.engine.connection_stats[key] += count
+            for key, count in report['detect'].items():
+                self.engine.detect_stats[key] += count
+            for target in self.targets.targets:
+                for key, count in report['targets'].get(target.url, {}).items():
+                    target.stats[key] += count
+            for key, value in report['rate_limits'].items():
+                self.rate_limits.stats[key] += value
+
+        # Limits of all workers added up, as if one pool
+        concurrency = [report['concurrency'] for report in self.worker_reports if report['concurrency']]
+        if concurrency:
+            self.concurrency_report = {
+                key: round(sum(report.get(key, 0) for report in concurrency), 1)
+                for key in concurrency[0]
+            }
+            self.concurrency_report['processes'] = len(self.worker_reports)
+        self.concurrency_timeline = [
+            dict(sample, worker=index)
+            for index, report in enumerate(self.worker_reports)
+            for sample in report['timeline']
+        ]
+
+
+def build_engine(test_urls: List[str], processes: int = 1, **engine_options):
+    """AsyncProxyEngine in this process, or a ProcessPoolEngine above one process"""
+    if resolve_processes(processes) > 1:
+        return ProcessPoolEngine(test_urls, processes, **engine_options)
+    return AsyncProxyEngine(test_urls, **engine_options)
@@ -2,181 +2,282 @@
 """
 Proxy Finder Script
 Fetches proxy lists from TheSpeedX/PROXY-List repository,
-tests them against Google sites, and stores only working proxies.
+tests them against the IP echo test URLs, and stores only working proxies.
 """
 
-import requests
-import concurrent.futures
 import time
 import os
 from datetime import datetime
 from typing import List, Dict, Tuple
 import json
-import socks
-import socket
+import sys
 import urllib3
 
+from anonymity import anonymity_counts
+from async_proxy_engine import latency_summary
+from metrics import CheckerMetrics
+from process_pool import build_engine
+from negative_cache import NegativeCache
+from proxy_history import ProxyHistory
+from source_cache import SourceCache
+from proxy_sources import SourceRegistry
+from settings import Settings, load_settings
+from result_sinks import BestSnapshot, ResultStream, replace_atomic, write_pretty_json
+
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class ProxyFinder:
-    def __init__(self):
-        self.base_url = "https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master"
-        self.proxy_files = {
-            'http': f"{self.base_url}/http.txt",
-            'socks4': f"{self.base_url}/socks4.txt", 
-            'socks5': f"{self.base_url}/socks5.txt"
-        }
-        self.test_urls = [
-            "http://httpbin.org/ip",
-            "http://ifconfig.me/ip",
-            "https://api.ipify.org?format=json"
-        ]
+    def __init__(self, settings: Settings = None):
+        # config.json, then environment variables (and flags when run from main)
+        self.settings = settings or load_settings()
+        self.test_urls = self.settings.test_urls
         self.working_proxies = {'http': [], 'socks4': [], 'socks5': []}
-        self.timeout = 10  # seconds
-        self.max_workers = 50  # concurrent threads
+        self.output_dir = self.settings.output_directory
+        self.pretty_json = self.settings.pretty_json  # indented JSON copies, written after each type
+        self.run_timestamp = None
+        self.result_streams = {}  # proxy type -> ResultStream appended to as proxies are found
+        self.snapshot = None  # rolling best-N file, republished while the run goes on
+        self.metrics = None  # Prometheus metrics, when served or written to a file
+        # Conditional fetches against the last snapshot of each source list
+        self.source_cache = SourceCache(self.settings.source_cache_dir, pool_size=self.settings.source_workers)
+        # Every source from config.json, fetched in parallel and deduplicated
+        self.source_registry = SourceRegistry.from_config(
+            self.settings.config_path, cache=self.source_cache, max_workers=self.settings.source_workers,
+            detect_protocol=self.settings.detect_protocol
+        )
+        self.candidates = None
+        self.new_proxies = {}  # entries that appeared since the previous snapshot
+        self.timeout = self.settings.timeout  # seconds per network step
+        self.max_concurrency = self.settings.concurrency  # probes in flight at once
+        self.prefilter = self.settings.prefilter  # cheap TCP connect stage before the HTTP check
+        self.connect_timeout = self.settings.connect_timeout  # seconds for the pre-filter stage
+        # One event loop in this process, or one per worker process
+        self.engine = build_engine(
+            self.test_urls,
+            processes=self.settings.processes,
+            timeout=self.timeout,
+            max_concurrency=self.max_concurrency,
+            probe_deadline=self.settings.probe_deadline,
+            user_agent=self.settings.user_agent,
+            prefilter=self.prefilter,
+            connect_timeout=self.connect_timeout,
+            retries=self.settings.probe_retries,
+            adaptive=self.settings.adaptive_concurrency,
+            min_concurrency=self.settings.min_concurrency,
+            target_strategy=self.settings.target_strategy,
+            classify=self.settings.classify,
+            detect=self.settings.detect_protocol,
+            target_rate=self.settings.target_rate,
+            subnet_rate=self.settings.subnet_rate
+        )
+        self.stage_reports = {}
+        self.concurrency_reports = {}
+        self.target_reports = {}
+        self.rate_limit_reports = {}
+        # Persisted probe history: test promising proxies first, back off dead ones
+        self.history_path = self.settings.history_db
+        self.history = None
+        # Recently failed proxies, skipped before anything is probed
+        self.negative_cache_path = self.settings.negative_cache
+        self.negative_cache = None
+        
+    def fetch_proxies(self, proxy_types: List[str]):
+        """Fetch all configured sources at once and merge them"""
+        print(f"Fetching {len(self.source_registry.sources)} proxy sources...")
+        self.candidates = self.source_registry.fetch_all(proxy_types)
+        stats = self.candidates['stats']
         
+        for name, source_stats in stats['sources'].items():
+            if source_stats['error']:
+                print(f"Error fetching {name}: {source_stats['error']}")
+            elif source_stats['not_modified']:
+                print(f"  - {name}: {source_stats['entries']} entries (unchanged since last fetch)")
+            else:
+                print(f"  - {name}: {source_stats['entries']} entries ({source_stats['new']} new since last fetch)")
+        
+        print(f"Merged {stats['raw_entries']} entries into {stats['unique_entries']} unique proxies "
+              f"({stats['raw_entries'] - stats['unique_entries']} duplicates removed)")
+        if stats['type_folded']:
+            print(f"{stats['multi_type']} endpoints listed under several types: {stats['type_folded']} "
+                  f"listings folded into one probe each (protocol detection finds the type)")
+        elif stats['multi_type']:
+            print(f"{stats['multi_type']} endpoints listed under several types are tested under each "
+                  f"(turn on detect_protocol to test them once)")
+        self.new_proxies = self.candidates['new']
+        if self.metrics:
+            self.metrics.record_sources(stats)
+    
     def fetch_proxy_list(self, proxy_type: str) -> List[str]:
-        """Fetch proxy list from GitHub repository"""
-        try:
-            print(f"Fetching {proxy_type.upper()} proxies...")
-            response = requests.get(self.proxy_files[proxy_type], timeout=30)
-            response.raise_for_status()
-            
-            proxies = [line.strip() for line in response.text.split('\n') if line.strip()]
-            print(f"Found {len(proxies)} {proxy_type.upper()} proxies")
-            return proxies
-            
-        except Exception as e:
-            print(f"Error fetching {proxy_type} proxies: {e}")
+        """Fetch proxy list for one type from every configured source"""
+        if self.candidates is None:
+            self.fetch_proxies([proxy_type])
+        
+        proxies = self.candidates['by_type'].get(proxy_type, [])
+        print(f"Found {len(proxies)} {proxy_type.upper()} proxies "
+              f"({len(self.new_proxies.get(proxy_type, []))} new)")
+        return proxies
+    
+    def sources_for(self, proxy: str) -> List[str]:
+        """Names of the sources that listed a proxy"""
+        if not self.candidates:
             return []
+        return self.candidates['attribution'].sources(proxy)
+    
+    def attribute_sources(self, working_proxies: List[Dict]):
+        """Tag each result with the sources that listed it"""
+        for proxy_info in working_proxies:
+            proxy_info['sources'] = self.sources_for(proxy_info['proxy'])
     
     def test_proxy(self, proxy: str, proxy_type: str) -> Tuple[bool, str, float]:
         """Test a single proxy against test sites"""
-        try:
-            start_time = time.time()
-            
-            # Format proxy for requests with proper SOCKS support
-            if proxy_type == 'http':
-                proxy_dict = {
-                    'http': f'http://{proxy}',
-                    'https': f'http://{proxy}'
-                }
-            elif proxy_type == 'socks4':
-                proxy_dict = {
-                    'http': f'socks4://{proxy}',
-                    'https': f'socks4://{proxy}'
-                }
-            else:  # socks5
-                proxy_dict = {
-                    'http': f'socks5://{proxy}',
-                    'https': f'socks5://{proxy}'
-                }
-            
-            # Test against multiple URLs
-            for test_url in self.test_urls:
-                try:
-                    response = requests.get(
-                        test_url,
-                        proxies=proxy_dict,
-                        timeout=self.timeout,
-                        headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
-                        verify=False  # Skip SSL verification for faster testing
-                    )
-                    
-                    # Check if request was successful
-                    if response.status_code == 200:
-                        response_time = time.time() - start_time
-                        return True, proxy, response_time
-                        
-                except requests.exceptions.RequestException:
-                    continue
-            
-            return False, proxy, 0
-            
-        except Exception:
-            return False, proxy, 0
+        outcome = self.engine.test_proxy(proxy, proxy_type)
+        return outcome['working'], proxy, outcome['response_time']
     
     def test_proxies_batch(self, proxies: List[str], proxy_type: str) -> List[Dict]:
         """Test a batch of proxies concurrently"""
-        working_proxies = []
+        print(f"Testing {len(proxies)} {proxy_type.upper()} proxies with up to {self.max_concurrency} concurrent probes...")
         
-        print(f"Testing {len(proxies)} {proxy_type.upper()} proxies with {self.max_workers} threads...")
+        completed = 0
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all proxy tests
-            future_to_proxy = {
-                executor.submit(self.test_proxy, proxy, proxy_type): proxy 
-                for proxy in proxies
-            }
+        def on_result(outcome: Dict):
+            nonlocal completed
+            completed += 1
+            
+            # Print progress every 100 proxies
+            if completed % 100 == 0:
+                print(f"Progress: {completed}/{len(proxies)} proxies tested for {proxy_type.upper()}")
+            
+            if self.history:
+                self.history.record(outcome)
+            if self.negative_cache:
+                self.negative_cache.record(outcome)
+            if self.metrics:
+                self.metrics.record_outcome(outcome)
+            
+            if outcome['working']:
+                # Written straight away so a crash keeps what was found so far
+                result = self.engine.to_result(outcome)
+                result['sources'] = self.sources_for(outcome['proxy'])
+                # Filed under the protocol it speaks, which detection may have changed
+                self.result_stream(result['type']).write(result)
+                if self.snapshot:
+                    self.snapshot.add(result)
+                print(f"✓ Working {outcome['type'].upper()} proxy found: {outcome['proxy']} (Response time: {outcome['response_time']:.2f}s)")
             
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_proxy):
-                completed += 1
-                
-                # Print progress every 100 proxies
-                if completed % 100 == 0:
-                    print(f"Progress: {completed}/{len(proxies)} proxies tested for {proxy_type.upper()}")
-                
-                try:
-                    is_working, proxy, response_time = future.result()
-                    if is_working:
-                        working_proxies.append({
-                            'proxy': proxy,
-                            'type': proxy_type,
-                            'response_time': round(response_time, 2),
-                            'tested_at': datetime.now().isoformat()
-                        })
-                        print(f"✓ Working {proxy_type.upper()} proxy found: {proxy} (Response time: {response_time:.2f}s)")
-                        
-                except Exception as e:
-                    print(f"Error testing proxy: {e}")
+            if self.snapshot:
+                self.snapshot.tick()
         
+        if self.metrics:
+            self.metrics.start_type(proxy_type)
+        working_proxies = self.engine.test_proxies(proxies, proxy_type, on_result=on_result)
+        if self.history:
+            self.history.flush()
+        self.stage_reports[proxy_type] = self.engine.stage_report()
+        if self.metrics:
+            self.metrics.finish_type(proxy_type, self.stage_reports[proxy_type])
+        self.target_reports[proxy_type] = self.engine.targets.report()
+        self.rate_limit_reports[proxy_type] = self.engine.rate_limits.report()
+        self.concurrency_reports[proxy_type] = dict(self.engine.concurrency_report,
+                                                    timeline=self.engine.concurrency_timeline)
+        self.print_stage_report(proxy_type)
         return working_proxies
     
-    def save_working_proxies(self, working_proxies: List[Dict], proxy_type: str):
-        """Save working proxies to files"""
-        if not working_proxies:
+    def start_metrics(self):
+        """Collect run metrics if they are served or written anywhere"""
+        if not (self.settings.metrics_listen or self.settings.metrics_textfile):
+            return
+        self.metrics = CheckerMetrics()
+        self.metrics.track_engine(self.engine)
+        if self.settings.metrics_listen:
+            print(f"📈 Metrics served at {self.metrics.serve(self.settings.metrics_listen)}")
+    
+    def report_snapshot(self, snapshot: Dict):
+        """Log each publication of the best-N snapshot"""
+        kept = sum(len(results) for results in snapshot['by_type'].values())
+        print(f"📸 Best proxies snapshot: {kept} of {snapshot['working_so_far']} working so far "
+              f"-> {self.snapshot.json_path}")
+    
+    def print_stage_report(self, proxy_type: str):
+        """Print survival counts and timing for each probe stage"""
+        report = self.stage_reports.get(proxy_type, {})
+        if not report:
+            return
+        print(f"Stage report for {proxy_type.upper()}:")
+        for stage, stats in report.items():
+            print(f"  - {stage}: {stats['passed']}/{stats['tested']} survived ({stats['survival_rate']}%), "
+                  f"wall {stats['wall_seconds']}s, worker time {stats['busy_seconds']}s")
+        validate = report.get('validate')
+        if validate:
+            print(f"  - connections: {validate['connections_opened']} opened, "
+                  f"{validate['connections_reused']} requests over an open one")
+        detect = report.get('detect')
+        if detect:
+            print(f"  - protocols: {detect['as_listed']} as listed, {detect['relabelled']} relabelled, "
+                  f"{detect['undetected']} undetected, {detect['extra_connects']} validated on a new connection")
+        for url, stats in self.target_reports.get(proxy_type, {}).items():
+            print(f"  - target {url}: {stats['ok']}/{stats['requests']} ok, "
+                  f"{stats['nonce_mismatch']} nonce mismatches")
+        limits = self.rate_limit_reports.get(proxy_type)
+        if limits and (limits['target_waits'] or limits['subnet_waits']):
+            print(f"  - rate limits: {limits['target_waits']} waits on test URLs "
+                  f"({limits['target_wait_seconds']}s), {limits['subnet_waits']} on /24s "
+                  f"({limits['subnet_wait_seconds']}s)")
+        concurrency = self.concurrency_reports.get(proxy_type)
+        if concurrency:
+            print(f"  - concurrency: {concurrency['min']}-{concurrency['max']} "
+                  f"(mean {concurrency['mean']}, final {concurrency['final']}, ceiling {concurrency['ceiling']})")
+    
+    @staticmethod
+    def format_percentiles(points: Dict[str, float]) -> str:
+        """Render {'p50': .., 'p90': .., 'p99': ..} as '0.41 / 1.20 / 3.05s'"""
+        return ' / '.join(f"{value:.2f}" for value in points.values()) + 's'
+    
+    def result_stream(self, proxy_type: str) -> ResultStream:
+        """Result files of a type, opened on first use and kept open until the run ends
+
+        With protocol detection, any type's list can turn up proxies of this type.
+        """
+        stream = self.result_streams.get(proxy_type)
+        if stream is None:
+            timestamp = self.run_timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+            stream = self.result_streams[proxy_type] = ResultStream(
+                os.path.join(self.output_dir, f"working_{proxy_type}_{timestamp}.txt"),
+                os.path.join(self.output_dir, f"working_{proxy_type}_{timestamp}.ndjson")
+            )
+        return stream
+
+    def save_working_proxies(self, proxy_type: str):
+        """Close a type's result files and publish them as the _latest files"""
+        stream = self.result_streams.get(proxy_type)
+        if not stream or not stream.close():
             print(f"No working {proxy_type.upper()} proxies found")
             return
         
-        # Create output directory
-        output_dir = "working_proxies"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Save as text file (simple format)
-        txt_file = os.path.join(output_dir, f"working_{proxy_type}_{timestamp}.txt")
-        with open(txt_file, 'w') as f:
-            for proxy_info in working_proxies:
-                f.write(f"{proxy_info['proxy']}\n")
-        
-        # Save as JSON file (detailed format)
-        json_file = os.path.join(output_dir, f"working_{proxy_type}_{timestamp}.json")
-        with open(json_file, 'w') as f:
-            json.dump(working_proxies, f, indent=2)
-        
-        # Save to latest file (overwrite previous)
+        output_dir = self.output_dir
         latest_txt = os.path.join(output_dir, f"working_{proxy_type}_latest.txt")
-        latest_json = os.path.join(output_dir, f"working_{proxy_type}_latest.json")
+        latest_ndjson = os.path.join(output_dir, f"working_{proxy_type}_latest.ndjson")
         
-        with open(latest_txt, 'w') as f:
-            for proxy_info in working_proxies:
-                f.write(f"{proxy_info['proxy']}\n")
+        # Swap the latest files in with a rename, never rewrite them in place
+        stream.publish(latest_txt, latest_ndjson)
+        saved = [stream.txt_path, stream.ndjson_path, latest_txt, latest_ndjson]
         
-        with open(latest_json, 'w') as f:
-            json.dump(working_proxies, f, indent=2)
+        # Pretty JSON is post-processing of the NDJSON stream
+        if self.pretty_json:
+            json_file = f"{os.path.splitext(stream.ndjson_path)[0]}.json"
+            latest_json = os.path.join(output_dir, f"working_{proxy_type}_latest.json")
+            write_pretty_json(stream.ndjson_path, json_file)
+            replace_atomic(json_file, latest_json)
+            saved += [json_file, latest_json]
         
-        print(f"Saved {len(working_proxies)} working {proxy_type.upper()} proxies to:")
-        print(f"  - {txt_file}")
-        print(f"  - {json_file}")
-        print(f"  - {latest_txt}")
-        print(f"  - {latest_json}")
+        print(f"Saved {stream.count} working {proxy_type.upper()} proxies to:")
+        for path in saved:
+            print(f"  - {path}")
     
     def generate_summary_report(self):
         """Generate a summary report of all working proxies"""
-        output_dir = "working_proxies"
+        output_dir = self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
         summary_file = os.path.join(output_dir, f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
         
         summary = {
@@ -187,7 +288,26 @@ class ProxyFinder:
                 for proxy_type, proxies in self.working_proxies.items()
             },
             'fastest_proxies': {},
-            'source': 'https://github.com/TheSpeedX/SOCKS-List'
+            'stages': self.stage_reports,
+            # Probes in flight chosen by the adaptive controller, with its timeline
+            'concurrency': self.concurrency_reports,
+            # Requests and outcomes per test URL
+            'targets': self.target_reports,
+            # Waits on the per-URL and per-/24 token buckets
+            'rate_limits': self.rate_limit_reports,
+            # Seconds per probe phase over the working proxies of each type
+            'latency': {
+                proxy_type: latency_summary(proxies)
+                for proxy_type, proxies in self.working_proxies.items()
+                if proxies
+            },
+            # Working proxies per anonymity level
+            'anonymity': {
+                proxy_type: anonymity_counts(proxies)
+                for proxy_type, proxies in self.working_proxies.items()
+                if proxies
+            },
+            'sources': [source.name for source in self.source_registry.sources]
         }
         
         # Find fastest proxies for each type
@@ -205,18 +325,41 @@ class ProxyFinder:
     def run(self, proxy_types: List[str] = None):
         """Main execution function"""
         if proxy_types is None:
-            proxy_types = ['http', 'socks4', 'socks5']
+            proxy_types = self.settings.proxy_types
         
         print("=" * 60)
         print("🔍 PROXY FINDER - Finding Working Proxies")
         print("=" * 60)
-        print(f"Source: https://github.com/TheSpeedX/SOCKS-List")
-        print(f"Testing against: {', '.join(self.test_urls)}")
+        print(f"Sources: {', '.join(source.name for source in self.source_registry.sources)}")
+        print(f"Testing against: {', '.join(self.test_urls)} ({self.settings.target_strategy})")
         print(f"Timeout: {self.timeout}s per proxy")
-        print(f"Max concurrent threads: {self.max_workers}")
+        if self.settings.adaptive_concurrency:
+            print(f"Concurrent probes: adaptive, {self.settings.min_concurrency}-{self.max_concurrency}")
+        else:
+            print(f"Max concurrent probes: {self.max_concurrency}")
+        print(f"TCP pre-filter: {'on' if self.prefilter else 'off'} ({self.connect_timeout}s connect timeout)")
+        print(f"Retries after timeout/reset: {self.settings.probe_retries}")
         print("=" * 60)
         
         start_time = time.time()
+        self.run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.history_path:
+            self.history = ProxyHistory(self.history_path)
+        if self.negative_cache_path:
+            self.negative_cache = NegativeCache(self.negative_cache_path, self.settings.negative_ttl,
+                                                self.settings.negative_ttl_transient)
+        
+        if self.settings.best_n:
+            self.snapshot = BestSnapshot(
+                os.path.join(self.output_dir, 'best_proxies.json'),
+                os.path.join(self.output_dir, 'best_proxies.txt'),
+                size=self.settings.best_n,
+                interval=self.settings.snapshot_interval,
+                on_publish=self.report_snapshot
+            )
+        
+        self.start_metrics()
+        self.fetch_proxies(proxy_types)
         
         for proxy_type in proxy_types:
             print(f"\n🔎 Processing {proxy_type.upper()} proxies...")
@@ -226,15 +369,49 @@ class ProxyFinder:
             if not proxies:
                 continue
             
+            if self.negative_cache:
+                proxies, skipped = self.negative_cache.filter(proxies, proxy_type)
+                print(f"Negative cache: {skipped} recently failed proxies skipped")
+                if not proxies:
+                    continue
+            
+            # Skip proxies still in backoff and put the promising ones first:
+            # recently working by latency, then those listed by the most sources
+            attribution = self.candidates['attribution']
+            if self.history:
+                proxies, plan = self.history.plan(proxies, proxy_type, popularity=attribution.source_count)
+                print(f"History: {plan['recent']} recently working, {plan['new']} new, "
+                      f"{plan['retry']} due for retry, {plan['skipped']} skipped (backoff)")
+                if not proxies:
+                    continue
+            else:
+                proxies = attribution.rank(proxies)
+            
             # Test proxies
             working_proxies = self.test_proxies_batch(proxies, proxy_type)
-            self.working_proxies[proxy_type] = working_proxies
-            
-            # Save results
-            self.save_working_proxies(working_proxies, proxy_type)
+            self.attribute_sources(working_proxies)
+            for result in working_proxies:
+                self.working_proxies.setdefault(result['type'], []).append(result)
+        
+        # Save results, by the type each proxy speaks
+        for proxy_type in dict.fromkeys([*proxy_types, *self.result_streams]):
+            self.save_working_proxies(proxy_type)
+        
+        if self.history:
+            self.history.close()
+            self.history = None
+        if self.negative_cache:
+            self.negative_cache.save()
+            self.negative_cache = None
+        
+        if self.snapshot:
+            self.snapshot.publish()
         
         # Generate summary
         summary = self.generate_summary_report()
+        if self.metrics:
+            self.metrics.close(self.settings.metrics_textfile)
+            self.metrics = None
         
         total_time = time.time() - start_time
         print("\n" + "=" * 60)
@@ -250,17 +427,29 @@ class ProxyFinder:
             for proxy_type, fastest in summary['fastest_proxies'].items():
                 print(f"  - {proxy_type.upper()}: {fastest['proxy']} ({fastest['response_time']}s)")
         
+        if summary['latency']:
+            print("\n⏱️  Latency percentiles (p50 / p90 / p99):")
+            for proxy_type, latency in summary['latency'].items():
+                print(f"  - {proxy_type.upper()}: total {self.format_percentiles(latency['total'])}, "
+                      f"connect {self.format_percentiles(latency['connect'])}, "
+                      f"TTFB {self.format_percentiles(latency['ttfb'])}")
+        
+        if summary['anonymity']:
+            print("\n🕶️  Anonymity (elite / anonymous / transparent / unclassified):")
+            for proxy_type, counts in summary['anonymity'].items():
+                print(f"  - {proxy_type.upper()}: {counts['elite']} / {counts['anonymous']} / "
+                      f"{counts['transparent']} / {counts['unclassified']}")
+        
         print("=" * 60)
 
 
 def main():
     """Main function"""
-    proxy_finder = ProxyFinder()
+    settings = load_settings(sys.argv[1:], description="Find working proxies from the configured sources")
+    proxy_finder = ProxyFinder(settings)
     
-    # You can specify which proxy types to test
-    # proxy_finder.run(['http'])  # Test only HTTP proxies
-    # proxy_finder.run(['socks5'])  # Test only SOCKS5 proxies
-    proxy_finder.run()  # Test all proxy types
+    # Proxy types come from settings, e.g. --proxy-types http,socks5 or PROXY_TYPE=socks5
+    proxy_finder.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Proxy History Store
+Keeps a small SQLite database of every proxy seen across runs so that
+new and recently-working proxies are tested first and long-dead ones are
+only retried on an exponential backoff schedule.
+"""
+
+import os
+import sqlite3
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from proxy_store import ProxyList, sort_key, take_sorted
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxy_history (
+    proxy TEXT NOT NULL,
+    type TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_tested REAL,
+    last_success REAL,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    latency REAL,
+    PRIMARY KEY (proxy, type)
+)
+"""
+
+# Candidates of one plan() call, so SQLite joins them with the history instead of Python
+PLAN_INPUT = """
+CREATE TEMP TABLE IF NOT EXISTS plan_input (
+    position INTEGER PRIMARY KEY,
+    proxy TEXT NOT NULL
+)
+"""
+
+
+class ProxyHistory:
+    """On-disk record of past probe outcomes keyed by ip:port and type"""
+
+    def __init__(self, path: str = 'proxy_history.db', dead_after: int = 3,
+                 backoff_base_hours: float = 6, max_backoff_hours: float = 24 * 14):
+        self.path = path
+        # Failures in a row before a proxy is considered dead and backed off
+        self.dead_after = dead_after
+        self.backoff_base = backoff_base_hours * 3600
+        self.max_backoff = max_backoff_hours * 3600
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        self._pending: List[Tuple] = []
+
+    def next_retry_at(self, last_tested: Optional[float], consecutive_failures: int) -> float:
+        """When a failing proxy becomes due for another probe"""
+        if not last_tested or consecutive_failures < self.dead_after:
+            return 0
+        backoff = self.backoff_base * (2 ** (consecutive_failures - self.dead_after))
+        return last_tested + min(backoff, self.max_backoff)
+
+    def plan(self, proxies: Iterable[str], proxy_type: str, now: Optional[float] = None,
+             popularity: Optional[Callable[[str], int]] = None) -> Tuple[ProxyList, Dict[str, int]]:
+        """Order proxies for testing and drop the ones still in backoff
+
+        Returns the proxies to test (recently working first, fastest
+        first; then new ones; then due retries, fewest failures first) and
+        a count per bucket including skipped ones. `popularity` (e.g. the
+        number of sources listing a proxy) puts the more popular first
+        within the new and retry buckets.
+
+        The candidates are loaded into a temporary table and joined with
+        the history there, one row at a time, so memory does not grow with
+        the history; each bucket is sorted as one integer per entry.
+        """
+        now = now or time.time()
+        if not isinstance(proxies, ProxyList):
+            proxies = ProxyList(proxies)
+        self.conn.execute(PLAN_INPUT)
+        self.conn.execute('DELETE FROM plan_input')
+        self.conn.executemany('INSERT INTO plan_input VALUES (?, ?)', enumerate(proxies))
+
+        # Sort keys (rank, then list position); duplicates are dropped by GROUP BY
+        recent, new, retry = array('Q'), array('Q'), array('Q')
+        skipped = 0
+        rows = self.conn.execute(
+            'SELECT MIN(i.position), i.proxy, h.last_tested, h.last_success, h.consecutive_failures, h.latency '
+            'FROM plan_input i LEFT JOIN proxy_history h ON h.proxy = i.proxy AND h.type = ? '
+            'GROUP BY i.proxy ORDER BY 1', (proxy_type,)
+        )
+        for position, proxy, last_tested, last_success, failures, latency in rows:
+            less_popular = 0xFFFF - min(popularity(proxy), 0xFFFF) if popularity else 0
+            if last_tested is None:
+                # Never probed before (or only listed, never reached)
+                new.append(sort_key(less_popular, position))
+            elif last_success and failures == 0:
+                recent.append(sort_key(int((latency or 0) * 1000), position))
+            elif now >= self.next_retry_at(last_tested, failures):
+                retry.append(sort_key(min(failures, 0xFFFF) << 16 | less_popular, position))
+            else:
+                skipped += 1
+
+        self.conn.execute(
+            'INSERT INTO proxy_history (proxy, type, first_seen, last_seen) '
+            'SELECT DISTINCT proxy, ?, ?, ? FROM plan_input WHERE true '
+            'ON CONFLICT(proxy, type) DO UPDATE SET last_seen = excluded.last_seen',
+            (proxy_type, now, now)
+        )
+        self.conn.execute('DELETE FROM plan_input')
+        self.conn.commit()
+
+        ordered = take_sorted(proxies, recent)
+        ordered.extend(take_sorted(proxies, new))
+        ordered.extend(take_sorted(proxies, retry))
+        counts = {'recent': len(recent), 'new': len(new), 'retry': len(retry), 'skipped': skipped}
+        return ordered, counts
+
+    def record(self, outcome: Dict):
+        """Queue a probe outcome; written on the next flush()
+
+        An outcome relabelled by protocol detection is recorded under the
+        type it was listed as too: that is the row plan() schedules.
+        """
+        if outcome.get('reason') == 'local':
+            # Our own fd/port exhaustion says nothing about the proxy
+            return
+        now = time.time()
+        for proxy_type in dict.fromkeys((outcome['type'], outcome.get('listed_type') or outcome['type'])):
+            if outcome['working']:
+                self._pending.append((outcome['proxy'], proxy_type, now, now, now, now, 0, 1,
+                                      outcome['response_time']))
+            else:
+                self._pending.append((outcome['proxy'], proxy_type, now, now, now, None, 1, 0, None))
+        if len(self._pending) >= 1000:
+            self.flush()
+
+    def flush(self):
+        """Write queued outcomes in one transaction"""
+        if not self._pending:
+            return
+        self.conn.executemany(
+            'INSERT INTO proxy_history (proxy, type, first_seen, last_seen, last_tested, last_success, '
+            'consecutive_failures, success_count, latency) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(proxy, type) DO UPDATE SET '
+            'last_seen = excluded.last_seen, '
+            'last_tested = excluded.last_tested, '
+            'last_success = COALESCE(excluded.last_success, last_success), '
+            'consecutive_failures = CASE WHEN excluded.last_success IS NULL '
+            'THEN consecutive_failures + 1 ELSE 0 END, '
+            'success_count = success_count + excluded.success_count, '
+            'latency = COALESCE(excluded.latency, latency)',
+            self._pending
+        )
+        self.conn.commit()
+        self._pending = []
+
+    def close(self):
+        """Flush pending outcomes and close the database"""
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Proxy Source Registry
+Reads the `proxy_sources` map from config.json, fetches every source in
+parallel through the source cache, normalizes and validates addresses and
+removes duplicates across sources (and proxy types) before testing.
+Merged candidates are kept packed (see proxy_store.py): one integer per
+address for the per-type lists and one for its source attribution.
+"""
+
+import json
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from proxy_store import MAX_RANK, ProxyList, pack_address, sort_key, take_sorted, unpack_address
+from source_cache import SourceCache
+
+PROXY_TYPES = ('http', 'socks4', 'socks5')
+
+# Attribution packs one vote counter per type below the bitmask of sources
+VOTE_BITS = 16
+VOTE_MAX = (1 << VOTE_BITS) - 1
+SOURCE_SHIFT = VOTE_BITS * len(PROXY_TYPES)
+
+# Scheme prefixes seen in public lists, mapped onto the types we test
+SCHEME_TYPES = {
+    'http': 'http',
+    'https': 'http',
+    'socks4': 'socks4',
+    'socks4a': 'socks4',
+    'socks5': 'socks5',
+    'socks5h': 'socks5',
+}
+
+DEFAULT_SOURCES = {
+    'http': 'https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/http.txt',
+    'socks4': 'https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/socks4.txt',
+    'socks5': 'https://raw.githubusercontent.com/TheSpeedX/SOCKS-List/master/socks5.txt',
+}
+
+
+def normalize_address(address: str) -> Optional[str]:
+    """Return a canonical IPv4 ip:port, or None if the address is not valid"""
+    host, _, port = address.strip().rpartition(':')
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        return None
+    octets = host.split('.')
+    if len(octets) != 4 or not all(octet.isdigit() and int(octet) < 256 for octet in octets):
+        return None
+    # int() also strips zero padding such as 001.002.003.004
+    return f"{'.'.join(str(int(octet)) for octet in octets)}:{int(port)}"
+
+
+def normalize_entry(entry: str, default_type: Optional[str]) -> Optional[str]:
+    """Normalize one list entry to type://ip:port
+
+    Accepts plain ip:port (typed by the source) and scheme://ip:port
+    (typed by the scheme). Entries with credentials are skipped.
+    """
+    entry = entry.strip()
+    proxy_type = default_type
+    if '://' in entry:
+        scheme, _, entry = entry.partition('://')
+        proxy_type = SCHEME_TYPES.get(scheme.lower())
+    entry = entry.split('/', 1)[0].split('#', 1)[0].strip()
+    if not proxy_type or '@' in entry:
+        return None
+    address = normalize_address(entry)
+    return f"{proxy_type}://{address}" if address else None
+
+
+def json_entries(text: str) -> Iterable[str]:
+    """Yield raw entries from a JSON list of strings or of proxy objects"""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        # Common wrappers: {"proxies": [...]}, {"data": [...]}
+        data = data.get('proxies') or data.get('data') or []
+    for item in data:
+        if isinstance(item, str):
+            yield item
+            continue
+        if not isinstance(item, dict):
+            continue
+        host = item.get('ip') or item.get('host') or item.get('address')
+        port = item.get('port')
+        if not host:
+            continue
+        address = f"{host}:{port}" if port else str(host)
+        protocols = item.get('protocols') or item.get('protocol') or item.get('type')
+        if isinstance(protocols, str):
+            protocols = [protocols]
+        if protocols:
+            for protocol in protocols:
+                yield f"{str(protocol).lower()}://{address}"
+        else:
+            yield address
+
+
+class ProxySource:
+    """One configured list: where it lives, its format and default type"""
+
+    def __init__(self, url: str, proxy_type: Optional[str] = None,
+                 fmt: str = 'text', name: Optional[str] = None):
+        self.url = url
+        self.proxy_type = proxy_type if proxy_type in PROXY_TYPES else None
+        self.format = fmt
+        parts = urlsplit(url)
+        self.name = name or f"{parts.netloc}{parts.path}"
+        # Snapshots hold parsed type://ip:port entries, so they depend on how we parse
+        self.cache_key = f"{url}|{self.proxy_type}|{fmt}"
+
+    def parse(self, text: str) -> List[str]:
+        """Turn a response body into normalized type://ip:port entries"""
+        raw = json_entries(text) if self.format == 'json' else text.splitlines()
+        entries = []
+        for entry in raw:
+            normalized = normalize_entry(entry, self.proxy_type)
+            if normalized:
+                entries.append(normalized)
+        return entries
+
+
+class Attribution:
+    """Which sources listed each address and under which types
+
+    One dict entry per address, keyed by its packed form, holding a single
+    integer: a vote counter per proxy type in the low bits and a bitmask of
+    source indexes above them.
+    """
+
+    __slots__ = ('source_names', '_entries')
+
+    def __init__(self, source_names: Iterable[str]):
+        self.source_names = list(source_names)
+        self._entries: Dict = {}
+
+    @staticmethod
+    def _key(address: str):
+        packed = pack_address(address)
+        return address if packed is None else packed
+
+    def add(self, address: str, source_index: int, proxy_type: str):
+        """Count one listing of `address` as `proxy_type` by a source"""
+        key = self._key(address)
+        value = self._entries.get(key, 0) | (1 << (SOURCE_SHIFT + source_index))
+        shift = VOTE_BITS * PROXY_TYPES.index(proxy_type)
+        if (value >> shift) & VOTE_MAX < VOTE_MAX:
+            value += 1 << shift
+        self._entries[key] = value
+
+    def votes(self, value: int) -> Dict[str, int]:
+        """Listings per type held in one packed value"""
+        return {
+            proxy_type: (value >> (VOTE_BITS * index)) & VOTE_MAX
+            for index, proxy_type in enumerate(PROXY_TYPES)
+            if (value >> (VOTE_BITS * index)) & VOTE_MAX
+        }
+
+    def sources(self, address: str) -> List[str]:
+        """Names of the sources that listed an address, in config order"""
+        mask = self._entries.get(self._key(address), 0) >> SOURCE_SHIFT
+        return [name for index, name in enumerate(self.source_names) if mask >> index & 1]
+
+    def source_count(self, address: str) -> int:
+        """How many sources listed an address"""
+        return bin(self._entries.get(self._key(address), 0) >> SOURCE_SHIFT).count('1')
+
+    def rank(self, proxies: Iterable[str]) -> ProxyList:
+        """Proxies listed by more sources first, list order otherwise"""
+        if not isinstance(proxies, ProxyList):
+            proxies = ProxyList(proxies)
+        # Sorts one integer per entry instead of the strings
+        keys = array('Q', (sort_key(MAX_RANK - self.source_count(proxy), position)
+                           for position, proxy in enumerate(proxies)))
+        return take_sorted(proxies, keys)
+
+    def types(self, address: str) -> List[str]:
+        """Types an address was listed under"""
+        return sorted(self.votes(self._entries.get(self._key(address), 0)))
+
+    def get(self, address: str, default=None) -> Optional[Dict]:
+        """{'sources': [...], 'types': [...]} for an address, like a dict lookup"""
+        if self._key(address) not in self._entries:
+            return default
+        return {'sources': self.sources(address), 'types': self.types(address)}
+
+    def items(self):
+        """(packed address or string, packed value) pairs in first-seen order"""
+        return self._entries.items()
+
+    def __contains__(self, address: str) -> bool:
+        return self._key(address) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SourceRegistry:
+    """All configured sources, fetched together and merged"""
+
+    def __init__(self, sources: List[ProxySource], cache: Optional[SourceCache] = None,
+                 max_workers: int = 8, dedupe_across_types: bool = True, detect_protocol: bool = False):
+        self.sources = sources
+        self.cache = cache or SourceCache()
+        self.max_workers = max_workers
+        # Keep an endpoint listed under several types only under its most-listed type. Only
+        # with protocol detection, which finds what it speaks whatever type it is probed as;
+        # without it every listed type is tested, or a mislabelled list would hide a proxy
+        self.dedupe_across_types = dedupe_across_types and detect_protocol
+
+    @classmethod
+    def from_config(cls, config_path: str = 'config.json', cache: Optional[SourceCache] = None,
+                    **kwargs) -> 'SourceRegistry':
+        """Build the registry from `settings.proxy_sources` in config.json
+
+        Each key is a proxy type (or any other name, e.g. "mixed", for lists
+        whose entries carry a scheme). Values may be a URL, an object with
+        `url` and optional `format` ("text" or "json") and `name`, or a list
+        of either.
+        """
+        settings = {}
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                settings = json.load(f).get('settings', {})
+        proxy_sources = settings.get('proxy_sources') or DEFAULT_SOURCES
+        kwargs.setdefault('dedupe_across_types', settings.get('dedupe_across_types', True))
+
+        sources = []
+        for key, entries in proxy_sources.items():
+            if not isinstance(entries, list):
+                entries = [entries]
+            for entry in entries:
+                if isinstance(entry, str):
+                    entry = {'url': entry}
+                sources.append(ProxySource(
+                    entry['url'],
+                    proxy_type=entry.get('type', key),
+                    fmt=entry.get('format', 'json' if entry['url'].endswith('.json') else 'text'),
+                    name=entry.get('name')
+                ))
+        return cls(sources, cache=cache, **kwargs)
+
+    def _fetch(self, source: ProxySource) -> Dict:
+        try:
+            return self.cache.fetch(source.url, parse=source.parse, key=source.cache_key)
+        except Exception as e:
+            return {'error': str(e), 'entries': [], 'new': [], 'removed': 0,
+                    'not_modified': False, 'bytes': 0}
+
+    @staticmethod
+    def _entry_key(proxy_type: str, address: str):
+        """Packed set key for one type://ip:port entry"""
+        packed = pack_address(address)
+        if packed is None:
+            return f"{proxy_type}://{address}"
+        return packed << 2 | PROXY_TYPES.index(proxy_type)
+
+    def fetch_all(self, proxy_types: Iterable[str] = PROXY_TYPES) -> Dict:
+        """Fetch every source in parallel and merge them
+
+        Returns `by_type` (deduplicated ip:port lists per type, as
+        ProxyList), `new` (entries new in at least one source, per type),
+        `attribution` (an Attribution) and `stats`. An endpoint listed
+        under several types is only folded into one of the requested
+        types; `stats['multi_type']` counts such endpoints and
+        `stats['type_folded']` the listings not tested separately.
+        """
+        proxy_types = list(proxy_types)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.sources)))) as executor:
+            results = list(executor.map(self._fetch, self.sources))
+
+        attribution = Attribution(source.name for source in self.sources)
+        new_entries = set()
+        stats = {'sources': {}, 'raw_entries': 0}
+        for source_index, (source, result) in enumerate(zip(self.sources, results)):
+            stats['sources'][source.name] = {
+                'entries': len(result['entries']),
+                'new': len(result['new']),
+                'not_modified': result['not_modified'],
+                'bytes': result['bytes'],
+                'error': result.get('error'),
+            }
+            stats['raw_entries'] += len(result['entries'])
+            new_entries.update(self._entry_key(*entry.split('://', 1)) for entry in result['new'])
+            for entry in result['entries']:
+                proxy_type, _, address = entry.partition('://')
+                attribution.add(address, source_index, proxy_type)
+            # Each source's parsed list can go as soon as it is merged
+            results[source_index] = None
+
+        by_type = {proxy_type: ProxyList() for proxy_type in proxy_types}
+        new = {proxy_type: ProxyList() for proxy_type in proxy_types}
+        multi_type = folded = 0
+        for key, value in attribution.items():
+            address = key if isinstance(key, str) else unpack_address(key)
+            votes = attribution.votes(value)
+            # Only the requested types compete, so a run over one type never loses an endpoint
+            chosen = [proxy_type for proxy_type in votes if proxy_type in by_type]
+            if len(votes) > 1:
+                multi_type += 1
+            if self.dedupe_across_types and len(chosen) > 1:
+                # Most sources win; ties go to the first type in PROXY_TYPES order
+                folded += len(chosen) - 1
+                chosen = [max(chosen, key=lambda t: (votes[t], -PROXY_TYPES.index(t)))]
+            for proxy_type in chosen:
+                by_type[proxy_type].append(address)
+                if self._entry_key(proxy_type, address) in new_entries:
+                    new[proxy_type].append(address)
+
+        stats['unique_entries'] = len(attribution)
+        stats['multi_type'] = multi_type
+        stats['type_folded'] = folded
+        stats['selected'] = {proxy_type: len(proxies) for proxy_type, proxies in by_type.items()}
+        return {'by_type': by_type, 'new': new, 'attribution': attribution, 'stats': stats}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compact Proxy Storage
+Candidate lists run to hundreds of thousands of entries once every source
+is merged. As Python strings in a list each `ip:port` costs around 60
+bytes plus its list slot; packed into one 48-bit integer (IPv4 address
+and port) in an `array('Q')` it costs 8. Strings are only built again
+when an entry is iterated, one at a time.
+
+Entries that do not pack (hostnames, IPv6, non-canonical forms) are kept
+as strings on the side, and their position in the array holds a flagged
+index into that side list, so order is preserved.
+"""
+
+import socket
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+OTHER_FLAG = 1 << 63
+
+# Sort keys: a rank in the high bits and a list position in the low ones
+POSITION_BITS = 32
+POSITION_MASK = (1 << POSITION_BITS) - 1
+MAX_RANK = (1 << (64 - POSITION_BITS)) - 1
+
+
+def pack_address(address: str) -> Optional[int]:
+    """Canonical IPv4 ip:port as one integer, or None if it does not pack"""
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit() or str(int(port)) != port or int(port) > 0xFFFF:
+        return None
+    try:
+        packed = socket.inet_pton(socket.AF_INET, host)
+    except (OSError, ValueError):
+        return None
+    return int.from_bytes(packed, 'big') << 16 | int(port)
+
+
+def unpack_address(value: int) -> str:
+    """The ip:port string a packed integer stands for"""
+    return f"{socket.inet_ntoa((value >> 16).to_bytes(4, 'big'))}:{value & 0xFFFF}"
+
+
+def sort_key(rank: int, position: int) -> int:
+    """One integer ordering entries by rank (clamped to MAX_RANK), then list position"""
+    return min(max(rank, 0), MAX_RANK) << POSITION_BITS | position
+
+
+def take_sorted(proxies: 'ProxyList', keys: Iterable[int]) -> 'ProxyList':
+    """Entries of `proxies` at the positions held in sort keys, in key order"""
+    ordered = ProxyList()
+    for key in sorted(keys):
+        ordered.append(proxies[key & POSITION_MASK])
+    return ordered
+
+
+class ProxyList:
+    """Ordered, array-backed list of ip:port strings
+
+    Supports what callers do with a list of proxies: len, iteration,
+    indexing, slicing (including steps), append/extend and pickling.
+    """
+
+    __slots__ = ('_packed', '_other')
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._packed = array('Q')
+        self._other = []
+        self.extend(entries)
+
+    def append(self, address: str):
+        value = pack_address(address)
+        if value is None or unpack_address(value) != address:
+            value = OTHER_FLAG | len(self._other)
+            self._other.append(address)
+        self._packed.append(value)
+
+    def extend(self, entries: Iterable[str]):
+        for address in entries:
+            self.append(address)
+
+    def _decode(self, value: int) -> str:
+        if value & OTHER_FLAG:
+            return self._other[value & ~OTHER_FLAG]
+        return unpack_address(value)
+
+    def __len__(self) -> int:
+        return len(self._packed)
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self._packed:
+            yield self._decode(value)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            sliced = ProxyList()
+            if self._other:
+                sliced.extend(self._decode(value) for value in self._packed[index])
+            else:
+                sliced._packed = self._packed[index]
+            return sliced
+        return self._decode(self._packed[index])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ProxyList) and not (self._other or other._other):
+            return self._packed == other._packed
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"ProxyList({len(self)} entries)"
+
+    def __getstate__(self):
+        return self._packed, self._other
+
+    def __setstate__(self, state):
+        self._packed, self._other = state
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the packed array (side strings not counted)"""
+        return self._packed.itemsize * len(self._packed)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Probe Rate Limits
+Token buckets that keep a run from throttling itself: one per validation
+target (so hundreds of probes do not trip an echo service's rate limit
+and come back as false negatives) and one per proxy /24 (so a block of
+addresses from one upstream network is not hammered at once).
+
+Buckets hand out reservations: a caller takes a token even when none is
+left and sleeps for as long as the debt takes to refill, so waiters are
+served in arrival order without a lock. Candidates are interleaved across
+/24s before probing so the workers spread over many buckets instead of
+queueing on one.
+"""
+
+import asyncio
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional
+
+from proxy_store import pack_address
+
+MAX_SUBNET_BUCKETS = 100000  # idle /24 buckets beyond this are forgotten, oldest first
+
+
+def subnet_key(proxy: str) -> str:
+    """Group of a proxy address: its IPv4 /24, or the host for anything else"""
+    host = proxy.split('://', 1)[-1].rpartition(':')[0]
+    octets = host.split('.')
+    if len(octets) == 4:
+        return '.'.join(octets[:3])
+    return host
+
+
+def interleave_by_subnet(proxies) -> Iterator[str]:
+    """Round-robin over /24s, keeping the given order within each round
+
+    The first proxy of every /24 comes first (in list order), then the
+    second of every /24, and so on, so priority order is kept for all but
+    the crowded subnets, which are spread over the whole run.
+    """
+    seen: Dict = {}
+    rounds = []  # round -> array of list indexes
+    for index, proxy in enumerate(proxies):
+        packed = pack_address(proxy)
+        # Packed ip:port shifted past the port and last octet is the /24, and smaller than a str
+        key = subnet_key(proxy) if packed is None else packed >> 24
+        position = seen.get(key, 0)
+        seen[key] = position + 1
+        if position == len(rounds):
+            rounds.append(array('L'))
+        rounds[position].append(index)
+    del seen
+    if len(rounds) <= 1:
+        yield from proxies
+        return
+    for indexes in rounds:
+        for index in indexes:
+            yield proxies[index]
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """Take one token; seconds to wait before using it"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimits:
+    """Per-target and per-/24 buckets for one engine; a rate of 0 disables a limit"""
+
+    def __init__(self, target_rate: float = 0, subnet_rate: float = 0,
+                 target_burst: Optional[float] = None, subnet_burst: Optional[float] = None):
+        self.target_rate = target_rate
+        self.subnet_rate = subnet_rate
+        self.target_burst = target_burst
+        self.subnet_burst = subnet_burst
+        self._targets: Dict[str, TokenBucket] = {}
+        self._subnets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self.stats: Dict[str, float] = {}
+        self.reset()
+
+    def reset(self):
+        """Clear the wait counters (buckets keep their state)"""
+        self.stats = {'target_waits': 0, 'target_wait_seconds': 0.0,
+                      'subnet_waits': 0, 'subnet_wait_seconds': 0.0}
+
+    def _subnet_bucket(self, key: str) -> TokenBucket:
+        bucket = self._subnets.get(key)
+        if bucket is None:
+            bucket = self._subnets[key] = TokenBucket(self.subnet_rate, self.subnet_burst)
+            if len(self._subnets) > MAX_SUBNET_BUCKETS:
+                self._subnets.popitem(last=False)
+        else:
+            self._subnets.move_to_end(key)
+        return bucket
+
+    async def _wait(self, bucket: TokenBucket, kind: str):
+        delay = bucket.reserve()
+        if delay > 0:
+            self.stats[f"{kind}_waits"] += 1
+            self.stats[f"{kind}_wait_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    async def acquire_target(self, url: str):
+        """Wait for a request slot on a validation target"""
+        if not self.target_rate:
+            return
+        bucket = self._targets.get(url)
+        if bucket is None:
+            bucket = self._targets[url] = TokenBucket(self.target_rate, self.target_burst)
+        await self._wait(bucket, 'target')
+
+    async def acquire_subnet(self, proxy: str):
+        """Wait for a probe slot on the proxy's /24"""
+        if not self.subnet_rate:
+            return
+        await self._wait(self._subnet_bucket(subnet_key(proxy)), 'subnet')
+
+    def order(self, proxies: Iterable[str]) -> Iterable[str]:
+        """Probe order for a run: interleaved across /24s when those are limited"""
+        if self.subnet_rate and hasattr(proxies, '__getitem__'):
+            return interleave_by_subnet(proxies)
+        return proxies
+
+    def report(self) -> Dict[str, float]:
+        """How often and how long probes waited on each kind of limit"""
+        return {
+            'target_rate': self.target_rate,
+            'subnet_rate': self.subnet_rate,
+            'target_waits': self.stats['target_waits'],
+            'target_wait_seconds': round(self.stats['target_wait_seconds'], 2),
+            'subnet_waits': self.stats['subnet_waits'],
+            'subnet_wait_seconds': round(self.stats['subnet_wait_seconds'], 2),
+        }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Streaming Result Sinks
+Working proxies are appended to a plain text list and an NDJSON file the
+moment they are found, so a crash or CI timeout keeps everything found so
+far. Files are written under a `.part` name and renamed into place when
+the run finishes; published copies (the `_latest` files) are swapped in
+with an atomic rename. Pretty-printed JSON is an optional last step that
+reads the NDJSON back. BestSnapshot republishes the fastest N proxies per
+type at a fixed interval while the run goes on.
+
+    python result_sinks.py working_proxies/working_http_latest.ndjson
+"""
+
+import heapq
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def replace_atomic(source: str, destination: str):
+    """Make `destination` a copy of `source` without a half-written window
+
+    A hard link avoids copying the data; filesystems without links get a
+    copy. Either way readers see the old or the new file, never a mix.
+    """
+    tmp_path = f"{destination}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        with open(source, 'rb') as src, open(tmp_path, 'wb') as dst:
+            dst.write(src.read())
+    os.replace(tmp_path, destination)
+
+
+def read_ndjson(path: str) -> List[Dict]:
+    """Read every complete record of an NDJSON file"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A crash can leave one truncated last line behind
+                continue
+    return records
+
+
+def write_pretty_json(ndjson_path: str, json_path: str) -> int:
+    """Post-process an NDJSON file into an indented JSON array"""
+    records = read_ndjson(ndjson_path)
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(records, f, indent=2)
+    os.replace(tmp_path, json_path)
+    return len(records)
+
+
+class ResultStream:
+    """Append-as-you-go text and NDJSON files for one proxy type
+
+    Both files are opened on the first result (or at close with
+    `keep_empty`), flushed after every record, and renamed from their
+    `.part` names to the final paths by `close()`.
+    """
+
+    def __init__(self, txt_path: str, ndjson_path: str, keep_empty: bool = False):
+        self.txt_path = txt_path
+        self.ndjson_path = ndjson_path
+        self.keep_empty = keep_empty
+        self.count = 0
+        self._txt = None
+        self._ndjson = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.txt_path) or '.', exist_ok=True)
+        os.makedirs(os.path.dirname(self.ndjson_path) or '.', exist_ok=True)
+        self._txt = open(f"{self.txt_path}.part", 'w')
+        self._ndjson = open(f"{self.ndjson_path}.part", 'w')
+
+    def write(self, result: Dict):
+        """Append one working proxy to both files"""
+        if self._txt is None:
+            self._open()
+        self._txt.write(f"{result['proxy']}\n")
+        self._ndjson.write(json.dumps(result, separators=(',', ':')) + '\n')
+        # Flush per record: the OS has the data even if this process dies
+        self._txt.flush()
+        self._ndjson.flush()
+        self.count += 1
+
+    def close(self) -> bool:
+        """Move the finished files into place; False if nothing was written"""
+        if self._txt is None:
+            if not self.keep_empty:
+                return False
+            self._open()
+        self._txt.close()
+        self._ndjson.close()
+        self._txt = self._ndjson = None
+        os.replace(f"{self.txt_path}.part", self.txt_path)
+        os.replace(f"{self.ndjson_path}.part", self.ndjson_path)
+        return True
+
+    def publish(self, txt_path: str, ndjson_path: str):
+        """Atomically point other names (e.g. the _latest files) at the results"""
+        replace_atomic(self.txt_path, txt_path)
+        replace_atomic(self.ndjson_path, ndjson_path)
+
+
+class BestSnapshot:
+    """Rolling "current best N" working proxies per type
+
+    `add` keeps the N fastest results per type in a bounded heap; `tick`
+    rewrites the snapshot files (atomically) once `interval` seconds have
+    passed since the last publication, so consumers get a usable pool long
+    before the run ends. `on_publish` is called with each snapshot.
+    """
+
+    def __init__(self, json_path: str, txt_path: str, size: int = 100, interval: float = 60,
+                 on_publish: Optional[Callable[[Dict], None]] = None):
+        self.json_path = json_path
+        self.txt_path = txt_path
+        self.size = size
+        self.interval = interval
+        self.on_publish = on_publish
+        self.published = 0
+        self.working = 0
+        self._heaps: Dict[str, List] = {}
+        self._seq = 0
+        self._last_publish = time.monotonic()
+
+    def add(self, result: Dict):
+        """Offer one working proxy to the snapshot"""
+        self.working += 1
+        heap = self._heaps.setdefault(result['type'], [])
+        # Max-heap on response time via negation; seq keeps dicts out of comparisons
+        item = (-result['response_time'], self._seq, result)
+        self._seq += 1
+        if len(heap) < self.size:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def best(self) -> Dict[str, List[Dict]]:
+        """Current fastest results per type, fastest first"""
+        return {
+            proxy_type: [result for _, _, result in sorted(heap, key=lambda item: (-item[0], item[1]))]
+            for proxy_type, heap in sorted(self._heaps.items())
+        }
+
+    def tick(self, now: Optional[float] = None) -> bool:
+        """Publish if the interval has passed; True if it did"""
+        now = time.monotonic() if now is None else now
+        if not self.interval or now - self._last_publish < self.interval:
+            return False
+        self.publish()
+        return True
+
+    def publish(self) -> Dict:
+        """Write the snapshot files now"""
+        self._last_publish = time.monotonic()
+        best = self.best()
+        snapshot = {
+            'updated_at': datetime.now().isoformat(),
+            'working_so_far': self.working,
+            'size': self.size,
+            'by_type': best,
+        }
+        os.makedirs(os.path.dirname(self.json_path) or '.', exist_ok=True)
+        with open(f"{self.json_path}.tmp", 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        with open(f"{self.txt_path}.tmp", 'w') as f:
+            for results in best.values():
+                for result in results:
+                    f.write(f"{result['proxy']}\n")
+        os.replace(f"{self.json_path}.tmp", self.json_path)
+        os.replace(f"{self.txt_path}.tmp", self.txt_path)
+        self.published += 1
+        if self.on_publish:
+            self.on_publish(snapshot)
+        return snapshot
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python result_sinks.py <file.ndjson> [<file.json>]")
+        sys.exit(1)
+    ndjson_path = sys.argv[1]
+    json_path = sys.argv[2] if len(sys.argv) > 2 else f"{os.path.splitext(ndjson_path)[0]}.json"
+    count = write_pretty_json(ndjson_path, json_path)
+    print(f"Wrote {count} records to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
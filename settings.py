@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Checker Settings
+One settings layer for both entry points. Values are resolved from the
+built-in defaults, then config.json, then environment variables, then
+command line flags; later sources win.
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+from async_proxy_engine import DEFAULT_USER_AGENT, SUPPORTED_TYPES
+from validation_targets import STRATEGIES
+
+DEFAULT_CONFIG_PATH = 'config.json'
+
+# Every default target echoes the nonce (and the origin and headers, for classification)
+DEFAULT_TEST_URLS = [
+    'http://httpbin.org/get?nonce={nonce}',
+    'https://httpbingo.org/get?nonce={nonce}',
+]
+
+
+def _bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _list(value) -> List[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+
+def _optional_float(value) -> Optional[float]:
+    return float(value or 0) or None
+
+
+# name: (default, cast, environment variable, config.json keys, help)
+# The first config key found wins, so legacy names go last.
+SETTINGS = {
+    'test_urls': (DEFAULT_TEST_URLS, _list, 'TEST_URLS', ('test_urls',),
+                  "URLs a proxy must fetch (comma separated); {nonce} is replaced and must be echoed"),
+    'target_strategy': ('round_robin', str, 'TARGET_STRATEGY', ('target_strategy',),
+                        f"Test URL each probe tries first: {', '.join(STRATEGIES)}"),
+    'target_rate': (50.0, float, 'TARGET_RATE', ('target_rate',),
+                    "Requests per second to each test URL across all probes, 0 for no limit"),
+    'subnet_rate': (20.0, float, 'SUBNET_RATE', ('subnet_rate',),
+                    "Probes per second into each proxy /24, 0 for no limit"),
+    'timeout': (10.0, float, 'PROBE_TIMEOUT', ('read_timeout', 'timeout'),
+                "Read timeout in seconds for each network step of a probe"),
+    'connect_timeout': (3.0, float, 'CONNECT_TIMEOUT', ('connect_timeout',),
+                        "Timeout in seconds for the TCP pre-filter stage"),
+    'probe_deadline': (None, _optional_float, 'PROBE_DEADLINE', ('probe_deadline',),
+                       "Hard cap in seconds for a whole probe (default: timeout x test URLs)"),
+    'concurrency': (500, int, 'MAX_CONCURRENCY', ('concurrency', 'max_workers'),
+                    "Upper bound on probes in flight at once"),
+    'adaptive_concurrency': (True, _bool, 'ADAPTIVE_CONCURRENCY', ('adaptive_concurrency',),
+                             "Grow and shrink probes in flight with local errors and event-loop lag"),
+    'processes': (1, int, 'PROBE_PROCESSES', ('processes',),
+                  "Worker processes probing in parallel, each with its own event loop; 0 for one per core"),
+    'min_concurrency': (20, int, 'MIN_CONCURRENCY', ('min_concurrency',),
+                        "Lower bound for the adaptive concurrency controller"),
+    'probe_retries': (0, int, 'PROBE_RETRIES', ('probe_retries',),
+                      "Extra validation attempts after a timeout or reset"),
+    'prefilter': (True, _bool, 'PREFILTER', ('prefilter',),
+                  "Run the cheap TCP connect stage before HTTP validation"),
+    'detect_protocol': (False, _bool, 'DETECT_PROTOCOL', ('detect_protocol',),
+                        "Fingerprint each endpoint as HTTP, SOCKS4 or SOCKS5 instead of trusting its list"),
+    'classify': (True, _bool, 'CLASSIFY_ANONYMITY', ('classify',),
+                 "Tag working proxies transparent, anonymous or elite from the echo response"),
+    'user_agent': (DEFAULT_USER_AGENT, str, 'USER_AGENT', ('user_agent',),
+                   "User agent sent to the test URLs"),
+    'proxy_types': (list(SUPPORTED_TYPES), _list, 'PROXY_TYPE', ('proxy_types',),
+                    "Proxy types to test (comma separated)"),
+    'shard_index': (0, int, 'SHARD_INDEX', ('shard_index',),
+                    "Which hash range of the deduplicated proxies this run checks (0-based)"),
+    'shard_count': (1, int, 'SHARD_COUNT', ('shard_count',),
+                    "Number of hash ranges the proxies are split into across jobs"),
+    'output_directory': ('working_proxies', str, 'OUTPUT_DIR', ('output_directory',),
+                         "Directory for result files"),
+    'pretty_json': (True, _bool, 'PRETTY_JSON', ('pretty_json',),
+                    "Also write indented JSON copies of the NDJSON results at the end"),
+    'best_n': (100, int, 'BEST_N', ('best_n',),
+               "Fastest working proxies per type in the rolling snapshot, 0 to disable"),
+    'snapshot_interval': (60.0, float, 'SNAPSHOT_INTERVAL', ('snapshot_interval',),
+                          "Seconds between snapshot publications during a run, 0 for only at the end"),
+    'history_db': ('proxy_history.db', str, 'HISTORY_DB', ('history_db',),
+                   "SQLite probe history, empty to disable"),
+    'negative_cache': ('negative_cache.bin', str, 'NEGATIVE_CACHE', ('negative_cache',),
+                       "File of recently failed proxies skipped by the next runs, empty to disable"),
+    'negative_ttl': (12.0, float, 'NEGATIVE_TTL', ('negative_ttl',),
+                     "Hours a refused, unreachable or non-proxy endpoint is skipped"),
+    'negative_ttl_transient': (2.0, float, 'NEGATIVE_TTL_TRANSIENT', ('negative_ttl_transient',),
+                               "Hours a proxy that failed any other way (timeout, reset, handshake, test URL) is skipped"),
+    'metrics_listen': ('', str, 'METRICS_LISTEN', ('metrics_listen',),
+                       "host:port to serve Prometheus metrics on while the run goes on, empty to disable"),
+    'metrics_textfile': ('', str, 'METRICS_TEXTFILE', ('metrics_textfile',),
+                         "File to write Prometheus metrics to at the end of the run, empty to disable"),
+    'source_cache_dir': ('.proxy_cache', str, 'SOURCE_CACHE_DIR', ('source_cache_dir',),
+                         "Directory for source list snapshots"),
+    'source_workers': (8, int, 'SOURCE_WORKERS', ('source_workers',),
+                       "Source lists fetched in parallel"),
+    'batch_size': (100, int, 'APPWRITE_BATCH_SIZE', ('batch_size',),
+                   "Documents per Appwrite write batch"),
+    'flush_interval': (2.0, float, 'APPWRITE_FLUSH_INTERVAL', ('flush_interval',),
+                       "Seconds a partial Appwrite batch may wait"),
+    'flushers': (2, int, 'APPWRITE_FLUSHERS', ('flushers',),
+                 "Background Appwrite writer threads"),
+    'write_retries': (5, int, 'APPWRITE_MAX_RETRIES', ('write_retries',),
+                      "Retries for rate-limited or failed Appwrite writes"),
+}
+
+
+class Settings:
+    """Resolved settings; every key of SETTINGS is an attribute"""
+
+    def __init__(self, values: Dict, config_path: str = DEFAULT_CONFIG_PATH):
+        self.__dict__.update(values)
+        self.config_path = config_path
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in SETTINGS}
+
+    def validate(self):
+        """Raise ValueError for values no run can work with"""
+        unknown = [t for t in self.proxy_types if t not in SUPPORTED_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown proxy type(s): {', '.join(unknown)}")
+        if not self.test_urls:
+            raise ValueError("At least one test URL is required")
+        if self.target_strategy not in STRATEGIES:
+            raise ValueError(f"target_strategy must be one of {', '.join(STRATEGIES)}")
+        if self.metrics_listen and not self.metrics_listen.rpartition(':')[2].isdigit():
+            raise ValueError("metrics_listen must be host:port (or :port)")
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(f"shard_index must be between 0 and shard_count - 1 ({self.shard_count - 1})")
+        for name in ('timeout', 'connect_timeout', 'concurrency', 'min_concurrency', 'batch_size', 'flushers'):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"{name} must be positive")
+        for name in ('probe_retries', 'write_retries', 'flush_interval', 'processes', 'best_n',
+                     'snapshot_interval', 'target_rate', 'subnet_rate', 'negative_ttl',
+                     'negative_ttl_transient'):
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} must not be negative")
+
+
+def build_parser(description: str = None) -> argparse.ArgumentParser:
+    """Command line flags for every setting (--name-with-dashes)"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--config', help=f"Path to the JSON config (default: {DEFAULT_CONFIG_PATH})")
+    for name, (default, cast, env_var, _, help_text) in SETTINGS.items():
+        flag = f"--{name.replace('_', '-')}"
+        if cast is _bool:
+            parser.add_argument(flag, dest=name, action='store_const', const=True,
+                                help=f"{help_text} [{env_var}]")
+            parser.add_argument(f"--no-{name.replace('_', '-')}", dest=name,
+                                action='store_const', const=False)
+        else:
+            parser.add_argument(flag, dest=name, help=f"{help_text} [{env_var}]")
+    return parser
+
+
+def read_config(config_path: str) -> Dict:
+    """The `settings` object of a config file, or {} if there is none"""
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path) as f:
+        return json.load(f).get('settings', {})
+
+
+def load_settings(argv: Optional[List[str]] = None, environ: Optional[Dict[str, str]] = None,
+                  description: str = None) -> Settings:
+    """Merge defaults, config.json, environment and command line flags
+
+    `argv` is only parsed when given, so importing code that builds a
+    checker without a command line is not affected by sys.argv.
+    """
+    environ = os.environ if environ is None else environ
+    args = {}
+    config_path = None
+    if argv is not None:
+        parsed = vars(build_parser(description).parse_args(argv))
+        config_path = parsed.pop('config')
+        args = {name: value for name, value in parsed.items() if value is not None}
+
+    config_path = config_path or environ.get('PROXY_CONFIG') or DEFAULT_CONFIG_PATH
+    config = read_config(config_path)
+
+    values = {}
+    for name, (default, cast, env_var, config_keys, _) in SETTINGS.items():
+        value = default
+        for key in config_keys:
+            if key in config:
+                value = config[key]
+                break
+        # An empty variable means unset, except for strings (HISTORY_DB= disables history)
+        if env_var in environ and (environ[env_var] != '' or cast is str):
+            value = environ[env_var]
+        if name in args:
+            value = args[name]
+        values[name] = cast(value) if value is not None else None
+
+    settings = Settings(values, config_path)
+    settings.validate()
+    return settings
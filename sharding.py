@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Hash-range Sharding
+Splits the deduplicated candidate set across CI jobs. Every `ip:port`
+hashes to a stable 64-bit value, and shard i of n takes the i-th of n
+equal ranges of that space, so a proxy always lands in the same shard
+whatever the list sizes or proxy types, and each job can keep its own
+history cache.
+
+Each shard writes `working_<type>_proxies.shard-<i>-of-<n>.ndjson` (and
+`.txt`) plus a `shard-<i>-of-<n>.json` manifest. A shard that is cut off
+before it finishes leaves its results under a `.ndjson.part` name, and
+the merge reads those too. Merging the shard files is deterministic:
+duplicates keep the fastest result, and output is ordered by response
+time, then address.
+
+    python sharding.py all-proxies combined
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from proxy_store import ProxyList
+from result_sinks import read_ndjson
+
+HASH_SPACE = 1 << 64
+
+SHARD_FILE = re.compile(
+    r'^working_(?P<type>[a-z0-9]+)_proxies(?:\.shard-(?P<index>\d+)-of-(?P<count>\d+))?\.ndjson(?P<part>\.part)?$'
+)
+MANIFEST_FILE = re.compile(r'^shard-(?P<index>\d+)-of-(?P<count>\d+)\.json$')
+
+
+def shard_key(proxy: str) -> str:
+    """The part of an entry that identifies the endpoint (scheme stripped)"""
+    return proxy.split('://', 1)[-1].strip().lower()
+
+
+def proxy_hash(proxy: str) -> int:
+    """Stable 64-bit hash of an entry, the same in every process and run"""
+    digest = hashlib.blake2b(shard_key(proxy).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shard_of(proxy: str, shard_count: int) -> int:
+    """Index of the hash range an entry falls into"""
+    return proxy_hash(proxy) * shard_count // HASH_SPACE
+
+
+def select_shard(proxies: Iterable[str], shard_index: int, shard_count: int) -> ProxyList:
+    """The entries owned by one shard, in their original order"""
+    if shard_count <= 1:
+        return proxies if isinstance(proxies, ProxyList) else ProxyList(proxies)
+    return ProxyList(proxy for proxy in proxies if shard_of(proxy, shard_count) == shard_index)
+
+
+def shard_suffix(shard_index: int, shard_count: int) -> str:
+    """File name suffix for a shard's artifacts, empty when not sharded"""
+    if shard_count <= 1:
+        return ''
+    return f".shard-{shard_index}-of-{shard_count}"
+
+
+def write_manifest(output_dir: str, shard_index: int, shard_count: int, manifest: Dict) -> str:
+    """Record what a shard covered, so a merge can spot missing shards"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"shard-{shard_index}-of-{shard_count}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(manifest, shard_index=shard_index, shard_count=shard_count), f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _result_order(result: Dict) -> Tuple:
+    response_time = result.get('response_time')
+    return (response_time if response_time is not None else float('inf'), result['proxy'])
+
+
+def merge_results(records: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Working proxies per type, one per address, in a deterministic order"""
+    best: Dict[Tuple[str, str], Dict] = {}
+    for record in records:
+        if not record.get('proxy') or not record.get('type'):
+            continue
+        key = (record['type'], shard_key(record['proxy']))
+        if key not in best or _result_order(record) < _result_order(best[key]):
+            best[key] = record
+    merged: Dict[str, List[Dict]] = {}
+    for (proxy_type, _), record in best.items():
+        merged.setdefault(proxy_type, []).append(record)
+    return {proxy_type: sorted(results, key=_result_order) for proxy_type, results in sorted(merged.items())}
+
+
+def find_shard_files(input_dir: str) -> Tuple[List[str], List[Dict]]:
+    """NDJSON result files (finished or `.part`) and shard manifests anywhere under a directory"""
+    result_files, manifests = [], []
+    for root, _dirs, files in os.walk(input_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if SHARD_FILE.match(name):
+                result_files.append(path)
+            elif MANIFEST_FILE.match(name):
+                with open(path) as f:
+                    manifests.append(json.load(f))
+    return sorted(result_files), manifests
+
+
+def missing_shards(manifests: List[Dict]) -> Optional[List[int]]:
+    """Shard indexes without a manifest, or None if no manifests were found"""
+    if not manifests:
+        return None
+    shard_count = max(manifest['shard_count'] for manifest in manifests)
+    seen = {manifest['shard_index'] for manifest in manifests}
+    return [index for index in range(shard_count) if index not in seen]
+
+
+def merge_directory(input_dir: str, output_dir: str) -> Dict:
+    """Merge every shard artifact under `input_dir` into per-type files"""
+    result_files, manifests = find_shard_files(input_dir)
+    records = []
+    for path in result_files:
+        records += read_ndjson(path)
+    merged = merge_results(records)
+
+    os.makedirs(output_dir, exist_ok=True)
+    all_txt = os.path.join(output_dir, 'all_working_proxies.txt')
+    with open(f"{all_txt}.tmp", 'w') as all_f:
+        for proxy_type, results in merged.items():
+            txt_path = os.path.join(output_dir, f"working_{proxy_type}_proxies.txt")
+            ndjson_path = os.path.join(output_dir, f"working_{proxy_type}_proxies.ndjson")
+            with open(f"{txt_path}.tmp", 'w') as txt_f, open(f"{ndjson_path}.tmp", 'w') as ndjson_f:
+                for result in results:
+                    txt_f.write(f"{result['proxy']}\n")
+                    ndjson_f.write(json.dumps(result, separators=(',', ':'), sort_keys=True) + '\n')
+                    all_f.write(f"{result['proxy']}\n")
+            os.replace(f"{txt_path}.tmp", txt_path)
+            os.replace(f"{ndjson_path}.tmp", ndjson_path)
+    os.replace(f"{all_txt}.tmp", all_txt)
+
+    summary = {
+        'files': len(result_files),
+        'partial_files': sum(1 for path in result_files if path.endswith('.part')),
+        'records': len(records),
+        'by_type': {proxy_type: len(results) for proxy_type, results in merged.items()},
+        'shards': len(manifests),
+        'missing_shards': missing_shards(manifests),
+        'tested': sum(manifest.get('total_tested', 0) for manifest in manifests),
+    }
+    with open(os.path.join(output_dir, 'merge_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+    return summary
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python sharding.py <artifacts dir> <output dir>")
+        sys.exit(1)
+    summary = merge_directory(sys.argv[1], sys.argv[2])
+    print(f"Merged {summary['records']} records from {summary['files']} files "
+          f"({summary['shards']} shard manifests)")
+    if summary['partial_files']:
+        print(f"⚠️  {summary['partial_files']} files are partial results of shards that did not finish")
+    for proxy_type, count in summary['by_type'].items():
+        print(f"  {proxy_type.upper()}: {count} working proxies")
+    if summary['missing_shards']:
+        print(f"⚠️  Missing shards: {', '.join(map(str, summary['missing_shards']))}")
+
+
+if __name__ == "__main__":
+    main()
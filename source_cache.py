@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Proxy Source Cache
+Fetches proxy source lists with conditional requests (ETag /
+If-Modified-Since), keeps the last snapshot on disk and reports which
+entries are new since that snapshot.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def pooled_session(pool_size: int = 10) -> requests.Session:
+    """Session that keeps up to `pool_size` connections per host alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def parse_lines(text: str) -> List[str]:
+    """Default parser: one non-empty entry per line"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+class SourceCache:
+    """On-disk cache of proxy source lists keyed by URL"""
+
+    def __init__(self, cache_dir: str = '.proxy_cache', session: Optional[requests.Session] = None,
+                 timeout: float = 30, pool_size: int = 10):
+        self.cache_dir = cache_dir
+        # Shared by every fetch thread; sources on one host reuse its connections
+        self.session = session or pooled_session(pool_size)
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key: str):
+        key = hashlib.sha1(key.encode()).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.txt", f"{base}.json"
+
+    def _load_meta(self, meta_path: str) -> Dict:
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_snapshot(self, snapshot_path: str) -> List[str]:
+        try:
+            with open(snapshot_path) as f:
+                return f.read().split('\n') if os.path.getsize(snapshot_path) else []
+        except OSError:
+            return []
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def fetch(self, url: str, parse: Callable[[str], List[str]] = parse_lines,
+              key: Optional[str] = None) -> Dict:
+        """Fetch a source list, reusing the snapshot when it has not changed
+
+        `parse` turns the response body into entries; the parsed entries are
+        what gets snapshotted, so a 304 never needs the parser. Callers that
+        parse the same URL in different ways pass a distinct `key`.
+
+        Returns a dict with `entries` (the full list), `new` (entries not in
+        the previous snapshot), `removed` (count of entries that dropped off),
+        `not_modified` (True on a 304) and `bytes` downloaded.
+        """
+        snapshot_path, meta_path = self._paths(key or url)
+        meta = self._load_meta(meta_path)
+        has_snapshot = os.path.exists(snapshot_path)
+
+        headers = {}
+        if has_snapshot:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and has_snapshot:
+            # Unchanged upstream: no download, no parsing, nothing new
+            return {
+                'entries': self._load_snapshot(snapshot_path),
+                'new': [],
+                'removed': 0,
+                'not_modified': True,
+                'bytes': 0,
+            }
+
+        response.raise_for_status()
+
+        entries = list(dict.fromkeys(parse(response.text)))
+        previous = set(self._load_snapshot(snapshot_path)) if has_snapshot else set()
+        current = set(entries)
+        new_entries = [entry for entry in entries if entry not in previous] if has_snapshot else entries
+
+        self._write_atomic(snapshot_path, '\n'.join(entries))
+        self._write_atomic(meta_path, json.dumps({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'count': len(entries),
+        }))
+
+        return {
+            'entries': entries,
+            'new': new_entries,
+            'removed': len(previous - current),
+            'not_modified': False,
+            'bytes': len(response.content),
+        }
@@ -0,0 +1,41 @@
+from adaptive_concurrency import AdaptiveConcurrency, fd_concurrency_cap
+
+
+def controller(**options):
+    return AdaptiveConcurrency(log=None, **dict(dict(maximum=500, minimum=20, initial=100), **options))
+
+
+def test_grows_additively_only_while_the_pool_is_full():
+    aimd = controller(increase=50)
+    assert aimd.observe(loop_lag=0.0, in_flight=100, demand=True) == 150
+    assert aimd.observe(loop_lag=0.0, in_flight=80, demand=True) == 150
+    assert aimd.observe(loop_lag=0.0, in_flight=150, demand=False) == 150
+
+
+def test_cuts_multiplicatively_on_local_errors_or_loop_lag():
+    aimd = controller(decrease=0.5)
+    for _ in range(10):
+        aimd.record(local_error=True)
+    assert aimd.observe(loop_lag=0.0, in_flight=100, demand=True) == 50
+    assert aimd.observe(loop_lag=1.0, in_flight=50, demand=True) == 25
+    assert aimd.adjustments == {'increase': 0, 'decrease': 2}
+
+
+def test_error_rate_below_threshold_does_not_cut():
+    aimd = controller(max_error_rate=0.01)
+    for _ in range(999):
+        aimd.record()
+    aimd.record(local_error=True)
+    assert aimd.observe(loop_lag=0.0, in_flight=100, demand=True) > 100
+
+
+def test_limit_stays_within_bounds():
+    aimd = controller(maximum=120, minimum=30, decrease=0.1)
+    assert aimd.observe(loop_lag=0.0, in_flight=100, demand=True) == 120
+    assert aimd.observe(loop_lag=1.0, in_flight=120, demand=True) == 30
+    report = aimd.report()
+    assert (report['min'], report['max'], report['ceiling'], report['samples']) == (30, 120, 120, 2)
+
+
+def test_fd_cap_never_exceeds_the_request():
+    assert 1 <= fd_concurrency_cap(10) <= 10
@@ -0,0 +1,50 @@
+import json
+
+from anonymity import anonymity_counts, classify_anonymity, edge_headers, parse_echo
+
+OWN_IP = '198.51.100.7'
+EGRESS_IP = '203.0.113.5'
+
+
+def echo(origin, **headers):
+    return json.dumps({'origin': origin, 'headers': {name.replace('_', '-'): value
+                                                     for name, value in headers.items()}}).encode()
+
+
+def test_parse_echo_understands_httpbin_ipify_and_plain_text():
+    assert parse_echo(echo(f"{OWN_IP}, {EGRESS_IP}", Via='1.1 squid')) == \
+        ([OWN_IP, EGRESS_IP], {'via': '1.1 squid'})
+    assert parse_echo(b'{"ip": "2001:db8::1"}') == (['2001:db8::1'], None)
+    assert parse_echo(f"{EGRESS_IP}\n".encode()) == ([EGRESS_IP], None)
+    assert parse_echo(b'<html>not an echo</html>') == ([], None)
+
+
+def test_levels():
+    assert classify_anonymity(echo(EGRESS_IP, X_Forwarded_For=OWN_IP), [OWN_IP]) == ('transparent', EGRESS_IP)
+    assert classify_anonymity(echo(OWN_IP), [OWN_IP]) == ('transparent', OWN_IP)
+    assert classify_anonymity(echo(EGRESS_IP, Via='1.1 squid'), [OWN_IP]) == ('anonymous', EGRESS_IP)
+    assert classify_anonymity(echo(EGRESS_IP, Accept='*/*'), [OWN_IP]) == ('elite', EGRESS_IP)
+    # An IP-only echo cannot tell anonymous from elite
+    assert classify_anonymity(EGRESS_IP.encode(), [OWN_IP]) == (None, EGRESS_IP)
+    assert classify_anonymity(b'', [OWN_IP]) == (None, None)
+
+
+def test_headers_from_the_targets_own_edge_are_not_proxy_evidence():
+    # An edge in front of the target adds Via and an X-Forwarded-For holding the egress IP
+    direct = edge_headers({'via': '2 fly.io', 'x-forwarded-for': OWN_IP, 'accept': '*/*'})
+    assert direct == {'via': '2 fly.io', 'x-forwarded-for': OWN_IP}
+    body = echo(EGRESS_IP, Via='2 fly.io', X_Forwarded_For=EGRESS_IP)
+    assert classify_anonymity(body, [OWN_IP], direct) == ('elite', EGRESS_IP)
+    # The egress IP alone in a client-IP header is ignored even without the direct headers
+    assert classify_anonymity(echo(EGRESS_IP, X_Forwarded_For=EGRESS_IP), [OWN_IP]) == ('elite', EGRESS_IP)
+
+    # A proxy's own Via or forwarded address still shows through the edge's
+    body = echo(EGRESS_IP, Via='1.1 squid, 2 fly.io', X_Forwarded_For=EGRESS_IP)
+    assert classify_anonymity(body, [OWN_IP], direct) == ('anonymous', EGRESS_IP)
+    body = echo(EGRESS_IP, Via='2 fly.io', X_Forwarded_For=f"{OWN_IP}, {EGRESS_IP}")
+    assert classify_anonymity(body, [OWN_IP], direct) == ('transparent', EGRESS_IP)
+
+
+def test_anonymity_counts():
+    results = [{'anonymity': 'elite'}, {'anonymity': None}, {'anonymity': 'elite'}]
+    assert anonymity_counts(results) == {'transparent': 0, 'anonymous': 0, 'elite': 2, 'unclassified': 1}
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('appwrite')
+
+from appwrite_writer import AppwriteBatchWriter, proxy_document_id
+
+
+class FakeDatabases:
+    """Collection in a dict, slow enough between read and write for flushers to overlap"""
+
+    def __init__(self):
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def list_documents(self, database_id, collection_id, queries):
+        time.sleep(0.01)
+        with self.lock:
+            return {'documents': [dict(data, **{'$id': key}) for key, data in self.documents.items()]}
+
+    def upsert_document(self, database_id, collection_id, document_id, data):
+        time.sleep(0.01)
+        with self.lock:
+            self.documents[document_id] = data
+
+
+def test_document_ids_are_deterministic_and_valid():
+    assert proxy_document_id('1.2.3.4:1080', 'socks5') == 'socks5_1.2.3.4_1080'
+    long_host = proxy_document_id('some-very-long-hostname.example.com:8080', 'http')
+    assert long_host == proxy_document_id('some-very-long-hostname.example.com:8080', 'http')
+    assert len(long_host) == 36
+
+
+def test_concurrent_flushers_do_not_lose_success_counts():
+    databases = FakeDatabases()
+    writer = AppwriteBatchWriter(databases, 'db', 'proxies', batch_size=1, max_batch_age=0, flushers=4)
+    proxies = [f"10.0.0.{i}:80" for i in range(3)]
+    for _ in range(10):
+        for proxy in proxies:
+            assert writer.submit({'proxy': proxy, 'type': 'http', 'response_time': 0.1})
+    writer.close()
+
+    counts = {document_id: data['success_count'] for document_id, data in databases.documents.items()}
+    assert counts == {proxy_document_id(proxy, 'http'): 10 for proxy in proxies}
+    assert writer.counters['written'] == writer.counters['queued'] == 30
+    assert writer.pending() == 0
+
+
+def test_submit_drops_instead_of_blocking_on_a_full_queue():
+    databases = FakeDatabases()
+    release = threading.Event()
+    read = databases.list_documents
+    databases.list_documents = lambda *args, **kwargs: release.wait() and read(*args, **kwargs)
+    writer = AppwriteBatchWriter(databases, 'db', 'proxies', batch_size=1, max_batch_age=0,
+                                 queue_size=1, flushers=1)
+    started = time.monotonic()
+    results = [writer.submit({'proxy': f"10.0.0.{i}:80", 'type': 'http'}) for i in range(5)]
+    assert time.monotonic() - started < 0.5
+    # The flusher holds one document and the queue one more; the rest are dropped at once
+    assert results.count(False) >= 3
+    assert writer.counters['dropped'] == results.count(False)
+    release.set()
+    writer.close()
+    assert writer.counters['written'] == writer.counters['queued'] == results.count(True)
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+from urllib.parse import urlsplit
+
+import pytest
+
+from async_proxy_engine import AsyncProxyEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from proxy_farm import ProxyFarm  # noqa: E402
+
+
+def run_against_farm(proxy_type, **options):
+    """Probe one type's list of a small farm: three healthy proxies and one refused port"""
+    async def run():
+        farm = ProxyFarm(per_type=4, dead=0.25, blackhole=0, slow=0)
+        manifest = await farm.start()
+        try:
+            engine = AsyncProxyEngine([f"{manifest['echo_url']}?nonce={{nonce}}"], timeout=2,
+                                      own_ips=['192.0.2.1'], **options)
+            outcomes = []
+            working = await engine.run(farm.lists[proxy_type].split(), proxy_type, outcomes.append)
+            return engine, working, outcomes
+        finally:
+            await farm.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('proxy_type', ['http', 'socks4', 'socks5'])
+@pytest.mark.parametrize('prefilter', [True, False])
+def test_round_trip_through_each_proxy_type(proxy_type, prefilter):
+    engine, working, outcomes = run_against_farm(proxy_type, prefilter=prefilter)
+    assert len(working) == 3
+    assert all(result['type'] == proxy_type and result['latency']['total'] > 0 for result in working)
+    assert sorted(outcome['reason'] for outcome in outcomes) == ['', '', '', 'refused']
+    # The echo saw the farm's address, which is not ours, and no forwarding headers
+    assert {result['anonymity'] for result in working} == {'elite'}
+    report = engine.stage_report()
+    assert report['validate']['passed'] == 3
+    if prefilter:
+        assert report['prefilter']['tested'] == 4
+        assert report['prefilter']['passed'] == 3
+
+
+def test_body_without_length_is_read_to_the_end_of_the_connection():
+    engine = AsyncProxyEngine(['http://127.0.0.1:9/'], max_body_bytes=64)
+
+    async def read(parts):
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n')
+
+        async def trickle():
+            for part in parts:
+                await asyncio.sleep(0.01)
+                reader.feed_data(part)
+            reader.feed_eof()
+
+        feeding = asyncio.ensure_future(trickle())
+        result = await engine._read_response(reader)
+        await feeding
+        return result
+
+    status, _headers, body, keep_alive = asyncio.run(read([b'{"origin": ', b'"1.2.3.4", ', b'"nonce": "abc"}']))
+    assert (status, body, keep_alive) == (200, b'{"origin": "1.2.3.4", "nonce": "abc"}', False)
+    # Capped at max_body_bytes
+    _status, _headers, body, _keep_alive = asyncio.run(read([b'x' * 50, b'y' * 50]))
+    assert body == b'x' * 50 + b'y' * 14
+
+
+def test_socks4_prefilter_tunnel_leads_to_the_target_the_probe_tries_first():
+    async def run():
+        farm = ProxyFarm(per_type=4, dead=0, blackhole=0, slow=0)
+        manifest = await farm.start()
+        try:
+            echo = urlsplit(manifest['echo_url'])
+            # Two targets on different hosts, taking turns as the first one
+            engine = AsyncProxyEngine([f"http://127.0.0.1:{echo.port}/ip?nonce={{nonce}}",
+                                       f"http://localhost:{echo.port}/ip?nonce={{nonce}}"],
+                                      timeout=2, own_ips=['192.0.2.1'], target_strategy='round_robin')
+            working = await engine.run(farm.lists['socks4'].split(), 'socks4')
+            return engine, working
+        finally:
+            await farm.close()
+
+    engine, working = asyncio.run(run())
+    assert len(working) == 4
+    assert {url: stats['ok'] for url, stats in engine.targets.report().items()} == \
+        dict.fromkeys([target.url for target in engine.targets.targets], 2)
+    # Every pre-filter tunnel carried its probe's request
+    assert engine.connection_stats == {'opened': 4, 'reused': 4}
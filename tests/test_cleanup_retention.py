@@ -0,0 +1,93 @@
+import importlib.util
+import json
+import os
+import types
+
+import pytest
+
+pytest.importorskip('requests')
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    'functions', 'cleanup-old-proxies', 'main.py')
+spec = importlib.util.spec_from_file_location('cleanup_main', MAIN)
+cleanup = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cleanup)
+
+
+def fake_fetch_page(documents):
+    """fetch_page over an in-memory collection, honouring the queries select_for_deletion sends"""
+    def fetch_page(list_url, headers, filters, cursor, phases, phase='scan'):
+        docs = list(documents)
+        for raw in filters:
+            q = json.loads(raw)
+            if q['method'] == 'equal':
+                docs = [d for d in docs if d[q['attribute']] in q['values']]
+            elif q['method'] == 'lessThan':
+                docs = [d for d in docs if d[q['attribute']] < q['values'][0]]
+            elif q['method'] == 'orderAsc':
+                docs.sort(key=lambda d: (d[q['attribute']], d['$id']))
+            elif q['method'] == 'orderDesc':
+                docs.sort(key=lambda d: (d[q['attribute']], d['$id']), reverse=True)
+        if cursor:
+            docs = docs[[d['$id'] for d in docs].index(cursor) + 1:]
+        return docs[:cleanup.PAGE_SIZE]
+    return fetch_page
+
+
+DOCUMENTS = [
+    {'$id': f"http_{i}", 'type': 'http', 'tested_at': f"2026-01-{i + 1:02d}T00:00:00", 'response_time': 10 - i * 0.5}
+    for i in range(10)
+] + [{'$id': 'socks5_0', 'type': 'socks5', 'tested_at': '2026-01-01T00:00:00', 'response_time': 0.1}]
+
+
+def policy(**overrides):
+    return dict({'types': ['http', 'socks5'], 'max_per_type': 0, 'keep_fastest': 0}, **overrides)
+
+
+def selected(monkeypatch, rules, cutoff):
+    monkeypatch.setattr(cleanup, 'fetch_page', fake_fetch_page(DOCUMENTS))
+    phases = {name: {'pages': 0, 'docs': 0, 'seconds': 0.0} for name in ('scan', 'rank', 'delete')}
+    pages = cleanup.select_for_deletion('url', {}, rules, cutoff, phases, None)
+    return sorted(doc_id for page in pages for doc_id in page)
+
+
+def test_age_rule_alone(monkeypatch):
+    assert selected(monkeypatch, policy(), '2026-01-03T00:00:00') == ['http_0', 'http_1', 'socks5_0']
+
+
+def test_cap_per_type_keeps_the_newest(monkeypatch):
+    assert selected(monkeypatch, policy(max_per_type=8), '') == ['http_0', 'http_1']
+
+
+def test_fastest_are_kept_whatever_their_age(monkeypatch):
+    # http_0 and http_1 are the slowest; http_9 is the fastest but the newest anyway
+    rules = policy(max_per_type=8, keep_fastest=1)
+    assert selected(monkeypatch, rules, '') == ['http_0', 'http_1']
+    assert selected(monkeypatch, policy(keep_fastest=1), '2026-01-03T00:00:00') == ['http_0', 'http_1']
+    assert selected(monkeypatch, policy(keep_fastest=1), '2026-02-01T00:00:00') == [
+        f"http_{i}" for i in range(9)
+    ]
+
+
+def test_load_policy_reads_variables_and_body(monkeypatch):
+    monkeypatch.setenv('RETENTION_MAX_PER_TYPE', '500')
+    context = types.SimpleNamespace(req=types.SimpleNamespace(body='{"keep_fastest": 20, "dry_run": true}'))
+    loaded = cleanup.load_policy(context)
+    assert (loaded['max_per_type'], loaded['keep_fastest'], loaded['dry_run']) == (500, 20, True)
+    assert loaded['types'] == ['http', 'socks4', 'socks5']
+
+
+def test_load_policy_converts_body_overrides_like_variables():
+    context = types.SimpleNamespace(req=types.SimpleNamespace(
+        body='{"time_budget": "100", "max_age_hours": "12", "types": ["socks5"], "dry_run": "yes"}'))
+    loaded = cleanup.load_policy(context)
+    assert (loaded['time_budget'], loaded['max_age_hours']) == (100.0, 12.0)
+    assert loaded['types'] == ['socks5']
+    assert loaded['dry_run'] is True
+
+
+@pytest.mark.parametrize('body', ['{"time_budget": "soon"}', '{"keep_fastest": null}', '{"types": 5}'])
+def test_load_policy_rejects_values_that_do_not_convert(body):
+    context = types.SimpleNamespace(req=types.SimpleNamespace(body=body))
+    with pytest.raises(ValueError):
+        cleanup.load_policy(context)
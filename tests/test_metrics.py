@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from async_proxy_engine import STAGE_BUCKETS
+from metrics import PREFIX, CheckerMetrics, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('wait_seconds', "Time waited", ('kind',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, kind='target')
+    assert registry.render().splitlines() == [
+        f"# HELP {PREFIX}wait_seconds Time waited",
+        f"# TYPE {PREFIX}wait_seconds histogram",
+        f'{PREFIX}wait_seconds_bucket{{kind="target",le="0.1"}} 2',
+        f'{PREFIX}wait_seconds_bucket{{kind="target",le="1"}} 3',
+        f'{PREFIX}wait_seconds_bucket{{kind="target",le="+Inf"}} 4',
+        f'{PREFIX}wait_seconds_sum{{kind="target"}} 3.65',
+        f'{PREFIX}wait_seconds_count{{kind="target"}} 4',
+    ]
+
+
+def test_checker_metrics_render_a_known_engine_state(tmp_path):
+    metrics = CheckerMetrics()
+    engine = SimpleNamespace(started=0, in_flight=0)
+    metrics.track_engine(engine)
+    metrics.start_type('http')
+    engine.started, engine.in_flight = 3, 1
+    latency = {'connect': 0.02, 'handshake': 0.0, 'tls': 0.0, 'ttfb': 0.2, 'total': 0.3}
+    metrics.record_outcome({'type': 'http', 'working': True, 'latency': latency, 'reason': ''})
+    metrics.record_outcome({'type': 'http', 'working': False, 'latency': None, 'reason': 'refused'})
+
+    lines = metrics.render().splitlines()
+    assert f"# TYPE {PREFIX}probes_started_total counter" in lines
+    assert f'{PREFIX}probes_started_total{{type="http"}} 3' in lines
+    assert f"{PREFIX}probes_in_flight 1" in lines
+    assert f'{PREFIX}probes_failed_total{{type="http",reason="refused"}} 1' in lines
+    assert f'{PREFIX}probe_phase_seconds_bucket{{type="http",phase="ttfb",le="0.1"}} 0' in lines
+    assert f'{PREFIX}probe_phase_seconds_bucket{{type="http",phase="ttfb",le="0.25"}} 1' in lines
+    assert f'{PREFIX}probe_phase_seconds_count{{type="http",phase="total"}} 1' in lines
+
+    buckets = [0] * (len(STAGE_BUCKETS) + 1)
+    buckets[0], buckets[-1] = 2, 1
+    metrics.finish_type('http', {'validate': {'duration_buckets': buckets, 'busy_seconds': 40.5, 'passed': 2}})
+    lines = metrics.render().splitlines()
+    assert f"# HELP {PREFIX}stage_seconds Time each probe spent in a stage" in lines
+    assert f"# TYPE {PREFIX}stage_seconds histogram" in lines
+    assert f'{PREFIX}stage_seconds_bucket{{type="http",stage="validate",le="0.05"}} 2' in lines
+    assert f'{PREFIX}stage_seconds_bucket{{type="http",stage="validate",le="30"}} 2' in lines
+    assert f'{PREFIX}stage_seconds_bucket{{type="http",stage="validate",le="+Inf"}} 3' in lines
+    assert f'{PREFIX}stage_seconds_sum{{type="http",stage="validate"}} 40.5' in lines
+    assert f'{PREFIX}stage_seconds_count{{type="http",stage="validate"}} 3' in lines
+    assert f'{PREFIX}stage_passed_total{{type="http",stage="validate"}} 2' in lines
+    # Probes of the finished type stay counted
+    assert f'{PREFIX}probes_started_total{{type="http"}} 3' in lines
+
+    path = tmp_path / 'metrics.prom'
+    metrics.close(str(path))
+    assert f'{PREFIX}probes_completed_total{{type="http"}} 2' in path.read_text().splitlines()
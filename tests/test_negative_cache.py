@@ -0,0 +1,71 @@
+import time
+
+from negative_cache import EXPIRY_BITS, MAX_TTL_MINUTES, NegativeCache, entry_key
+
+
+def failure(proxy, reason, proxy_type='http'):
+    return {'proxy': proxy, 'type': proxy_type, 'working': False, 'reason': reason}
+
+
+def test_entry_key_packs_type_and_address_into_the_high_bits():
+    http, socks5 = entry_key('1.2.3.4:80', 'http'), entry_key('1.2.3.4:80', 'socks5')
+    assert http != socks5
+    assert max(http, socks5) < 1 << (64 - EXPIRY_BITS)
+    assert entry_key('proxy.example:80', 'http') is None
+    assert entry_key('1.2.3.4:80', 'ftp') is None
+
+
+def test_ttl_depends_on_the_failure_reason():
+    cache = NegativeCache('unused.bin', ttl_hours=12, transient_ttl_hours=2)
+    for reason in ('refused', 'unreachable', 'protocol'):
+        assert cache.ttl_for(reason) == 12 * 60
+    # Anything else may be a busy proxy, including reasons the engine adds later
+    for reason in ('timeout', 'reset', 'handshake', 'nonce', 'error', 'something_new'):
+        assert cache.ttl_for(reason) == 2 * 60
+    assert cache.ttl_for('local') == 0
+    assert NegativeCache('unused.bin', ttl_hours=1000).ttl == MAX_TTL_MINUTES
+
+
+def test_filter_skips_recorded_failures_per_type(tmp_path):
+    cache = NegativeCache(str(tmp_path / 'cache.bin'))
+    cache.record(failure('1.1.1.1:80', 'refused'))
+    cache.record(failure('2.2.2.2:80', 'local'))
+    cache.record({'proxy': '3.3.3.3:80', 'type': 'http', 'working': True, 'reason': None})
+
+    kept, skipped = cache.filter(['1.1.1.1:80', '2.2.2.2:80', '3.3.3.3:80'], 'http')
+    assert (list(kept), skipped) == (['2.2.2.2:80', '3.3.3.3:80'], 1)
+    kept, skipped = cache.filter(['1.1.1.1:80'], 'socks5')
+    assert skipped == 0
+
+
+def test_save_and_load_round_trip_and_expire(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    cache = NegativeCache(path, ttl_hours=12, transient_ttl_hours=2)
+    for i in range(1000):
+        cache.record(failure(f"10.0.{i // 250}.{i % 250}:80", 'refused' if i % 2 else 'timeout'))
+    cache.save()
+
+    loaded = NegativeCache(path)
+    assert len(loaded) == 1000
+    assert ('10.0.0.1:80', 'http') in loaded
+    assert ('10.0.0.1:80', 'socks4') not in loaded
+
+    in_3h = time.time() + 3 * 3600
+    kept, skipped = loaded.filter((f"10.0.{i // 250}.{i % 250}:80" for i in range(1000)), 'http', now=in_3h)
+    assert (len(kept), skipped) == (500, 500)
+
+    # Saving later drops the expired entries
+    loaded.save(now=in_3h)
+    assert len(NegativeCache(path)) == 500
+
+
+def test_unreadable_file_is_ignored(tmp_path):
+    path = tmp_path / 'cache.bin'
+    path.write_bytes(b'not a cache')
+    assert len(NegativeCache(str(path))) == 0
+
+
+def test_relabelled_failure_is_cached_under_the_listed_type_too(tmp_path):
+    cache = NegativeCache(str(tmp_path / 'cache.bin'))
+    cache.record(dict(failure('1.1.1.1:1080', 'refused', 'socks5'), listed_type='http'))
+    assert ('1.1.1.1:1080', 'http') in cache and ('1.1.1.1:1080', 'socks5') in cache
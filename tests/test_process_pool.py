@@ -0,0 +1,81 @@
+import pickle
+
+from async_proxy_engine import STAGE_BUCKETS, AsyncProxyEngine
+from process_pool import (ProcessPoolEngine, build_engine, pack_outcome, resolve_processes,
+                          unpack_outcome)
+from proxy_store import ProxyList
+
+URLS = ['http://127.0.0.1:9/a', 'http://127.0.0.1:9/b']
+
+
+def outcome(proxy, working):
+    return {
+        'proxy': proxy, 'type': 'http', 'listed_type': 'socks5', 'working': working, 'response_time': 0.5 if working else 0,
+        'message': '', 'reason': '' if working else 'refused', 'stage': 'validate',
+        'latency': {'connect': 0.1, 'handshake': 0.0, 'tls': 0.0, 'ttfb': 0.3, 'total': 0.5} if working else None,
+        'anonymity': 'elite' if working else None, 'egress_ip': '1.1.1.1' if working else None,
+        'tested_at': '2026-01-01T00:00:00',
+    }
+
+
+def worker_report(tested, passed, wall, buckets, opened, ok):
+    return {
+        'stages': {'validate': {'tested': tested, 'passed': passed, 'busy_seconds': 1.5,
+                                'wall_seconds': wall,
+                                'duration_buckets': buckets + [0] * (len(STAGE_BUCKETS) + 1 - len(buckets))}},
+        'connections': {'opened': opened, 'reused': 1},
+        'detect': {'as_listed': 0, 'relabelled': 0, 'undetected': 0, 'extra_connects': 0},
+        'targets': {URLS[0]: {'requests': tested, 'ok': ok, 'failed': tested - ok, 'nonce_mismatch': 0}},
+        'rate_limits': {'target_waits': 1, 'target_wait_seconds': 0.5, 'subnet_waits': 0, 'subnet_wait_seconds': 0.0},
+        'concurrency': {'final': 10, 'min': 5, 'max': 10, 'mean': 7.5, 'ceiling': 100},
+        'timeline': [{'t': 0.0, 'limit': 10}],
+    }
+
+
+def test_outcomes_survive_packing_into_plain_tuples():
+    for original in (outcome('1.2.3.4:80', True), outcome('5.6.7.8:80', False)):
+        packed = pack_outcome(original)
+        assert isinstance(packed, tuple)
+        assert unpack_outcome(pickle.loads(pickle.dumps(packed))) == original
+
+
+def test_each_worker_gets_every_nth_proxy_as_a_packed_slice():
+    proxies = ProxyList(['1.1.1.1:80', 'host.example:81', '2.2.2.2:82', '3.3.3.3:83', '4.4.4.4:84'])
+    slices = [pickle.loads(pickle.dumps(proxies[index::2])) for index in range(2)]
+    assert [list(part) for part in slices] == [['1.1.1.1:80', '2.2.2.2:82', '4.4.4.4:84'],
+                                              ['host.example:81', '3.3.3.3:83']]
+
+
+def test_worker_options_split_the_totals():
+    pool = ProcessPoolEngine(URLS, processes=4, max_concurrency=100, min_concurrency=20,
+                             target_rate=10, subnet_rate=0, classify=False)
+    options = pool._worker_options(4)
+    assert (options['max_concurrency'], options['min_concurrency']) == (25, 5)
+    assert (options['target_rate'], options['subnet_rate']) == (2.5, 0)
+    assert options['test_urls'] == URLS
+    assert 'own_ips' not in options
+
+
+def test_worker_reports_merge_into_the_local_engine():
+    pool = ProcessPoolEngine(URLS, processes=2, classify=False)
+    pool.worker_reports = [worker_report(10, 4, 3.0, [1, 2, 0], 10, 4),
+                           worker_report(6, 2, 5.0, [0, 1, 1], 6, 2)]
+    pool._merge_reports()
+
+    validate = pool.engine.stage_stats['validate']
+    assert (validate['tested'], validate['passed'], validate['busy_seconds']) == (16, 6, 3.0)
+    assert validate['duration_buckets'] == [1, 3, 1] + [0] * (len(STAGE_BUCKETS) - 2)
+    # Workers run side by side: the slowest one sets the wall time
+    assert validate['wall_seconds'] == 5.0
+    assert pool.engine.connection_stats == {'opened': 16, 'reused': 2}
+    assert pool.targets.report()[URLS[0]]['ok'] == 6
+    assert pool.rate_limits.stats['target_waits'] == 2
+    assert pool.concurrency_report == {'final': 20, 'min': 10, 'max': 20, 'mean': 15.0, 'ceiling': 200,
+                                       'processes': 2}
+    assert [sample['worker'] for sample in pool.concurrency_timeline] == [0, 1]
+
+
+def test_build_engine_stays_in_process_for_one_worker():
+    assert isinstance(build_engine(URLS, processes=1), AsyncProxyEngine)
+    assert isinstance(build_engine(URLS, processes=3), ProcessPoolEngine)
+    assert resolve_processes(0) >= 1
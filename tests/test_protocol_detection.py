@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+
+from async_proxy_engine import AsyncProxyEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from proxy_farm import ProxyFarm  # noqa: E402
+
+
+def detect_and_validate(listed_as, actual_type, **options):
+    """Probe the one healthy `actual_type` proxy of a farm as if listed under `listed_as`"""
+    async def run():
+        farm = ProxyFarm(per_type=1, dead=0, blackhole=0, slow=0)
+        manifest = await farm.start()
+        try:
+            engine = AsyncProxyEngine([f"{manifest['echo_url']}?nonce={{nonce}}"], timeout=2, connect_timeout=0.3,
+                                      own_ips=['192.0.2.1'], detect=True, **options)
+            return engine, await engine.probe(farm.lists[actual_type].strip(), listed_as)
+        finally:
+            await farm.close()
+
+    return asyncio.run(run())
+
+
+def test_http_proxy_is_fingerprinted_by_the_validation_request_itself():
+    engine, outcome = detect_and_validate('http', 'http')
+    assert outcome['working'], outcome
+    assert outcome['type'] == 'http'
+    assert engine.detect_stats == {'as_listed': 1, 'relabelled': 0, 'undetected': 0, 'extra_connects': 0}
+    # One connection and one request to the test URL, for detection and validation both
+    assert engine.connection_stats['opened'] == 1
+    assert engine.targets.targets[0].stats['requests'] == 1
+
+
+def test_socks5_endpoint_listed_as_http_is_relabelled():
+    engine, outcome = detect_and_validate('http', 'socks5')
+    assert outcome['working'], outcome
+    assert outcome['type'] == 'socks5'
+    assert engine.detect_stats['relabelled'] == 1
+    # The HTTP attempt and the SOCKS5 one; validation goes on over the latter
+    assert engine.connection_stats == {'opened': 2, 'reused': 1}
+    assert engine.detect_stats['extra_connects'] == 0
+
+
+def test_socks4_fingerprint_tunnel_carries_the_validation_request():
+    engine, outcome = detect_and_validate('socks4', 'socks4')
+    assert (outcome['working'], outcome['type']) == (True, 'socks4'), outcome
+    assert engine.connection_stats == {'opened': 1, 'reused': 1}
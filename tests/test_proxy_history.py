@@ -0,0 +1,76 @@
+import time
+
+from proxy_history import ProxyHistory
+
+
+def outcome(proxy, working, response_time=None):
+    return {'proxy': proxy, 'type': 'http', 'working': working, 'response_time': response_time,
+            'reason': None if working else 'timeout'}
+
+
+def test_backoff_doubles_after_dead_after_and_is_capped():
+    history = ProxyHistory(':memory:', dead_after=3, backoff_base_hours=6, max_backoff_hours=24)
+    assert history.next_retry_at(1000.0, 2) == 0
+    assert history.next_retry_at(1000.0, 3) == 1000 + 6 * 3600
+    assert history.next_retry_at(1000.0, 4) == 1000 + 12 * 3600
+    assert history.next_retry_at(1000.0, 9) == 1000 + 24 * 3600
+    assert history.next_retry_at(None, 9) == 0
+
+
+def test_plan_orders_recent_new_retry_and_skips_backoff():
+    history = ProxyHistory(':memory:')
+    history.record(outcome('1.1.1.1:80', True, 0.5))
+    history.record(outcome('2.2.2.2:80', True, 0.2))
+    history.record(outcome('4.4.4.4:80', False))
+    for _ in range(3):
+        history.record(outcome('3.3.3.3:80', False))
+    history.flush()
+
+    listed = ['5.5.5.5:80', '4.4.4.4:80', '3.3.3.3:80', '1.1.1.1:80', '2.2.2.2:80', '5.5.5.5:80']
+    ordered, counts = history.plan(listed, 'http')
+    assert list(ordered) == ['2.2.2.2:80', '1.1.1.1:80', '5.5.5.5:80', '4.4.4.4:80']
+    assert counts == {'recent': 2, 'new': 1, 'retry': 1, 'skipped': 1}
+
+    # Once the backoff has passed the dead proxy is retried, after fewer failures
+    ordered, counts = history.plan(listed, 'http', now=time.time() + 7 * 3600)
+    assert list(ordered)[-2:] == ['4.4.4.4:80', '3.3.3.3:80']
+    assert counts['skipped'] == 0
+
+
+def test_success_resets_failures_and_types_are_separate():
+    history = ProxyHistory(':memory:')
+    for _ in range(3):
+        history.record(outcome('3.3.3.3:80', False))
+    history.record(outcome('3.3.3.3:80', True, 1.0))
+    history.flush()
+    ordered, counts = history.plan(['3.3.3.3:80'], 'http')
+    assert counts['recent'] == 1
+
+    ordered, counts = history.plan(['3.3.3.3:80'], 'socks5')
+    assert counts['new'] == 1
+
+
+def test_plan_puts_popular_new_proxies_first_and_keeps_list_order_on_ties():
+    history = ProxyHistory(':memory:')
+    listed = ['1.1.1.1:80', 'host.example:8080', '2.2.2.2:80', '3.3.3.3:80', 'host.example:8080']
+    votes = {'2.2.2.2:80': 3, 'host.example:8080': 2}
+    ordered, counts = history.plan(listed, 'http', popularity=lambda proxy: votes.get(proxy, 1))
+    assert list(ordered) == ['2.2.2.2:80', 'host.example:8080', '1.1.1.1:80', '3.3.3.3:80']
+    assert counts['new'] == 4
+
+    # Every listed proxy was remembered, and a second plan starts from a clean input table
+    assert history.conn.execute('SELECT COUNT(*) FROM proxy_history').fetchone()[0] == 4
+    ordered, _ = history.plan(['3.3.3.3:80'], 'http')
+    assert list(ordered) == ['3.3.3.3:80']
+
+
+def test_relabelled_outcome_is_recorded_under_the_listed_type_too():
+    history = ProxyHistory(':memory:')
+    history.record(dict(outcome('1.1.1.1:1080', True, 0.3), type='socks5', listed_type='http'))
+    history.flush()
+    # The http list's row is no longer new, so the next plan puts it first as recently working
+    ordered, counts = history.plan(['9.9.9.9:80', '1.1.1.1:1080'], 'http')
+    assert list(ordered) == ['1.1.1.1:1080', '9.9.9.9:80']
+    assert (counts['recent'], counts['new']) == (1, 1)
+    _, counts = history.plan(['1.1.1.1:1080'], 'socks5')
+    assert counts['recent'] == 1
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip('requests')
+
+from proxy_sources import Attribution, ProxySource, SourceRegistry, normalize_entry
+
+
+class StaticCache:
+    """SourceCache stand-in serving fixed list bodies"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+
+    def fetch(self, url, parse, key):
+        entries = parse(self.bodies[url])
+        return {'entries': entries, 'new': entries, 'removed': 0, 'not_modified': False,
+                'bytes': len(self.bodies[url])}
+
+
+def registry(**options):
+    bodies = {
+        'http.txt': '1.1.1.1:80\n2.2.2.2:8080\n',
+        'socks4.txt': '3.3.3.3:1080\n4.4.4.4:1080\n',
+        'socks5.txt': '3.3.3.3:1080\n5.5.5.5:1080\n001.002.003.004:1080\n',
+        'mixed.txt': 'socks5://4.4.4.4:1080\nhttps://2.2.2.2:8080\nsocks5://user:pw@6.6.6.6:1080\n',
+    }
+    sources = [ProxySource('http.txt', 'http'), ProxySource('socks4.txt', 'socks4'),
+               ProxySource('socks5.txt', 'socks5'), ProxySource('mixed.txt')]
+    return SourceRegistry(sources, cache=StaticCache(bodies), **options)
+
+
+def test_normalize_entry():
+    assert normalize_entry(' 001.002.003.004:0080 ', 'http') == 'http://1.2.3.4:80'
+    assert normalize_entry('SOCKS5H://1.2.3.4:1080/', None) == 'socks5://1.2.3.4:1080'
+    assert normalize_entry('user:pw@1.2.3.4:1080', 'socks5') is None
+    assert normalize_entry('1.2.3.4:70000', 'http') is None
+    assert normalize_entry('1.2.3.4:80', None) is None
+
+
+def test_without_detection_every_listed_type_is_tested():
+    merged = registry().fetch_all()
+    assert list(merged['by_type']['socks4']) == ['3.3.3.3:1080', '4.4.4.4:1080']
+    assert list(merged['by_type']['socks5']) == ['3.3.3.3:1080', '4.4.4.4:1080', '5.5.5.5:1080', '1.2.3.4:1080']
+    assert merged['stats']['multi_type'] == 2
+    assert merged['stats']['type_folded'] == 0
+
+
+def test_with_detection_endpoints_are_folded_into_one_type():
+    merged = registry(detect_protocol=True).fetch_all()
+    by_type = {proxy_type: list(proxies) for proxy_type, proxies in merged['by_type'].items()}
+    # 3.3.3.3 ties 1-1 and goes to socks4; 4.4.4.4 ties too; 2.2.2.2 is http either way
+    assert by_type == {'http': ['1.1.1.1:80', '2.2.2.2:8080'],
+                       'socks4': ['3.3.3.3:1080', '4.4.4.4:1080'],
+                       'socks5': ['5.5.5.5:1080', '1.2.3.4:1080']}
+    assert (merged['stats']['multi_type'], merged['stats']['type_folded']) == (2, 2)
+
+
+def test_a_run_over_one_type_keeps_endpoints_listed_under_others():
+    merged = registry(detect_protocol=True).fetch_all(['socks5'])
+    assert list(merged['by_type']) == ['socks5']
+    assert sorted(merged['by_type']['socks5']) == ['1.2.3.4:1080', '3.3.3.3:1080', '4.4.4.4:1080', '5.5.5.5:1080']
+    assert merged['stats']['type_folded'] == 0
+
+
+def test_attribution_counts_sources_and_types():
+    attribution = Attribution(['a', 'b', 'c'])
+    attribution.add('1.1.1.1:80', 0, 'http')
+    attribution.add('1.1.1.1:80', 2, 'socks5')
+    attribution.add('host.example:80', 1, 'http')
+    assert attribution.sources('1.1.1.1:80') == ['a', 'c']
+    assert attribution.types('1.1.1.1:80') == ['http', 'socks5']
+    assert attribution.get('host.example:80') == {'sources': ['b'], 'types': ['http']}
+    assert list(attribution.rank(['host.example:80', '1.1.1.1:80'])) == ['1.1.1.1:80', 'host.example:80']
+    # Ties keep list order
+    attribution.add('9.9.9.9:80', 0, 'http')
+    assert list(attribution.rank(['9.9.9.9:80', 'host.example:80', '1.1.1.1:80'])) == \
+        ['1.1.1.1:80', '9.9.9.9:80', 'host.example:80']
@@ -0,0 +1,43 @@
+import pickle
+
+from proxy_store import MAX_RANK, ProxyList, pack_address, sort_key, take_sorted, unpack_address
+
+
+def test_pack_round_trips_canonical_ipv4_only():
+    assert unpack_address(pack_address('1.2.3.4:8080')) == '1.2.3.4:8080'
+    assert pack_address('255.255.255.255:65535') == (1 << 48) - 1
+    for entry in ('host.example:80', '[::1]:80', '1.2.3.4', '1.2.3.4:65536', '1.2.3.4:080', '1.2.3:80'):
+        assert pack_address(entry) is None
+
+
+def test_list_keeps_order_and_unpackable_entries():
+    entries = ['1.1.1.1:80', 'proxy.example:3128', '2.2.2.2:1080', '01.2.3.4:80']
+    proxies = ProxyList(entries)
+    assert list(proxies) == entries
+    assert len(proxies) == 4
+    assert proxies[1] == 'proxy.example:3128'
+    assert proxies[-1] == '01.2.3.4:80'
+    assert list(proxies[::2]) == entries[::2]
+    assert list(proxies[1::2]) == entries[1::2]
+
+
+def test_packed_entries_cost_eight_bytes():
+    proxies = ProxyList(f"10.0.{i // 256}.{i % 256}:80" for i in range(1000))
+    assert proxies.nbytes == 8000
+    assert isinstance(proxies[10:20], ProxyList)
+
+
+def test_pickles_and_compares_like_a_list():
+    proxies = ProxyList(['1.1.1.1:80', 'proxy.example:3128'])
+    restored = pickle.loads(pickle.dumps(proxies))
+    assert restored == proxies
+    assert restored == ['1.1.1.1:80', 'proxy.example:3128']
+    proxies.append('3.3.3.3:80')
+    assert restored != proxies
+
+
+def test_take_sorted_orders_by_rank_then_position():
+    proxies = ProxyList(['1.1.1.1:80', 'host:1', '2.2.2.2:80', '3.3.3.3:80'])
+    keys = [sort_key(2, 0), sort_key(1, 1), sort_key(1, 2), sort_key(MAX_RANK + 5, 3)]
+    assert list(take_sorted(proxies, keys)) == ['host:1', '2.2.2.2:80', '1.1.1.1:80', '3.3.3.3:80']
+    assert sort_key(-1, 7) == 7
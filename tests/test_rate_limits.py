@@ -0,0 +1,113 @@
+import asyncio
+
+from rate_limits import RateLimits, TokenBucket, interleave_by_subnet, subnet_key
+
+
+def test_bucket_spends_its_burst_then_queues_reservations():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+    assert bucket.reserve(now) == 0
+    assert bucket.reserve(now) == 0
+    assert abs(bucket.reserve(now) - 0.1) < 1e-9
+    assert abs(bucket.reserve(now) - 0.2) < 1e-9
+    # Refilled at the rate, capped at the burst
+    assert bucket.reserve(now + 10) == 0
+    assert bucket.tokens == 1
+
+
+def test_subnet_key_groups_ipv4_by_24():
+    assert subnet_key('1.2.3.4:80') == subnet_key('socks5://1.2.3.200:1080') == '1.2.3'
+    assert subnet_key('proxy.example:80') == 'proxy.example'
+
+
+def test_interleave_spreads_crowded_subnets_and_keeps_everything():
+    proxies = ['1.1.1.1:80', '1.1.1.2:80', '1.1.1.3:80', '2.2.2.1:80', '3.3.3.1:80', '2.2.2.2:80']
+    ordered = list(interleave_by_subnet(proxies))
+    assert ordered == ['1.1.1.1:80', '2.2.2.1:80', '3.3.3.1:80', '1.1.1.2:80', '2.2.2.2:80', '1.1.1.3:80']
+
+
+def test_zero_rates_disable_the_limits():
+    limits = RateLimits()
+    proxies = ['1.1.1.1:80', '1.1.1.2:80']
+
+    async def run():
+        for _ in range(100):
+            await limits.acquire_target('http://example.com/')
+            await limits.acquire_subnet('1.1.1.1:80')
+
+    asyncio.run(run())
+    assert limits.stats['target_waits'] == limits.stats['subnet_waits'] == 0
+    assert limits.order(proxies) is proxies
+
+
+def test_waits_are_counted_per_kind():
+    # Slow enough that a late wake-up does not refill a whole token
+    limits = RateLimits(target_rate=20, subnet_rate=20, target_burst=1, subnet_burst=1)
+
+    async def run():
+        for _ in range(3):
+            await limits.acquire_target('http://example.com/')
+        for _ in range(3):
+            await limits.acquire_subnet('1.1.1.1:80')
+        # A fresh /24 has its own burst
+        await limits.acquire_subnet('9.9.9.9:80')
+
+    asyncio.run(run())
+    assert limits.stats['target_waits'] == limits.stats['subnet_waits'] == 2
+    assert limits.report()['target_rate'] == 20
+
+
+async def serve_fake_proxy(idle_timeout: float):
+    """HTTP proxy on localhost that drops idle connections, 404s /missing and echoes the rest"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                status = '404 Not Found' if b'/missing' in request_line else '200 OK'
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: {len(request_line)}\r\n"
+                             f"Connection: keep-alive\r\n\r\n".encode() + request_line)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+def probe_with_limits(test_urls, waits_for_url, **kwargs):
+    from async_proxy_engine import AsyncProxyEngine
+
+    engine = AsyncProxyEngine(test_urls, timeout=2, classify=False, target_strategy='ordered', **kwargs)
+    engine.rate_limits = RateLimits(target_rate=4, target_burst=1)
+
+    async def run():
+        server = await serve_fake_proxy(idle_timeout=0.1)
+        port = server.sockets[0].getsockname()[1]
+        # Spend the burst so the probe waits about 0.25s for `waits_for_url`
+        await engine.rate_limits.acquire_target(waits_for_url)
+        try:
+            return await engine.probe(f"127.0.0.1:{port}", 'http')
+        finally:
+            server.close()
+
+    return engine, asyncio.run(run())
+
+
+def test_connection_dropped_while_waiting_on_the_limit_is_reopened():
+    url = 'http://127.0.0.1:9/get?nonce={nonce}'
+    engine, outcome = probe_with_limits([url], url, prefilter=True)
+    assert outcome['working'], outcome
+    assert engine.connection_stats['opened'] == 2
+
+
+def test_fallback_target_wait_is_outside_the_validate_deadline():
+    urls = ['http://127.0.0.1:9/missing', 'http://127.0.0.2:9/get?nonce={nonce}']
+    engine, outcome = probe_with_limits(urls, urls[1], prefilter=False, probe_deadline=0.2)
+    assert outcome['working'], outcome
+    assert engine.rate_limits.stats['target_waits'] == 1
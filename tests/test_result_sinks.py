@@ -0,0 +1,34 @@
+import json
+import time
+
+from result_sinks import BestSnapshot
+
+
+def working(proxy, response_time, proxy_type='http'):
+    return {'proxy': proxy, 'type': proxy_type, 'response_time': response_time}
+
+
+def test_best_snapshot_keeps_the_fastest_n_per_type_and_publishes_them(tmp_path):
+    published = []
+    snapshot = BestSnapshot(str(tmp_path / 'best.json'), str(tmp_path / 'best.txt'), size=3, interval=60,
+                            on_publish=published.append)
+    times = [0.9, 0.2, 0.7, 0.4, 0.2, 1.5, 0.1, 0.8]
+    for i, response_time in enumerate(times):
+        snapshot.add(working(f"10.0.0.{i}:80", response_time))
+    snapshot.add(working('10.0.1.1:1080', 2.0, 'socks5'))
+
+    # Evicts the slowest; ties keep the one seen first
+    best = snapshot.best()
+    assert [result['proxy'] for result in best['http']] == ['10.0.0.6:80', '10.0.0.1:80', '10.0.0.4:80']
+    assert [result['proxy'] for result in best['socks5']] == ['10.0.1.1:1080']
+
+    assert not snapshot.tick()
+    assert snapshot.tick(now=time.monotonic() + 61)
+    assert snapshot.published == 1 and len(published) == 1
+    with open(tmp_path / 'best.json') as f:
+        written = json.load(f)
+    assert (written['working_so_far'], written['size']) == (9, 3)
+    assert written['by_type'] == best == published[0]['by_type']
+    assert (tmp_path / 'best.txt').read_text().split() == ['10.0.0.6:80', '10.0.0.1:80', '10.0.0.4:80',
+                                                           '10.0.1.1:1080']
+    assert not list(tmp_path.glob('*.tmp'))
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from settings import SETTINGS, build_parser, load_settings
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'settings': {'read_timeout': 7, 'concurrency': 50, 'prefilter': False}}))
+    return str(path)
+
+
+def test_defaults_without_config_env_or_flags(tmp_path):
+    settings = load_settings(environ={'PROXY_CONFIG': str(tmp_path / 'missing.json')})
+    for name in ('timeout', 'concurrency', 'prefilter', 'history_db'):
+        assert getattr(settings, name) == SETTINGS[name][0]
+
+
+def test_config_then_environment_then_flags(config):
+    settings = load_settings(environ={'PROXY_CONFIG': config})
+    assert (settings.timeout, settings.concurrency, settings.prefilter) == (7.0, 50, False)
+
+    environ = {'PROXY_CONFIG': config, 'PROBE_TIMEOUT': '5', 'PREFILTER': 'yes'}
+    settings = load_settings(environ=environ)
+    assert (settings.timeout, settings.concurrency, settings.prefilter) == (5.0, 50, True)
+
+    settings = load_settings(['--timeout', '2', '--no-prefilter'], environ=environ)
+    assert (settings.timeout, settings.concurrency, settings.prefilter) == (2.0, 50, False)
+
+
+def test_config_flag_beats_environment_path(config, tmp_path):
+    settings = load_settings(['--config', config], environ={'PROXY_CONFIG': str(tmp_path / 'other.json')})
+    assert settings.concurrency == 50
+    assert settings.config_path == config
+
+
+def test_empty_variable_is_unset_except_for_strings(config):
+    settings = load_settings(environ={'PROXY_CONFIG': config, 'MAX_CONCURRENCY': '', 'HISTORY_DB': ''})
+    assert settings.concurrency == 50
+    assert settings.history_db == ''
+
+
+def test_lists_are_split_on_commas(config):
+    settings = load_settings(environ={'PROXY_CONFIG': config, 'PROXY_TYPE': 'socks4, socks5'})
+    assert settings.proxy_types == ['socks4', 'socks5']
+
+
+@pytest.mark.parametrize('environ', [{'PROXY_TYPE': 'ftp'}, {'MAX_CONCURRENCY': '0'}, {'PROBE_RETRIES': '-1'}])
+def test_invalid_values_are_rejected(config, environ):
+    with pytest.raises(ValueError):
+        load_settings(environ=dict(environ, PROXY_CONFIG=config))
+
+
+def test_every_setting_has_a_flag():
+    flags = {action.dest for action in build_parser()._actions}
+    assert set(SETTINGS) <= flags
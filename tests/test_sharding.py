@@ -0,0 +1,73 @@
+import json
+
+from sharding import merge_directory, merge_results, select_shard, shard_of, shard_suffix
+
+PROXIES = [f"10.0.{i // 250}.{i % 250}:{8000 + i % 7}" for i in range(2000)]
+
+
+def test_every_proxy_lands_in_exactly_one_shard():
+    shards = [list(select_shard(PROXIES, index, 4)) for index in range(4)]
+    assert sorted(sum(shards, [])) == sorted(PROXIES)
+    assert all(350 < len(shard) < 650 for shard in shards)
+    # Original order is kept inside a shard
+    assert shards[0] == [proxy for proxy in PROXIES if proxy in set(shards[0])]
+
+
+def test_shard_ignores_scheme_and_case_and_is_stable():
+    assert shard_of('socks5://Example.com:1080', 8) == shard_of('example.com:1080', 8)
+    assert list(select_shard(PROXIES[:10], 0, 1)) == PROXIES[:10]
+    assert shard_suffix(2, 4) == '.shard-2-of-4'
+    assert shard_suffix(0, 1) == ''
+
+
+def test_merge_keeps_the_fastest_duplicate_in_a_stable_order():
+    records = [
+        {'proxy': '2.2.2.2:80', 'type': 'http', 'response_time': 0.5},
+        {'proxy': '1.1.1.1:80', 'type': 'http', 'response_time': 0.9},
+        {'proxy': '1.1.1.1:80', 'type': 'http', 'response_time': 0.3},
+        {'proxy': '1.1.1.1:80', 'type': 'socks5', 'response_time': 0.1},
+        {'proxy': '', 'type': 'http'},
+    ]
+    merged = merge_results(records)
+    assert list(merged) == ['http', 'socks5']
+    assert [(r['proxy'], r['response_time']) for r in merged['http']] == [('1.1.1.1:80', 0.3), ('2.2.2.2:80', 0.5)]
+    assert merge_results(reversed(records)) == merged
+
+
+def write_lines(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+
+def test_merge_directory_reports_missing_shards(tmp_path):
+    artifacts = tmp_path / 'artifacts'
+    (artifacts / 'shard-0').mkdir(parents=True)
+    write_lines(artifacts / 'shard-0' / 'working_http_proxies.shard-0-of-2.ndjson',
+                [{'proxy': '1.1.1.1:80', 'type': 'http', 'response_time': 0.2}])
+    (artifacts / 'shard-0' / 'shard-0-of-2.json').write_text(
+        json.dumps({'shard_index': 0, 'shard_count': 2, 'total_tested': 10}))
+
+    summary = merge_directory(str(artifacts), str(tmp_path / 'out'))
+    assert summary['by_type'] == {'http': 1}
+    assert summary['missing_shards'] == [1]
+    assert summary['tested'] == 10
+    assert (tmp_path / 'out' / 'working_http_proxies.txt').read_text() == '1.1.1.1:80\n'
+
+
+def test_merge_directory_keeps_partial_results_of_unfinished_shards(tmp_path):
+    artifacts = tmp_path / 'artifacts'
+    artifacts.mkdir()
+    write_lines(artifacts / 'working_http_proxies.shard-0-of-2.ndjson',
+                [{'proxy': '1.1.1.1:80', 'type': 'http', 'response_time': 0.4}])
+    # Shard 1 timed out: its stream was never renamed into place, and its last line is cut off
+    part = artifacts / 'working_http_proxies.shard-1-of-2.ndjson.part'
+    write_lines(part, [{'proxy': '2.2.2.2:80', 'type': 'http', 'response_time': 0.3},
+                       {'proxy': '2.2.2.2:80', 'type': 'http', 'response_time': 0.6},
+                       {'proxy': '1.1.1.1:80', 'type': 'http', 'response_time': 0.2}])
+    with open(part, 'a') as f:
+        f.write('{"proxy": "3.3.3.3:80", "ty')
+    (artifacts / 'working_http_proxies.shard-1-of-2.txt.part').write_text('2.2.2.2:80\n')
+
+    summary = merge_directory(str(artifacts), str(tmp_path / 'out'))
+    assert (summary['files'], summary['partial_files']) == (2, 1)
+    assert summary['by_type'] == {'http': 2}
+    assert (tmp_path / 'out' / 'working_http_proxies.txt').read_text() == '1.1.1.1:80\n2.2.2.2:80\n'
@@ -0,0 +1,34 @@
+import pytest
+
+from settings import DEFAULT_TEST_URLS
+from validation_targets import TargetPool, ValidationTarget
+
+
+def test_every_default_target_verifies_a_nonce():
+    assert all(ValidationTarget(url).verifies_nonce for url in DEFAULT_TEST_URLS)
+
+
+def test_nonce_is_fresh_per_request():
+    target = ValidationTarget('http://echo.example:8080/ip?nonce={nonce}')
+    (first, first_nonce), (second, second_nonce) = target.request_url(), target.request_url()
+    assert first_nonce != second_nonce
+    assert first == f"http://echo.example:8080/ip?nonce={first_nonce}"
+    assert (target.host, target.port) == ('echo.example', 8080)
+    assert ValidationTarget('https://plain.example/ip').request_url() == ('https://plain.example/ip', None)
+
+
+def test_round_robin_rotates_the_first_target():
+    pool = TargetPool(['http://a/', 'http://b/', 'http://c/'])
+    firsts = [pool.order()[0].url for _ in range(4)]
+    assert firsts == ['http://a/', 'http://b/', 'http://c/', 'http://a/']
+    assert [target.url for target in pool.order()] == ['http://b/', 'http://c/', 'http://a/']
+
+
+def test_least_load_and_ordered_strategies():
+    pool = TargetPool(['http://a/', 'http://b/'], strategy='least_load')
+    pool.targets[0].in_flight = 3
+    assert pool.order()[0].url == 'http://b/'
+    ordered = TargetPool(['http://a/', 'http://b/'], strategy='ordered')
+    assert [ordered.order()[0].url for _ in range(2)] == ['http://a/', 'http://a/']
+    with pytest.raises(ValueError):
+        TargetPool(['http://a/'], strategy='random')
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Validation Targets
+The URLs proxies are tested against and which one each probe tries
+first. A URL containing `{nonce}` gets a fresh random value for every
+request, and the response only counts if it echoes that value back, so a
+cached page or an injected response is not taken for a working proxy.
+`echo_server.py` is a self-hosted target that does this:
+
+    http://echo.example.com:8080/ip?nonce={nonce}
+"""
+
+import secrets
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+NONCE_PLACEHOLDER = '{nonce}'
+
+# ordered: always the first URL first (the old behaviour)
+# round_robin: rotate the first URL across probes
+# least_load: the URL with the fewest requests in flight
+STRATEGIES = ('ordered', 'round_robin', 'least_load')
+
+
+class ValidationTarget:
+    """One test URL with its load and outcome counters"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.verifies_nonce = NONCE_PLACEHOLDER in url
+        parts = urlsplit(url.replace(NONCE_PLACEHOLDER, ''))
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.in_flight = 0
+        self.stats = {}
+        self.reset()
+
+    def reset(self):
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'ok': 0, 'failed': 0, 'nonce_mismatch': 0}
+
+    def request_url(self) -> Tuple[str, Optional[str]]:
+        """URL for one request and the nonce it must echo (None if unchecked)"""
+        if not self.verifies_nonce:
+            return self.url, None
+        nonce = secrets.token_hex(8)
+        return self.url.replace(NONCE_PLACEHOLDER, nonce), nonce
+
+
+class TargetPool:
+    """Picks the order in which one probe tries the test URLs"""
+
+    def __init__(self, urls: List[str], strategy: str = 'round_robin'):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown target strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+        self.targets = [ValidationTarget(url) for url in urls]
+        self.strategy = strategy
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def reset(self):
+        """Clear load and counters before a new run"""
+        self._next = 0
+        for target in self.targets:
+            target.reset()
+
+    def order(self) -> List[ValidationTarget]:
+        """Targets for one probe: the chosen one first, the others as fallbacks"""
+        if self.strategy == 'ordered' or len(self.targets) < 2:
+            return self.targets
+        if self.strategy == 'round_robin':
+            first = self._next
+            self._next = (self._next + 1) % len(self.targets)
+        else:
+            first = min(range(len(self.targets)),
+                        key=lambda i: (self.targets[i].in_flight, self.targets[i].stats['requests']))
+        return self.targets[first:] + self.targets[:first]
+
+    def report(self) -> Dict[str, Dict]:
+        """Requests and outcomes per test URL for the last run"""
+        return {target.url: dict(target.stats) for target in self.targets}